@@ -1,44 +1,49 @@
 """Flask application entry point for the PumpUp Gym Edge Service."""
 
 import os
-from pathlib import Path
-
-
-def load_env_file(path: str = ".env") -> None:
-    """Load key=value pairs from a .env file into os.environ if not already set."""
-    env_path = Path(path)
-    if not env_path.exists():
-        return
-
-    for raw_line in env_path.read_text().splitlines():
-        line = raw_line.strip()
-        if not line or line.startswith("#"):
-            continue
-        if "=" not in line:
-            continue
-        key, value = line.split("=", 1)
-        key = key.strip()
-        value = value.strip()
-        os.environ.setdefault(key, value)
+import signal
+import sys
 
+from shared.infrastructure.env import load_env_file
 
 load_env_file()
 
 from flask import Flask  # noqa: E402
 
 import iam.application.services  # noqa: E402
+from bootstrap import start_background_writers  # noqa: E402
+from health.application.services import HeartRateApplicationService  # noqa: E402
+from health.infrastructure.forwarding import HR_FORWARD_COALESCE_MS  # noqa: E402
+from health.infrastructure.write_behind import HR_WRITE_BATCH_MS, HR_WRITE_BATCH_ROWS, HR_WRITE_MODE  # noqa: E402
 from health.interfaces.services import equipment_api  # noqa: E402
+from health.interfaces.stream import HR_STREAM_ENABLED, telemetry_stream  # noqa: E402
 from iam.interfaces.services import iam_api  # noqa: E402
-from shared.infrastructure.database import init_db  # noqa: E402
+from shared.infrastructure.database import init_db, register_request_hooks  # noqa: E402
+from shared.infrastructure.profiler import install_profile_signal  # noqa: E402
+from shared.infrastructure.writer import WRITER_ADDRESS, is_writer_client, writer_client  # noqa: E402
+from shared.interfaces.debug import (  # noqa: E402
+    DEBUG_ENDPOINTS, debug_api, register_trace_hooks, set_debug_authenticator,
+)
+from shared.interfaces.metrics import metrics_api, register_metrics_hooks  # noqa: E402
 
 app = Flask(__name__)
 app.register_blueprint(iam_api)
 app.register_blueprint(equipment_api)
+app.register_blueprint(metrics_api)
+app.register_blueprint(debug_api)
+register_request_hooks(app)
+register_metrics_hooks(app)
+register_trace_hooks(app)
 
 
 def initialize_service():
     """Initialize the database and create test data."""
-    init_db()
+    if is_writer_client():
+        # The writer process (writer.py) owns the schema, test data and background writers
+        writer_client.wait_until_ready()
+        print(f"* Writes submitted to the single writer at {WRITER_ADDRESS}")
+    else:
+        init_db()
 
     # Create test device (ESP32)
     auth_service = iam.application.services.AuthApplicationService()
@@ -53,16 +58,61 @@ def initialize_service():
     print(f"  NFC UID: {member.nfc_uid}")
     print(f"  Membership: {member.membership_status} until {member.membership_expiry.date()}")
 
+    # Seed the in-memory occupancy counter and keep it reconciled with the database
+    access_service.start_occupancy_reconciler()
+    print(f"* Occupancy counter seeded: {access_service.get_current_occupancy()}")
+
+    heart_rate_service = HeartRateApplicationService()
+    if not is_writer_client():
+        start_background_writers(access_service, heart_rate_service)
+
+    # Replay heart rate samples queued while the backend was unreachable (and coalesce new ones)
+    heart_rate_service.start_forward_replayer(replay=not is_writer_client())
+    if heart_rate_service.forward_coalescer.enabled:
+        print(f"* Heart rate forwards coalesced every {HR_FORWARD_COALESCE_MS:g} ms")
+
+    # Commit stored heart rate samples in batches instead of one transaction per request
+    heart_rate_service.start_write_buffer()
+    if heart_rate_service.write_buffer.enabled:
+        print(f"* Heart rate writes buffered ({HR_WRITE_MODE}): up to {HR_WRITE_BATCH_ROWS} rows "
+              f"or {HR_WRITE_BATCH_MS:g} ms per commit")
+
+    # Long-lived streaming channel for heart rate sensors (one authentication per connection)
+    if HR_STREAM_ENABLED:
+        telemetry_stream.start(authenticate=auth_service.authenticate)
+        print("* Heart rate stream listening on %s:%d" % telemetry_stream.address)
+
+    # Debug endpoints (traces, profiler) answer registered devices only, and only when enabled
+    set_debug_authenticator(auth_service.authenticate)
+
     print("\n=== PumpUp Gym Edge Service Ready ===")
     print("Available endpoints:")
     print("  POST /api/v1/access/nfc-scan - Check-in/Check-out with NFC")
     print("  GET  /api/v1/access/occupancy - Get current gym occupancy")
+    print("  GET  /api/v1/access/occupancy/stream - Live occupancy (Server-Sent Events)")
+    print("  GET  /api/v1/access/occupancy/series - Occupancy by minute/hour/day with peak periods")
+    print("  GET  /api/v1/access/stats - Access path cache statistics")
     print("  POST /api/check/out - Proxy check-in/out to backend")
     print("  POST /api/heart-rate/<member_id> - Proxy heart rate data to backend")
+    print("  POST /api/v1/heart-rate/batch - Store a batch of heart rate samples")
+    print("  GET  /api/v1/heart-rate/stats - Live buffer and stream ingest statistics")
+    print("  GET  /metrics - Prometheus metrics")
+    if DEBUG_ENDPOINTS:
+        print("  POST /api/v1/debug/profile - Sample all threads into a flamegraph-ready stack file")
 
 
 if __name__ == "__main__":
-    initialize_service()
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", "5000"))
-    app.run(host=host, port=port, debug=False, use_reloader=False)
+    server_mode = os.getenv("SERVER_MODE", "flask").lower()
+    # SIGUSR2 starts a sampling profile (the handler must be installed from the main thread)
+    install_profile_signal()
+    if server_mode == "asgi":
+        # asyncio serving mode: initialize_service runs in the ASGI lifespan startup
+        import uvicorn
+        uvicorn.run("asgi:app", host=host, port=port, log_level=os.getenv("LOG_LEVEL", "warning"))
+    else:
+        # Exit normally on SIGTERM so buffered heart rate samples are flushed by the atexit hooks
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        initialize_service()
+        app.run(host=host, port=port, debug=False, use_reloader=False)
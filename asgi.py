@@ -0,0 +1,19 @@
+"""ASGI entry point (asyncio serving mode) for the PumpUp Gym Edge Service.
+
+Serves the iam_api and equipment_api routes as async handlers: database work runs on a bounded
+executor and backend calls use a non-blocking client. Start it with `SERVER_MODE=asgi python app.py`
+or `uvicorn asgi:app --host 0.0.0.0 --port 5000`.
+"""
+from app import initialize_service  # loads .env before the bounded contexts read their settings
+from health.interfaces.asgi import equipment_routes
+from iam.interfaces.asgi import iam_routes
+from shared.infrastructure.async_http_client import async_backend_client
+from shared.interfaces.asgi import ASGIApplication
+from shared.interfaces.debug import debug_routes
+from shared.interfaces.metrics import metrics_routes
+
+app = ASGIApplication(
+    [iam_routes, equipment_routes, metrics_routes, debug_routes],
+    on_startup=[initialize_service],
+    on_shutdown=[async_backend_client.aclose],
+)
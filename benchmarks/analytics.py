@@ -0,0 +1,102 @@
+"""
+Vectorized heart rate analytics versus a loop over HeartRateRecord entities.
+
+Fills a throwaway database with synthetic workouts for one member, then times
+HeartRateApplicationService.get_heart_rate_analytics (cache disabled) against loading the same
+history with find_by_member_id and computing time in zones and a rolling mean in pure Python.
+
+    python -m benchmarks.analytics --days 7 --rate 1
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def synthetic_samples(member_id: str, days: int, rate: float):
+    """One 60-minute workout per day sampled at `rate` Hz: warm-up, intervals, cool-down."""
+    rng = random.Random(42)
+    today = datetime.now().replace(hour=7, minute=0, second=0, microsecond=0)
+    for day in range(days, 0, -1):
+        start = today - timedelta(days=day)
+        for i in range(int(3600 * rate)):
+            seconds = i / rate
+            effort = 0.5 + 0.4 * max(0.0, math.sin(seconds / 240.0)) * min(1.0, seconds / 600.0)
+            yield {
+                "member_id": member_id,
+                "bpm": round(190 * effort + rng.gauss(0, 3), 1),
+                "measured_at": (start + timedelta(seconds=seconds)).isoformat(),
+            }
+
+
+def python_baseline(records, max_hr: float, window: float):
+    """Time in zones and trailing rolling mean with a loop over entities."""
+    bounds = (0.5, 0.6, 0.7, 0.8, 0.9)
+    zones = [0.0] * 6
+    rolling = []
+    recent = deque()
+    total = 0.0
+    for current, following in zip(records, records[1:] + [None]):
+        gap = (following.measured_at - current.measured_at).total_seconds() if following else 1.0
+        zone = sum(1 for bound in bounds if current.bpm / max_hr >= bound)
+        zones[zone] += min(gap, 10.0)
+        recent.append(current)
+        total += current.bpm
+        while (current.measured_at - recent[0].measured_at).total_seconds() >= window:
+            total -= recent.popleft().bpm
+        rolling.append(total / len(recent))
+    return zones, rolling
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=7, help="days of history (one workout per day)")
+    parser.add_argument("--rate", type=float, default=1.0, help="samples per second during workouts")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.TemporaryDirectory(prefix="edge-analytics-")
+    os.environ["DATABASE_PATH"] = str(Path(workdir.name) / "bench.db")
+    os.environ["HR_ANALYTICS_CACHE_TTL"] = "0.000001"
+    sys.path.insert(0, str(REPO_ROOT))
+    from health.application.services import HeartRateApplicationService
+    from shared.infrastructure.database import init_db
+
+    init_db()
+    service = HeartRateApplicationService()
+    samples = list(synthetic_samples("BENCH", args.days, args.rate))
+    service.record_heart_rate_batch(samples)
+    service.analytics_cache.clear()
+    window = (args.days + 1) * 86400
+
+    vectorized = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        result = service.get_heart_rate_analytics("BENCH", window_seconds=window)
+        vectorized.append(time.perf_counter() - started)
+        service.analytics_cache.clear()
+
+    looped = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        records = service.hr_repository.find_by_member_id("BENCH")
+        python_baseline(records, 190.0, 60.0)
+        looped.append(time.perf_counter() - started)
+
+    print(f"samples={len(samples)} visits={len(result['visits'])}")
+    print(f"  vectorized (load_series + numpy): {min(vectorized) * 1000:9.1f} ms")
+    print(f"  entity loop (zones + rolling only): {min(looped) * 1000:9.1f} ms")
+    print(f"  speed-up: {min(looped) / min(vectorized):.1f}x")
+    workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Load test simulating a fleet of ESP32 devices against the edge service.
+
+Each simulated entrance device sees members arrive at random (Poisson arrivals): a member taps in
+(POST /api/v1/access/nfc-scan), sends a pulse sample every few seconds during the visit
+(POST /api/heart-rate/<member_id>, proxied to a stub backend) and taps out when the visit ends.
+Dashboards poll GET /api/v1/access/occupancy meanwhile. With --duplicate-rate, a share of the taps
+is reported two or three times within half a second, like a PN532 reader does. The whole schedule is generated up front
+from --seed, so two runs with the same parameters send the same requests at the same offsets.
+
+Requests are sent open-loop: latency is measured from the time a request was scheduled, so a slow
+service shows up as latency instead of silently lowering the request rate.
+
+    python -m benchmarks.fleet --devices 8 --duration 30 --output fleet.json
+    python -m benchmarks.fleet --devices 8 --duration 30 --compare fleet.json
+"""
+import argparse
+import heapq
+import queue
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from benchmarks.harness import EdgeService, compare_results, print_table, save_results, summarize
+from benchmarks.stub_backend import StubBackend
+
+DEVICE_ID = "gym-esp32-001"
+API_KEY = "gym-api-key-2025"
+
+TAP = "POST /api/v1/access/nfc-scan"
+PULSE = "POST /api/heart-rate/<member_id>"
+OCCUPANCY = "GET /api/v1/access/occupancy"
+
+MIN_VISIT_SECONDS = 5.0
+
+# (offset in seconds from the start of the run, endpoint, request parameters)
+Event = Tuple[float, str, Dict]
+
+
+def _tap_reports(rng: random.Random, t: float, uid: str, duplicate_rate: float) -> List[Event]:
+    """Return the reports of one tap: usually one, two or three when the reader repeats it."""
+    reports = [(t, TAP, {"nfc_uid": uid})]
+    if duplicate_rate and rng.random() < duplicate_rate:
+        for _ in range(rng.choice((1, 2))):
+            reports.append((t + rng.uniform(0.05, 0.5), TAP, {"nfc_uid": uid}))
+    return reports
+
+
+def build_schedule(args: argparse.Namespace) -> List[Event]:
+    """Generate the requests of the whole run, ordered by time.
+
+    Members are drawn from a pool per device and never start a visit while already inside, so
+    every visit is a check-in, pulse samples and a check-out (unless the run ends first).
+    """
+    rng = random.Random(args.seed)
+    events: List[Event] = []
+    arrival_rate = args.arrivals_per_minute / 60.0
+    for device in range(args.devices):
+        pool = [f"FLEET{device:03d}{index:04d}" for index in range(args.members_per_device)]
+        busy_until: Dict[str, float] = {}
+        t = rng.expovariate(arrival_rate)
+        while t < args.duration:
+            free = [uid for uid in pool if busy_until.get(uid, -1.0) < t]
+            if free:
+                uid = rng.choice(free)
+                # Visits last a few seconds at least, so the tap out is never mistaken for a repeat
+                visit = max(MIN_VISIT_SECONDS, rng.expovariate(1.0 / args.visit_seconds))
+                busy_until[uid] = t + visit + 1.0
+                events.extend(_tap_reports(rng, t, uid, args.duplicate_rate))
+                bpm = rng.uniform(70, 90)
+                sample_at = t + rng.uniform(0, args.sample_interval)
+                while sample_at < min(t + visit, args.duration):
+                    # Warm-up towards a working heart rate, with noise
+                    bpm += (rng.uniform(120, 160) - bpm) * 0.1 + rng.gauss(0, 2)
+                    events.append((sample_at, PULSE, {"member_id": uid, "bpm": round(bpm)}))
+                    sample_at += args.sample_interval
+                if t + visit < args.duration:
+                    events.extend(_tap_reports(rng, t + visit, uid, args.duplicate_rate))
+            t += rng.expovariate(arrival_rate)
+    for _ in range(args.dashboards):
+        t = rng.uniform(0, args.poll_interval)
+        while t < args.duration:
+            events.append((t, OCCUPANCY, {}))
+            t += args.poll_interval
+    events.sort(key=lambda event: event[0])
+    return events
+
+
+def send(session: requests.Session, base_url: str, endpoint: str, params: Dict) -> bool:
+    """Send one request; True unless it failed with a server error or a transport error."""
+    headers = {"X-API-Key": API_KEY}
+    try:
+        if endpoint == TAP:
+            resp = session.post(f"{base_url}/api/v1/access/nfc-scan", headers=headers,
+                                json={"device_id": DEVICE_ID, "nfc_uid": params["nfc_uid"]}, timeout=30)
+        elif endpoint == PULSE:
+            resp = session.post(f"{base_url}/api/heart-rate/{params['member_id']}", json={"bpm": params["bpm"]},
+                                timeout=30)
+        else:
+            resp = session.get(f"{base_url}/api/v1/access/occupancy", headers=headers, timeout=30)
+        return resp.status_code < 500
+    except requests.exceptions.RequestException:
+        return False
+
+
+def replay(base_url: str, events: List[Event], workers: int) -> Tuple[Dict[str, Dict], Dict]:
+    """Send the schedule with `workers` client threads, each request at its scheduled offset.
+
+    Returns:
+        Tuple[Dict[str, Dict], Dict]: (summary per endpoint, dispatch statistics).
+    """
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lags: List[float] = []
+    lock = threading.Lock()
+    pending: "queue.Queue" = queue.Queue()
+    started = time.monotonic()
+
+    def worker() -> None:
+        session = requests.Session()
+        session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            offset, endpoint, params = item
+            scheduled = started + offset
+            lag = time.monotonic() - scheduled
+            ok = send(session, base_url, endpoint, params)
+            took = time.monotonic() - scheduled
+            with lock:
+                lags.append(lag)
+                if ok:
+                    latencies[endpoint].append(took)
+                else:
+                    errors[endpoint] += 1
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for event in events:
+        delay = started + event[0] - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        pending.put(event)
+    for _ in threads:
+        pending.put(None)
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    summary = {name: summarize(latencies[name], errors[name], elapsed)
+               for name in sorted(set(latencies) | set(errors))}
+    dispatch = {
+        "requests": len(events),
+        "elapsed_s": round(elapsed, 2),
+        "max_start_lag_ms": round(max(lags) * 1000, 2) if lags else None,
+        "p99_start_lag_ms": round(heapq.nlargest(max(1, len(lags) // 100), lags)[-1] * 1000, 2) if lags else None,
+    }
+    return summary, dispatch
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default="flask", help="comma-separated serving modes (flask, asgi)")
+    parser.add_argument("--devices", type=int, default=4, help="simulated entrance devices")
+    parser.add_argument("--members-per-device", type=int, default=200, help="member pool of each device")
+    parser.add_argument("--arrivals-per-minute", type=float, default=20.0, help="member arrivals per device")
+    parser.add_argument("--visit-seconds", type=float, default=45.0, help="mean visit length")
+    parser.add_argument("--sample-interval", type=float, default=2.0, help="seconds between pulse samples")
+    parser.add_argument("--duplicate-rate", type=float, default=0.0,
+                        help="share of taps the reader reports two or three times")
+    parser.add_argument("--dashboards", type=int, default=4, help="clients polling the occupancy")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="seconds between occupancy polls")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of simulated traffic per mode")
+    parser.add_argument("--workers", type=int, default=64, help="client threads sending the requests")
+    parser.add_argument("--backend-delay", type=float, default=0.05, help="stub backend latency in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="results JSON of a previous run to compare with")
+    parser.add_argument("--threshold", type=float, default=20.0,
+                        help="p95/p99 latency or throughput change (%%) reported as a regression")
+    args = parser.parse_args()
+
+    events = build_schedule(args)
+    counts = defaultdict(int)
+    for _, endpoint, _ in events:
+        counts[endpoint] += 1
+    print(f"Schedule: {len(events)} requests over {args.duration:g}s " +
+          ", ".join(f"{endpoint}={count}" for endpoint, count in sorted(counts.items())))
+
+    results, dispatch = {}, {}
+    for mode in args.modes.split(","):
+        stub = StubBackend(delay=args.backend_delay).start()
+        try:
+            with EdgeService(mode, stub.url, extra_env={"HR_RETENTION_DAYS": "0"}) as service:
+                results[mode], dispatch[mode] = replay(service.base_url, events, args.workers)
+        finally:
+            stub.stop()
+        dispatch[mode]["backend_requests"] = sum(stub.hits.values())
+        print_table(f"{mode}: {args.devices} devices, {args.duration:g}s, backend delay {args.backend_delay}s",
+                    results[mode])
+        print(f"  dispatch: {dispatch[mode]}")
+
+    if args.output:
+        save_results(args.output, dict(vars(args), dispatch=dispatch), results)
+    if args.compare:
+        regressions = compare_results(args.compare, results, args.threshold)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Per-sample versus coalesced forwarding of heart rate samples to the backend.
+
+Starts the edge service against a stub backend twice, once forwarding every sample
+(HR_FORWARD_COALESCE_MS=0) and once coalescing them into batched requests, drives both with the
+same load of POST /api/heart-rate/<member_id> calls, and reports proxy latency, backend requests
+received, flush sizes and flush latency percentiles (from /api/v1/heart-rate/stats).
+
+    python -m benchmarks.forward_coalescing --members 100 --rate 2 --duration 15 --window-ms 500
+"""
+import argparse
+import random
+import time
+from typing import Dict
+
+import requests
+
+from benchmarks.harness import EdgeService, format_summary, run_clients, save_results
+from benchmarks.stub_backend import StubBackend
+
+
+def drive(base_url: str, members: int, rate: float, duration: float, concurrency: int) -> Dict:
+    """Send `rate` samples per second per member for `duration` seconds from `concurrency` clients.
+
+    Returns:
+        Dict: Proxy latency summary.
+    """
+    interval = concurrency / (members * rate)
+
+    def client(index: int, session: requests.Session, stop_at: float, record) -> None:
+        rng = random.Random(index)
+        next_send = time.monotonic() + rng.random() * interval
+        while next_send < stop_at:
+            delay = next_send - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            url = f"{base_url}/api/heart-rate/BENCH{rng.randrange(members):05d}"
+            body = {"bpm": rng.randint(60, 180)}
+            record("proxy", lambda: session.post(url, json=body, timeout=30).status_code < 300)
+            next_send += interval
+
+    return run_clients(concurrency, duration, client)["proxy"]
+
+
+def run(label: str, window_ms: float, args: argparse.Namespace) -> Dict:
+    """Measure one configuration against a fresh stub backend."""
+    stub = StubBackend(delay=args.backend_delay).start()
+    env = {
+        "HR_FORWARD_COALESCE_MS": str(window_ms),
+        "HR_FORWARD_COALESCE_MAX_SAMPLES": str(args.max_samples),
+        "HR_STREAM_ENABLED": "false",
+        "HR_RETENTION_DAYS": "0",
+    }
+    try:
+        with EdgeService(args.mode, stub.url, extra_env=env) as service:
+            proxy = drive(service.base_url, args.members, args.rate, args.duration, args.concurrency)
+            time.sleep(window_ms / 1000.0 + 0.5)  # let the last buffers flush
+            stats = requests.get(f"{service.base_url}/api/v1/heart-rate/stats", timeout=10).json()
+    finally:
+        stub.stop()
+    coalescer = stats["forward_coalescer"]
+    result = {
+        "proxy": proxy,
+        "backend_requests": sum(stub.hits.values()),
+        "forward_queue_depth": stats["forward_queue"]["depth"],
+    }
+    if coalescer["enabled"]:
+        result.update(flush_size=coalescer["flush_size"], flush_latency=coalescer["flush_latency"],
+                      delivery_delay=coalescer["delivery_delay"], delivered=coalescer["delivered"])
+    print(f"\n{label}")
+    print(f"  proxy: {format_summary(proxy)}")
+    print(f"  backend requests: {result['backend_requests']}")
+    if coalescer["enabled"]:
+        size, latency, delay = coalescer["flush_size"], coalescer["flush_latency"], coalescer["delivery_delay"]
+        print(f"  flush size: mean {size['mean']}, p50 {size['p50']}, p95 {size['p95']}, max {size['max']}")
+        print(f"  flush latency: p50 {latency['p50_ms']} ms, p95 {latency['p95_ms']} ms, p99 {latency['p99_ms']} ms")
+        print(f"  delivery delay: p50 {delay['p50_ms']} ms, p95 {delay['p95_ms']} ms, max {delay['max_ms']} ms")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["flask", "asgi"], default="flask")
+    parser.add_argument("--members", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=2.0, help="samples per second per member")
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--concurrency", type=int, default=32, help="client threads")
+    parser.add_argument("--window-ms", type=float, default=500.0, help="coalescing window")
+    parser.add_argument("--max-samples", type=int, default=500, help="buffer size that forces a flush")
+    parser.add_argument("--backend-delay", type=float, default=0.02, help="stub backend response delay (s)")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {
+        "per_sample": run("per-sample forwarding", 0, args),
+        "coalesced": run(f"coalesced forwarding ({args.window_ms:g} ms window)", args.window_ms, args),
+    }
+    if args.output:
+        save_results(args.output, vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Helpers shared by the benchmarks: start the edge service in a subprocess against a throwaway
+database and a stub backend, drive it from concurrent clients and summarize latency samples.
+"""
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def free_port() -> int:
+    """Return a TCP port that is currently free on localhost."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class EdgeService:
+    """The edge service (app.py) running in a subprocess with an isolated SQLite file.
+
+    Attributes:
+        mode (str): SERVER_MODE passed to app.py (flask or asgi).
+        port (int): Listening port.
+        stream_port (int): Port of the streaming heart rate channel.
+        base_url (str): Base URL of the running service.
+    """
+
+    def __init__(self, mode: str, backend_url: str, port: Optional[int] = None,
+                 extra_env: Optional[Dict[str, str]] = None):
+        """Initialize (without starting) an EdgeService.
+
+        Args:
+            mode (str): SERVER_MODE (flask or asgi).
+            backend_url (str): Base URL of the (stub) backend.
+            port (Optional[int]): Listening port (a free one by default).
+            extra_env (Optional[Dict[str, str]]): Additional environment variables.
+        """
+        self.mode = mode
+        self.port = port or free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.stream_port = free_port()
+        self._workdir = tempfile.TemporaryDirectory(prefix="edge-bench-")
+        self.env = dict(os.environ)
+        self.env.update({
+            "SERVER_MODE": mode,
+            "HOST": "127.0.0.1",
+            "PORT": str(self.port),
+            "DATABASE_PATH": str(Path(self._workdir.name) / "bench.db"),
+            "BACKEND_BASE_URL": backend_url,
+            "CHECKIN_NOTIFY_URL": f"{backend_url}/api/check/in",
+            "CHECKOUT_NOTIFY_URL": f"{backend_url}/api/check/out",
+            "BYPASS_AUTH": "false",
+            "HR_STREAM_PORT": str(self.stream_port),
+        })
+        self.env.update(extra_env or {})
+        self._process: Optional[subprocess.Popen] = None
+
+    def start(self, timeout: float = 30.0) -> "EdgeService":
+        """Start app.py and wait until it answers HTTP requests.
+
+        Args:
+            timeout (float): Seconds to wait for the service to come up.
+        """
+        # stderr goes to a file: an unread pipe fills up with request logs and blocks the service
+        self._log_path = Path(self._workdir.name) / "service.log"
+        with open(self._log_path, "wb") as log:
+            self._process = subprocess.Popen(
+                [sys.executable, "app.py"], cwd=REPO_ROOT, env=self.env,
+                stdout=subprocess.DEVNULL, stderr=log,
+            )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"Edge service exited: {self._log_path.read_text(errors='replace')}")
+            try:
+                requests.get(f"{self.base_url}/api/v1/heart-rate/stats", timeout=1)
+                return self
+            except requests.exceptions.RequestException:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f"Edge service ({self.mode}) did not start within {timeout}s")
+
+    def stop(self) -> None:
+        """Terminate the service and remove its database."""
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        self._process = None
+        self._workdir.cleanup()
+
+    def __enter__(self) -> "EdgeService":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict:
+    """Summarize request latencies (seconds) of one endpoint.
+
+    Args:
+        latencies (List[float]): Durations of successful requests.
+        errors (int): Number of failed requests.
+        elapsed (float): Wall-clock duration of the run in seconds.
+
+    Returns:
+        Dict: Request/error counts, throughput and p50/p95/p99/max latency in milliseconds.
+    """
+    ordered = sorted(latencies)
+
+    def percentile(p: float) -> Optional[float]:
+        if not ordered:
+            return None
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 2)
+
+    return {
+        "requests": len(ordered) + errors,
+        "errors": errors,
+        "throughput_rps": round((len(ordered) + errors) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else None,
+    }
+
+
+# record(endpoint, send): times send(), which returns True if the request succeeded
+Recorder = Callable[[str, Callable[[], bool]], None]
+
+
+def run_clients(concurrency: int, duration: float,
+                client: Callable[[int, requests.Session, float, Recorder], None],
+                pool_connections: int = 1) -> Dict[str, Dict]:
+    """Run `concurrency` client threads until `duration` seconds have passed and summarize their requests.
+
+    Each thread calls client(index, session, stop_at, record) once; the client loops until
+    time.monotonic() reaches stop_at and sends each request through record(endpoint, send).
+    A request raising a requests exception counts as an error.
+
+    Args:
+        concurrency (int): Client threads.
+        duration (float): Seconds to run.
+        client (Callable): Client loop (index, own keep-alive session, stop_at, record).
+        pool_connections (int): Hosts the session of a client keeps a connection to.
+
+    Returns:
+        Dict[str, Dict]: Latency summary per endpoint (see summarize).
+    """
+    latencies: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def record(endpoint: str, send: Callable[[], bool]) -> None:
+        started = time.perf_counter()
+        try:
+            ok = send()
+        except requests.exceptions.RequestException:
+            ok = False
+        with lock:
+            latencies.setdefault(endpoint, [])
+            errors.setdefault(endpoint, 0)
+            if ok:
+                latencies[endpoint].append(time.perf_counter() - started)
+            else:
+                errors[endpoint] += 1
+
+    def run_client(index: int) -> None:
+        session = requests.Session()
+        session.mount("http://", HTTPAdapter(pool_connections=pool_connections, pool_maxsize=1))
+        client(index, session, stop_at, record)
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=run_client, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    return {endpoint: summarize(latencies[endpoint], errors[endpoint], elapsed) for endpoint in latencies}
+
+
+def format_summary(row: Dict) -> str:
+    """Format one endpoint summary on a line (requests, errors, throughput, p50/p95/p99)."""
+    return (f"{row['requests']} req, {row['errors']} err, {row['throughput_rps']} rps, "
+            f"p50 {row['p50_ms']} ms, p95 {row['p95_ms']} ms, p99 {row['p99_ms']} ms")
+
+
+def print_table(title: str, results: Dict[str, Dict]) -> None:
+    """Print per-endpoint results as an aligned table."""
+    print(f"\n{title}")
+    print(f"  {'endpoint':<34}{'req':>8}{'err':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for endpoint, row in results.items():
+        print(f"  {endpoint:<34}{row['requests']:>8}{row['errors']:>6}{row['throughput_rps']:>9}"
+              f"{row['p50_ms'] or '-':>9}{row['p95_ms'] or '-':>9}{row['p99_ms'] or '-':>9}")
+
+
+def run_metadata(params: Dict) -> Dict:
+    """Describe a benchmark run (time, commit, host, parameters) for its JSON results file."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+        "params": params,
+    }
+
+
+def save_results(path: str, params: Dict, results: Dict[str, Dict[str, Dict]]) -> None:
+    """Write results ({mode: {endpoint: summary}}) and run metadata as JSON."""
+    with open(path, "w") as fh:
+        json.dump({"meta": run_metadata(params), "results": results}, fh, indent=2)
+
+
+def compare_results(baseline_path: str, results: Dict[str, Dict[str, Dict]], threshold: float) -> List[str]:
+    """Print per-endpoint changes against a previous results file and list the regressions.
+
+    A regression is a p95/p99 latency or throughput change worse than `threshold` percent.
+
+    Args:
+        baseline_path (str): JSON file written by save_results().
+        results (Dict[str, Dict[str, Dict]]): Current results ({mode: {endpoint: summary}}).
+        threshold (float): Tolerated change in percent.
+
+    Returns:
+        List[str]: Descriptions of the regressions found.
+    """
+    with open(baseline_path) as fh:
+        baseline = json.load(fh)
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('meta', {}).get('commit')}):")
+    print(f"  {'mode / endpoint':<42}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    regressions = []
+    for mode, endpoints in results.items():
+        for endpoint, row in endpoints.items():
+            old = baseline.get("results", {}).get(mode, {}).get(endpoint)
+            if not old:
+                continue
+            changes = {}
+            for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+                if old.get(key) and row.get(key) is not None:
+                    changes[key] = (row[key] - old[key]) / old[key] * 100
+            print(f"  {mode + ' ' + endpoint:<42}" + "".join(
+                f"{changes[key]:>+8.1f}%" if key in changes else f"{'-':>9}"
+                for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")))
+            for key in ("p95_ms", "p99_ms"):
+                if changes.get(key, 0) > threshold:
+                    regressions.append(f"{mode} {endpoint}: {key} {old[key]} -> {row[key]}")
+            if changes.get("throughput_rps", 0) < -threshold:
+                regressions.append(f"{mode} {endpoint}: throughput {old['throughput_rps']} -> {row['throughput_rps']}")
+    return regressions
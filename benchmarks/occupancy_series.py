@@ -0,0 +1,158 @@
+"""
+Occupancy by hour from the precomputed series versus from the raw check_ins table.
+
+Fills a throwaway database with synthetic visits (opening hours 6:00-22:00, busier mornings and
+evenings), builds the occupancy series from them, then times
+AccessControlApplicationService.get_occupancy_series against computing the same hourly peak and
+average occupancy from the visits of the range (load, sort check-in/check-out events, sweep).
+Also reports the cost of the series update inside a scan's write transaction.
+
+    python -m benchmarks.occupancy_series --days 90 --visits-per-day 800
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def synthetic_visits(days: int, visits_per_day: int, members: int):
+    """Yield check_ins rows: 30-120 minute visits, arrivals peaking around 7:00 and 18:00."""
+    rng = random.Random(42)
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    for day in range(days, 0, -1):
+        opening = today - timedelta(days=day) + timedelta(hours=6)
+        for _ in range(visits_per_day):
+            hour = rng.gauss(1.0, 0.8) if rng.random() < 0.4 else rng.gauss(12.0, 1.5)
+            arrival = opening + timedelta(hours=min(15.0, max(0.0, hour)))
+            departure = arrival + timedelta(minutes=rng.uniform(30, 120))
+            yield {
+                "member": rng.randrange(1, members + 1),
+                "nfc_uid": "BENCH",
+                "check_in_time": arrival,
+                "check_out_time": departure,
+                "created_at": arrival,
+            }
+
+
+def raw_hourly(visits, start: datetime, end: datetime) -> List[Dict]:
+    """Hourly peak and average occupancy swept from the visits overlapping [start, end)."""
+    events = []
+    for check_in_time, check_out_time in visits:
+        events.append((check_in_time, 1))
+        if check_out_time is not None:
+            events.append((check_out_time, -1))
+    events.sort()
+    hours = []
+    level = 0
+    index = 0
+    current = start
+    while current < end:
+        bucket_end = current + timedelta(hours=1)
+        peak, area, last = level, 0.0, current
+        while index < len(events) and events[index][0] < bucket_end:
+            at, delta = events[index]
+            if at >= current:
+                area += level * (at - last).total_seconds()
+                last = at
+            level += delta
+            if at >= current:
+                peak = max(peak, level)
+            index += 1
+        area += level * (bucket_end - last).total_seconds()
+        hours.append({"bucket_start": current, "peak_occupancy": peak, "average_occupancy": area / 3600})
+        current = bucket_end
+    return hours
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=90, help="days of history")
+    parser.add_argument("--visits-per-day", type=int, default=800)
+    parser.add_argument("--members", type=int, default=3000)
+    parser.add_argument("--range-days", type=int, default=28, help="range of the hourly query")
+    parser.add_argument("--scans", type=int, default=500, help="scans timed for the write overhead")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.TemporaryDirectory(prefix="edge-occupancy-")
+    os.environ["DATABASE_PATH"] = str(Path(workdir.name) / "bench.db")
+    os.environ["METRICS_ENABLED"] = "false"
+    sys.path.insert(0, str(REPO_ROOT))
+    from peewee import chunked
+
+    from iam.application.services import AccessControlApplicationService, toggle_access
+    from iam.infrastructure.models import CheckIn, Member
+    from shared.infrastructure.database import db, init_db, unit_of_work
+
+    init_db()
+    service = AccessControlApplicationService()
+    now = datetime.now()
+    with unit_of_work():
+        Member.insert_many([
+            {"id": i, "nfc_uid": f"M{i:06d}", "name": f"Member {i}", "email": f"m{i}@bench.local",
+             "membership_status": "active", "membership_expiry": now + timedelta(days=365), "created_at": now}
+            for i in range(1, args.members + 1)
+        ]).execute()
+        for chunk in chunked(synthetic_visits(args.days, args.visits_per_day, args.members), 500):
+            CheckIn.insert_many(chunk).execute()
+    started = time.perf_counter()
+    buckets = service.rebuild_occupancy_series()
+    rebuild_seconds = time.perf_counter() - started
+
+    end = now.replace(minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=args.range_days)
+
+    series_times = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        result = service.get_occupancy_series(start, end, resolution="hour")
+        series_times.append(time.perf_counter() - started)
+
+    raw_times = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        visits = (CheckIn.select(CheckIn.check_in_time, CheckIn.check_out_time)
+                  .where((CheckIn.check_in_time < end)
+                         & (CheckIn.check_out_time.is_null() | (CheckIn.check_out_time >= start)))
+                  .tuples())
+        hours = raw_hourly(list(visits), start, end)
+        raw_times.append(time.perf_counter() - started)
+    mismatches = sum(1 for a, b in zip(result["series"], hours)
+                     if a["peak_occupancy"] != b["peak_occupancy"]
+                     or abs(a["average_occupancy"] - b["average_occupancy"]) > 0.01)
+
+    def time_scans() -> List[float]:
+        times = []
+        for index in range(args.scans):
+            started = time.perf_counter()
+            toggle_access(f"SCAN{index % 50:03d}")
+            times.append(time.perf_counter() - started)
+        return sorted(times)
+
+    scan_times = time_scans()
+    # Same scans with the series update switched off, for the write overhead
+    AccessControlApplicationService._record_occupancy_change = lambda self, at, delta: None
+    plain_scan_times = time_scans()
+    db.close()
+
+    visits_total = args.days * args.visits_per_day
+    print(f"visits={visits_total} series buckets={buckets} (rebuilt in {rebuild_seconds:.2f} s)")
+    print(f"hourly occupancy over {args.range_days} days ({result['bucket_count']} buckets):")
+    print(f"  precomputed series:        {min(series_times) * 1000:9.1f} ms")
+    print(f"  sweep over raw check_ins:  {min(raw_times) * 1000:9.1f} ms")
+    print(f"  speed-up: {min(raw_times) / min(series_times):.1f}x (hours differing: {mismatches})")
+    for label, times in (("with series update", scan_times), ("without", plain_scan_times)):
+        print(f"scan write transaction {label}: p50 {times[len(times) // 2] * 1000:.2f} ms, "
+              f"p95 {times[int(len(times) * 0.95)] * 1000:.2f} ms")
+    workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
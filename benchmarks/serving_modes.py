@@ -0,0 +1,79 @@
+"""
+Compare the Flask (threaded WSGI) and asyncio (ASGI) serving modes.
+
+Starts the edge service in each mode against a stub backend with a configurable delay, then drives
+it with N concurrent keep-alive clients doing a mix of heart-rate proxy calls, NFC scans and
+occupancy reads for a fixed duration.
+
+    python -m benchmarks.serving_modes --concurrency 200 --duration 15 --backend-delay 0.05
+"""
+import argparse
+import random
+import time
+from typing import Dict
+
+import requests
+
+from benchmarks.harness import EdgeService, print_table, run_clients, save_results
+from benchmarks.stub_backend import StubBackend
+
+DEVICE_ID = "gym-esp32-001"
+API_KEY = "gym-api-key-2025"
+
+
+def drive(base_url: str, concurrency: int, duration: float, members: int) -> Dict[str, Dict]:
+    """Run the request mix with `concurrency` client threads for `duration` seconds.
+
+    Returns:
+        Dict[str, Dict]: Summary per endpoint.
+    """
+    headers = {"X-API-Key": API_KEY}
+
+    def client(index: int, session: requests.Session, stop_at: float, record) -> None:
+        rng = random.Random(index)
+        while time.monotonic() < stop_at:
+            roll = rng.random()
+            member = f"BENCH{rng.randrange(members):05d}"
+            if roll < 0.7:
+                body = {"bpm": rng.randint(60, 180)}
+                record("POST /api/heart-rate/<member_id>", lambda: session.post(
+                    f"{base_url}/api/heart-rate/{member}", json=body, timeout=30).status_code < 500)
+            elif roll < 0.9:
+                body = {"device_id": DEVICE_ID, "nfc_uid": member}
+                record("POST /api/v1/access/nfc-scan", lambda: session.post(
+                    f"{base_url}/api/v1/access/nfc-scan", headers=headers, json=body, timeout=30).status_code < 500)
+            else:
+                record("GET /api/v1/access/occupancy", lambda: session.get(
+                    f"{base_url}/api/v1/access/occupancy", headers=headers, timeout=30).status_code < 500)
+
+    results = run_clients(concurrency, duration, client)
+    return {name: results[name] for name in sorted(results)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default="flask,asgi", help="comma-separated serving modes")
+    parser.add_argument("--concurrency", type=int, default=100, help="concurrent client connections")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per mode")
+    parser.add_argument("--backend-delay", type=float, default=0.05, help="stub backend latency in seconds")
+    parser.add_argument("--members", type=int, default=200, help="distinct NFC UIDs / member IDs")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    stub = StubBackend(delay=args.backend_delay).start()
+    results = {}
+    try:
+        for mode in args.modes.split(","):
+            with EdgeService(mode, stub.url) as service:
+                results[mode] = drive(service.base_url, args.concurrency, args.duration, args.members)
+            print_table(f"{mode}: {args.concurrency} clients, {args.duration}s, backend delay {args.backend_delay}s",
+                        results[mode])
+    finally:
+        stub.stop()
+
+    if args.output:
+        save_results(args.output, vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
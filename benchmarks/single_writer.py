@@ -0,0 +1,177 @@
+"""
+Several worker processes on one SQLite file: direct writes versus the single writer.
+
+Starts 1, 2 and 4 edge service workers sharing one database, first with every worker writing
+directly (WRITER_MODE=local) and then with all writes submitted to one writer process
+(WRITER_MODE=client, writer.py). Each configuration is driven with the same write-heavy load,
+spread round-robin over the workers: NFC scans of distinct cards and heart rate batches.
+Reports throughput, latency percentiles and errors (e.g. "database is locked") per endpoint, and
+the group commit sizes of the writer.
+
+    python -m benchmarks.single_writer --workers 1 2 4 --duration 15 --concurrency 32
+"""
+import argparse
+import itertools
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import requests
+
+from benchmarks.harness import REPO_ROOT, EdgeService, print_table, run_clients, save_results
+from benchmarks.stub_backend import StubBackend
+
+DEVICE_ID = "gym-esp32-001"
+API_KEY = "gym-api-key-2025"
+
+
+class WriterProcess:
+    """writer.py running in a subprocess against a shared database."""
+
+    def __init__(self, env: Dict[str, str], log_path: Path):
+        self.env = env
+        self.log_path = log_path
+        self._process = None
+
+    def start(self, timeout: float = 30.0) -> "WriterProcess":
+        """Start writer.py and wait until it accepts connections."""
+        from multiprocessing.connection import Client
+
+        with open(self.log_path, "wb") as log:
+            self._process = subprocess.Popen([sys.executable, "writer.py"], cwd=REPO_ROOT, env=self.env,
+                                             stdout=subprocess.DEVNULL, stderr=log)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"Writer exited: {self.log_path.read_text(errors='replace')}")
+            try:
+                with Client(self.env["WRITER_ADDRESS"], authkey=self.env["WRITER_AUTHKEY"].encode()) as conn:
+                    conn.send(("writer.ping", (), 10.0))
+                    conn.recv()
+                return self
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f"Writer did not start within {timeout}s")
+
+    def stats(self) -> Dict:
+        """Ask the writer for its group commit counters."""
+        from multiprocessing.connection import Client
+
+        with Client(self.env["WRITER_ADDRESS"], authkey=self.env["WRITER_AUTHKEY"].encode()) as conn:
+            conn.send(("writer.ping", (), 10.0))
+            return conn.recv()[1]
+
+    def stop(self) -> None:
+        """Terminate the writer."""
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        self._process = None
+
+
+def drive(base_urls: List[str], duration: float, concurrency: int, batch_size: int) -> Dict[str, Dict]:
+    """Send scans and heart rate batches round-robin over the workers for `duration` seconds.
+
+    Returns:
+        Dict[str, Dict]: Latency summary per endpoint.
+    """
+    headers = {"X-API-Key": API_KEY}
+
+    def client(index: int, session: requests.Session, stop_at: float, record) -> None:
+        rng = random.Random(index)
+        urls = itertools.cycle(base_urls[index % len(base_urls):] + base_urls[:index % len(base_urls)])
+        sequence = 0
+        while time.monotonic() < stop_at:
+            base_url = next(urls)
+            sequence += 1
+            if sequence % 2:
+                endpoint = "nfc-scan"
+                # Distinct cards, so every scan is a real check-in written to the database
+                body = {"device_id": DEVICE_ID, "nfc_uid": f"SW{index:03d}{sequence:07d}"}
+                url = f"{base_url}/api/v1/access/nfc-scan"
+            else:
+                endpoint = "heart-rate batch"
+                body = {"samples": [{"member_id": f"SW{rng.randrange(500):05d}", "bpm": rng.randint(60, 180)}
+                                    for _ in range(batch_size)]}
+                url = f"{base_url}/api/v1/heart-rate/batch"
+            record(endpoint, lambda: session.post(url, headers=headers, json=body, timeout=30).status_code == 200)
+
+    return run_clients(concurrency, duration, client, pool_connections=len(base_urls))
+
+
+def run(writer_mode: str, workers: int, args: argparse.Namespace, stub_url: str) -> Dict[str, Dict]:
+    """Measure `workers` workers in one writer mode against a fresh shared database."""
+    with tempfile.TemporaryDirectory(prefix="edge-single-writer-") as workdir:
+        env = {
+            "DATABASE_PATH": os.path.join(workdir, "shared.db"),
+            "WRITER_MODE": writer_mode,
+            "WRITER_ADDRESS": os.path.join(workdir, "writer.sock"),
+            "WRITER_AUTHKEY": "bench",
+            "HR_STREAM_ENABLED": "false",
+            "HR_RETENTION_DAYS": "0",
+            "NFC_DEBOUNCE_MS": "0",
+            "BACKEND_BASE_URL": stub_url,
+            "CHECKIN_NOTIFY_URL": f"{stub_url}/api/check/in",
+            "CHECKOUT_NOTIFY_URL": f"{stub_url}/api/check/out",
+        }
+        writer = None
+        services: List[EdgeService] = []
+        try:
+            if writer_mode == "client":
+                writer = WriterProcess(dict(os.environ, **env), Path(workdir) / "writer.log").start()
+            for _ in range(workers):
+                # Workers start one at a time: in local mode each one runs the schema setup
+                services.append(EdgeService(args.mode, stub_url, extra_env=env).start())
+            results = drive([service.base_url for service in services], args.duration, args.concurrency,
+                            args.batch_size)
+            if writer is not None:
+                group = writer.stats()
+                results["writer"] = {"commands": group["commands"], "groups": group["groups"],
+                                     "avg_group_size": group["avg_group_size"],
+                                     "largest_group": group["largest_group"]}
+        finally:
+            for service in services:
+                service.stop()
+            if writer is not None:
+                writer.stop()
+    label = f"{workers} worker(s), WRITER_MODE={writer_mode}"
+    print_table(label, {key: value for key, value in results.items() if key != "writer"})
+    if "writer" in results:
+        print("  writer: {commands} commands in {groups} groups (avg {avg_group_size}, max {largest_group})"
+              .format(**results["writer"]))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["flask", "asgi"], default="flask")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--concurrency", type=int, default=32, help="client threads")
+    parser.add_argument("--batch-size", type=int, default=20, help="samples per heart rate batch")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    stub = StubBackend().start()
+    results = {}
+    try:
+        for workers in args.workers:
+            for writer_mode in ("local", "client"):
+                results[f"{writer_mode}-{workers}"] = run(writer_mode, workers, args, stub.url)
+    finally:
+        stub.stop()
+    if args.output:
+        save_results(args.output, vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
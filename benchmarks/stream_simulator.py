@@ -0,0 +1,162 @@
+"""
+Simulated ESP32 heart rate sensors for the streaming telemetry channel (health.interfaces.stream).
+
+Each simulated device opens one TCP connection, authenticates once and streams samples for several
+members at a fixed rate, reading acknowledgements on a separate thread.
+
+    python -m benchmarks.stream_simulator --devices 4 --members 10 --rate 1 --duration 30
+"""
+import argparse
+import json
+import random
+import socket
+import threading
+import time
+from typing import Dict, List, Optional
+
+DEVICE_ID = "gym-esp32-001"
+API_KEY = "gym-api-key-2025"
+
+
+class SimulatedDevice:
+    """One streaming connection sending samples for a group of members.
+
+    Attributes:
+        sent (int): Samples sent.
+        acked (int): Highest sample number acknowledged by the server.
+        accepted (int): Samples the server stored.
+        rejected (List[Dict]): Rejects reported by the server.
+    """
+
+    def __init__(self, host: str, port: int, members: List[str], rate: float, compact: bool = True,
+                 device_id: str = DEVICE_ID, api_key: str = API_KEY, invalid_ratio: float = 0.0):
+        """Initialize (without connecting) a SimulatedDevice.
+
+        Args:
+            host (str): Edge service host.
+            port (int): Streaming port.
+            members (List[str]): Member IDs this device reports for.
+            rate (float): Samples per second per member.
+            compact (bool): Send "member_id,bpm,measured_at" lines instead of JSON.
+            device_id (str): Device identifier used on hello.
+            api_key (str): Device API key used on hello.
+            invalid_ratio (float): Fraction of samples sent with an out-of-range BPM.
+        """
+        self.host, self.port = host, port
+        self.members = members
+        self.rate = rate
+        self.compact = compact
+        self.device_id, self.api_key = device_id, api_key
+        self.invalid_ratio = invalid_ratio
+        self.sent = 0
+        self.acked = 0
+        self.accepted = 0
+        self.rejected: List[Dict] = []
+        self.errors: List[str] = []
+        self._rng = random.Random()
+        self._bpm = {member: self._rng.randint(70, 110) for member in members}
+        self._sock: Optional[socket.socket] = None
+        self._reader: Optional[threading.Thread] = None
+
+    def connect(self) -> Dict:
+        """Connect and authenticate.
+
+        Returns:
+            Dict: The server's hello response.
+
+        Raises:
+            ConnectionError: If the server rejects the device.
+        """
+        self._sock = socket.create_connection((self.host, self.port), timeout=10)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._sock.makefile("rb")
+        self._sock.sendall(json.dumps({"device_id": self.device_id, "api_key": self.api_key}).encode() + b"\n")
+        hello = json.loads(self._file.readline())
+        if not hello.get("ok"):
+            raise ConnectionError(hello.get("error", "handshake failed"))
+        self._sock.settimeout(None)
+        self._reader = threading.Thread(target=self._read_acks, daemon=True)
+        self._reader.start()
+        return hello
+
+    def run(self, duration: float) -> None:
+        """Stream samples for `duration` seconds, then wait for the final acknowledgement."""
+        interval = 1.0 / (self.rate * len(self.members))
+        next_send = time.monotonic()
+        stop_at = next_send + duration
+        while time.monotonic() < stop_at:
+            member = self.members[self.sent % len(self.members)]
+            self._sock.sendall(self._next_line(member))
+            self.sent += 1
+            next_send += interval
+            delay = next_send - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        self.close()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Half-close the connection and wait until every sent sample is acknowledged."""
+        deadline = time.monotonic() + timeout
+        self._sock.shutdown(socket.SHUT_WR)
+        while self.acked < self.sent and time.monotonic() < deadline and self._reader.is_alive():
+            time.sleep(0.01)
+        self._sock.close()
+
+    def _next_line(self, member: str) -> bytes:
+        bpm = self._bpm[member] = max(40, min(200, self._bpm[member] + self._rng.randint(-3, 3)))
+        if self._rng.random() < self.invalid_ratio:
+            bpm = 400
+        measured_at = int(time.time() * 1000)
+        if self.compact:
+            return f"{member},{bpm},{measured_at}\n".encode()
+        return json.dumps({"member_id": member, "bpm": bpm, "measured_at": measured_at}).encode() + b"\n"
+
+    def _read_acks(self) -> None:
+        for line in self._file:
+            message = json.loads(line)
+            if "error" in message:
+                self.errors.append(message["error"])
+            if "ack" in message:
+                self.acked = max(self.acked, message["ack"])
+                self.accepted += message.get("accepted", 0)
+                self.rejected.extend(message.get("rejected", []))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--devices", type=int, default=4, help="concurrent streaming connections")
+    parser.add_argument("--members", type=int, default=10, help="members per device")
+    parser.add_argument("--rate", type=float, default=1.0, help="samples per second per member")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to stream")
+    parser.add_argument("--json", action="store_true", help="send JSON lines instead of the compact form")
+    parser.add_argument("--invalid-ratio", type=float, default=0.0, help="fraction of out-of-range samples")
+    parser.add_argument("--device-id", default=DEVICE_ID)
+    parser.add_argument("--api-key", default=API_KEY)
+    args = parser.parse_args()
+
+    devices = [
+        SimulatedDevice(args.host, args.port, [f"SIM{d:02d}{m:03d}" for m in range(args.members)], args.rate,
+                        compact=not args.json, device_id=args.device_id, api_key=args.api_key,
+                        invalid_ratio=args.invalid_ratio)
+        for d in range(args.devices)
+    ]
+    for device in devices:
+        device.connect()
+    started = time.monotonic()
+    threads = [threading.Thread(target=device.run, args=(args.duration,)) for device in devices]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    sent = sum(d.sent for d in devices)
+    print(f"devices={args.devices} sent={sent} acked={sum(d.acked for d in devices)} "
+          f"accepted={sum(d.accepted for d in devices)} rejected={sum(len(d.rejected) for d in devices)} "
+          f"errors={sum(len(d.errors) for d in devices)} throughput={sent / elapsed:.1f} samples/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Local stub of the PumpUp backend for benchmarks.
+
+Answers every POST/GET with a small JSON body after an optional delay, over HTTP/1.1 keep-alive,
+and records how many requests each path received.
+"""
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class StubBackend:
+    """Threaded HTTP server standing in for the backend.
+
+    Attributes:
+        delay (float): Seconds slept before each response (simulates a slow upstream).
+        status (int): Status code returned.
+        hits (Counter): Requests received per path (without query string).
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, delay: float = 0.0, status: int = 200):
+        """Initialize a StubBackend (port 0 picks a free port).
+
+        Args:
+            host (str): Bind address.
+            port (int): Bind port.
+            delay (float): Response delay in seconds.
+            status (int): Status code returned.
+        """
+        self.delay = delay
+        self.status = status
+        self.hits = Counter()
+        self.bodies = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                with stub._lock:
+                    stub.hits[self.path.split("?", 1)[0]] += 1
+                    if body:
+                        stub.bodies.append(body)
+                if stub.delay:
+                    time.sleep(stub.delay)
+                payload = json.dumps({"ok": True}).encode()
+                self.send_response(stub.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            def handle_error(self, request, client_address):
+                pass  # clients dropping keep-alive connections at shutdown
+
+        self.server = Server((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the stub."""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubBackend":
+        """Serve in a background thread."""
+        self._thread = threading.Thread(target=self.server.serve_forever, name="stub-backend", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the socket."""
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a stub backend for local testing.")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--delay", type=float, default=0.0, help="response delay in seconds")
+    parser.add_argument("--status", type=int, default=200)
+    args = parser.parse_args()
+    stub = StubBackend(port=args.port, delay=args.delay, status=args.status).start()
+    print(f"Stub backend listening on {stub.url} (delay={args.delay}s, status={args.status})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.stop()
@@ -0,0 +1,87 @@
+"""
+Heart rate writes: one transaction per request versus the write-behind buffer.
+
+Starts the edge service once per HR_WRITE_MODE (direct, group, async), drives each with the same
+load of small POST /api/v1/heart-rate/batch requests (a few samples each, like devices posting
+every beat) and reports request latency and throughput, plus the commit sizes and commit latency
+of the buffer (from /api/v1/heart-rate/stats). Use --synchronous full to make every commit sync
+the WAL, as on a device that must not lose acknowledged samples on power loss.
+
+    python -m benchmarks.write_behind --duration 10 --concurrency 32 --samples 2
+"""
+import argparse
+import random
+import time
+from typing import Dict
+
+import requests
+
+from benchmarks.harness import EdgeService, format_summary, run_clients, save_results
+from benchmarks.stub_backend import StubBackend
+
+
+def drive(base_url: str, duration: float, concurrency: int, samples: int) -> Dict:
+    """Post `samples`-sample batches back to back from `concurrency` clients for `duration` seconds.
+
+    Returns:
+        Dict: Request latency summary.
+    """
+    url = f"{base_url}/api/v1/heart-rate/batch"
+
+    def client(index: int, session: requests.Session, stop_at: float, record) -> None:
+        rng = random.Random(index)
+        while time.monotonic() < stop_at:
+            body = {"samples": [{"member_id": f"WB{rng.randrange(200):04d}", "bpm": rng.randint(60, 180)}
+                                for _ in range(samples)]}
+            record("requests", lambda: session.post(url, json=body, timeout=30).status_code == 200)
+
+    return run_clients(concurrency, duration, client)["requests"]
+
+
+def run(mode: str, args: argparse.Namespace, stub_url: str) -> Dict:
+    """Measure one HR_WRITE_MODE."""
+    env = {
+        "HR_WRITE_MODE": mode,
+        "HR_WRITE_BATCH_ROWS": str(args.batch_rows),
+        "HR_WRITE_BATCH_MS": str(args.batch_ms),
+        "DB_SYNCHRONOUS": args.synchronous,
+        "HR_STREAM_ENABLED": "false",
+        "HR_RETENTION_DAYS": "0",
+    }
+    with EdgeService(args.mode, stub_url, extra_env=env) as service:
+        result = {"requests": drive(service.base_url, args.duration, args.concurrency, args.samples)}
+        stats = requests.get(f"{service.base_url}/api/v1/heart-rate/stats", timeout=10).json()["write_buffer"]
+    row = result["requests"]
+    print(f"\nHR_WRITE_MODE={mode}")
+    print(f"  requests: {format_summary(row)}")
+    if mode != "direct":
+        size, latency = stats["commit_size"], stats["commit_latency"]
+        result.update(commits=stats["commits"], commit_size=size, commit_latency=latency)
+        print(f"  commits: {stats['commits']}, size mean {size['mean']}, p95 {size['p95']}, max {size['max']}; "
+              f"latency p50 {latency['p50_ms']} ms, p95 {latency['p95_ms']} ms")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["flask", "asgi"], default="flask")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=32, help="client threads")
+    parser.add_argument("--samples", type=int, default=2, help="samples per request")
+    parser.add_argument("--batch-rows", type=int, default=500)
+    parser.add_argument("--batch-ms", type=float, default=50.0)
+    parser.add_argument("--synchronous", choices=["normal", "full"], default="normal", help="DB_SYNCHRONOUS")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    stub = StubBackend().start()
+    try:
+        results = {mode: run(mode, args, stub.url) for mode in ("direct", "group", "async")}
+    finally:
+        stub.stop()
+    if args.output:
+        save_results(args.output, vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+"""Startup steps shared by the entry points of the PumpUp Gym Edge Service (app.py and writer.py).
+
+Import it after load_env_file(): the bounded contexts read their settings on import.
+"""
+from health.application.services import HR_RETENTION_DAYS
+
+
+def start_background_writers(access_service, heart_rate_service) -> None:
+    """Backfill the occupancy series, start the outbox dispatcher and the retention worker (one process per database)."""
+    # Build the occupancy time series from the stored visits the first time it is empty
+    backfilled = access_service.backfill_occupancy_series()
+    if backfilled:
+        print(f"* Occupancy series backfilled from check-ins: {backfilled} buckets")
+
+    # Deliver check-in/check-out notifications queued in the outbox
+    access_service.start_backend_event_dispatcher()
+
+    # Move old heart rate records to compressed cold segments in the background
+    if heart_rate_service.start_retention_worker():
+        print(f"* Heart rate retention enabled: records older than {HR_RETENTION_DAYS:g} days go to cold storage")
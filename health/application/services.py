@@ -1,8 +1,96 @@
 """Application services for the simplified health bounded context."""
-from typing import Dict
+import base64
+import json
+import math
+import os
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Union
 
+from health.domain import analytics
 from health.domain.services import HeartRateService
+from health.infrastructure.caches import analytics_cache
+from health.infrastructure.cold_storage import cold_store
+from health.infrastructure.forwarding import forward_coalescer, forward_queue
+from health.infrastructure.live_buffers import LIVE_HORIZON_SECONDS, ROLLUP_LAYOUT, live_heart_rate_store
 from health.infrastructure.repositories import HeartRateRecordRepository
+from health.infrastructure.write_behind import heart_rate_write_buffer
+from shared.infrastructure.database import incremental_vacuum
+from shared.infrastructure.workers import PeriodicWorker
+from shared.infrastructure.writer import submit_write, write_command
+
+HR_MAX_BPM = float(os.getenv("HR_MAX_BPM", "190"))
+HR_ANALYTICS_ROLLING_WINDOW = float(os.getenv("HR_ANALYTICS_ROLLING_WINDOW", "60"))
+HR_ANALYTICS_VISIT_GAP = float(os.getenv("HR_ANALYTICS_VISIT_GAP", "1800"))
+HR_ANALYTICS_MAX_GAP = float(os.getenv("HR_ANALYTICS_MAX_GAP", "10"))
+HR_ANALYTICS_RECOVERY_HORIZON = float(os.getenv("HR_ANALYTICS_RECOVERY_HORIZON", "60"))
+HR_ANALYTICS_MAX_POINTS = int(os.getenv("HR_ANALYTICS_MAX_POINTS", "300"))
+HR_RETENTION_DAYS = float(os.getenv("HR_RETENTION_DAYS", "30"))
+HR_RETENTION_INTERVAL = float(os.getenv("HR_RETENTION_INTERVAL", "3600"))
+HR_COLD_SEGMENT_MAX_ROWS = int(os.getenv("HR_COLD_SEGMENT_MAX_ROWS", "200000"))
+
+# Heart rate inserts go through the single writer when WRITER_MODE=client
+write_command("health.save_heart_rate")(HeartRateRecordRepository.save)
+write_command("health.save_heart_rate_batch")(HeartRateRecordRepository.save_many)
+
+
+def encode_cursor(position: Dict) -> str:
+    """Encode a keyset position as an opaque URL-safe cursor."""
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict:
+    """Decode a cursor produced by encode_cursor().
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(position, dict) or "t" not in position:
+        raise ValueError("Invalid cursor")
+    return position
+
+
+class HeartRateHistoryPage:
+    """One page of a member's heart rate history, produced lazily.
+
+    Iterating yields the items while they are read from the database; `next_cursor` is set once
+    the iteration has finished and more items exist after this page.
+
+    Attributes:
+        limit (int): Maximum number of items in the page.
+        next_cursor (Optional[str]): Cursor of the next page, or None on the last page.
+    """
+
+    def __init__(self, items: Iterator[Dict], limit: int, cursor_of: Callable[[Dict], str]):
+        """Initialize a HeartRateHistoryPage.
+
+        Args:
+            items (Iterator[Dict]): Items in order; may yield more than `limit` (one extra is enough).
+            limit (int): Page size.
+            cursor_of (Callable[[Dict], str]): Builds the cursor resuming after an item.
+        """
+        self.limit = limit
+        self.next_cursor: Optional[str] = None
+        self._items = items
+        self._cursor_of = cursor_of
+
+    def __iter__(self) -> Iterator[Dict]:
+        last = None
+        count = 0
+        try:
+            for item in self._items:
+                if count == self.limit:
+                    self.next_cursor = self._cursor_of(last)
+                    break
+                count += 1
+                last = item
+                yield item
+        finally:
+            # Release the database cursor when the page ends early or the client goes away
+            self._items.close()
 
 
 class HeartRateApplicationService:
@@ -12,10 +100,19 @@ class HeartRateApplicationService:
         """Initialize the HeartRateApplicationService."""
         self.hr_repository = HeartRateRecordRepository()
         self.hr_service = HeartRateService()
+        self.live_store = live_heart_rate_store
+        self.analytics_cache = analytics_cache
+        self.cold_store = cold_store
+        self.forward_queue = forward_queue
+        self.forward_coalescer = forward_coalescer
+        self.write_buffer = heart_rate_write_buffer
 
     def record_heart_rate(self, member_id: str, bpm: float) -> Dict:
         """Record a heart rate measurement for a member (no equipment session required).
 
+        With HR_WRITE_MODE set the record is committed by the write-behind buffer and
+        record_id is None.
+
         Args:
             member_id (str): Member identifier (NFC UID).
             bpm (float): Heart rate in BPM.
@@ -25,7 +122,12 @@ class HeartRateApplicationService:
         """
         try:
             record = self.hr_service.create_record(member_id=member_id, bpm=bpm)
-            saved_record = self.hr_repository.save(record)
+            if self.write_buffer.enabled:
+                self.write_buffer.add([record])
+                saved_record = record
+            else:
+                saved_record = submit_write("health.save_heart_rate", record)
+            self.live_store.add(saved_record.member_id, saved_record.bpm, saved_record.measured_at)
 
             return {
                 "success": True,
@@ -39,3 +141,315 @@ class HeartRateApplicationService:
                 "success": False,
                 "error": str(e)
             }
+
+    def record_heart_rate_batch(self, samples: List[Dict]) -> Dict:
+        """Validate and persist a batch of heart rate samples.
+
+        Invalid samples are reported per item; valid ones are stored in a single transaction, or
+        handed to the write-behind buffer when HR_WRITE_MODE is set.
+
+        Args:
+            samples (List[Dict]): Samples with member_id, bpm and optional measured_at.
+
+        Returns:
+            Dict: Number of accepted samples and the rejected ones with their index and error.
+        """
+        records, rejects = self.hr_service.create_records(samples)
+        if self.write_buffer.enabled:
+            accepted = self.write_buffer.add(records)
+        else:
+            accepted = submit_write("health.save_heart_rate_batch", records)
+        for record in records:
+            self.live_store.add(record.member_id, record.bpm, record.measured_at)
+        return {
+            "success": True,
+            "received": len(samples),
+            "accepted": accepted,
+            "rejected": rejects
+        }
+
+    def observe_heart_rate(self, member_id: str, bpm: float) -> bool:
+        """Feed a sample into the live buffers without persisting it (e.g. proxied samples).
+
+        Args:
+            member_id (str): Member identifier (NFC UID).
+            bpm (float): Heart rate in BPM.
+
+        Returns:
+            bool: True if the sample was valid and recorded.
+        """
+        try:
+            record = self.hr_service.create_record(member_id=member_id, bpm=bpm)
+        except ValueError:
+            return False
+        self.live_store.add(record.member_id, record.bpm, record.measured_at)
+        return True
+
+    def get_live_heart_rate(self, member_id: str, resolution: str = "10", window_seconds: int = 300) -> Dict:
+        """Get a member's recent heart rate from the in-memory buffers.
+
+        Args:
+            member_id (str): Member identifier (NFC UID).
+            resolution (str): "raw" for raw samples, or a rollup resolution in seconds (1, 10, 60).
+            window_seconds (int): How far back to look, in seconds (up to LIVE_HORIZON_SECONDS).
+
+        Returns:
+            Dict: Latest sample and the raw samples or rollup buckets of the window.
+
+        Raises:
+            ValueError: If the resolution is not supported or the window is out of range.
+        """
+        if not 0 < window_seconds <= LIVE_HORIZON_SECONDS:
+            raise ValueError(f"window must be between 1 and {LIVE_HORIZON_SECONDS} seconds")
+        if resolution != "raw" and (not resolution.isdigit() or int(resolution) not in ROLLUP_LAYOUT):
+            supported = ", ".join(["raw"] + [str(r) for r in ROLLUP_LAYOUT])
+            raise ValueError(f"Unsupported resolution {resolution!r} (expected one of {supported})")
+
+        buffer = self.live_store.get(str(member_id))
+        since = (datetime.now() - timedelta(seconds=window_seconds)).timestamp()
+        if buffer is None:
+            points = []
+        elif resolution == "raw":
+            points = buffer.latest(since)
+        else:
+            points = buffer.query_rollup(int(resolution), since)
+        return {
+            "member_id": str(member_id),
+            "resolution": resolution,
+            "window_seconds": window_seconds,
+            "latest": buffer.last() if buffer else None,
+            "points": points
+        }
+
+    def get_live_store_stats(self) -> Dict:
+        """Get footprint statistics of the live heart rate buffers.
+
+        Returns:
+            Dict: Tracked members, samples and memory use.
+        """
+        return self.live_store.stats()
+
+    def get_heart_rate_history(self, member_id: str, start: Union[str, float, datetime, None] = None,
+                               end: Union[str, float, datetime, None] = None, limit: int = 500,
+                               cursor: Optional[str] = None,
+                               bucket_seconds: Optional[int] = None) -> HeartRateHistoryPage:
+        """Get one page of a member's stored heart rate history in chronological order.
+
+        Raw records are paginated by a (measured_at, id) keyset cursor; with bucket_seconds the
+        records are downsampled on the fly into fixed-size buckets and paginated by bucket start.
+
+        Args:
+            member_id (str): Member identifier (NFC UID).
+            start: Inclusive start of the time range (ISO 8601, epoch seconds/milliseconds or datetime).
+            end: Exclusive end of the time range (same formats).
+            limit (int): Maximum items (records or buckets) in the page.
+            cursor (Optional[str]): next_cursor of the previous page.
+            bucket_seconds (Optional[int]): Downsampling bucket size in seconds.
+
+        Returns:
+            HeartRateHistoryPage: Lazily produced page.
+
+        Raises:
+            ValueError: If the time range, cursor or bucket size is invalid.
+        """
+        start = self._parse_time_bound(start, "from")
+        end = self._parse_time_bound(end, "to")
+        if limit <= 0:
+            raise ValueError("limit must be positive")
+        position = decode_cursor(cursor) if cursor else None
+        if position is not None and position.get("b") != bucket_seconds:
+            raise ValueError("Cursor does not match the requested bucket size")
+
+        if bucket_seconds is None:
+            after = None
+            if position is not None:
+                try:
+                    after = (datetime.fromisoformat(position["t"]), int(position["id"]))
+                except (KeyError, TypeError, ValueError):
+                    raise ValueError("Invalid cursor")
+            records = self.hr_repository.iter_by_member_id(str(member_id), start, end, after, limit + 1)
+            items = (
+                {"id": record.id, "bpm": record.bpm, "measured_at": record.measured_at.isoformat()}
+                for record in records
+            )
+            return HeartRateHistoryPage(
+                items, limit, lambda item: encode_cursor({"t": item["measured_at"], "id": item["id"], "b": None})
+            )
+
+        if bucket_seconds <= 0:
+            raise ValueError("bucket must be a positive number of seconds")
+        if position is not None:
+            try:
+                resume_at = datetime.fromisoformat(position["t"])
+            except (TypeError, ValueError):
+                raise ValueError("Invalid cursor")
+            start = max(start, resume_at) if start else resume_at
+        records = self.hr_repository.iter_by_member_id(str(member_id), start, end)
+        items = (
+            dict(bucket, bucket_start=bucket["bucket_start"].isoformat())
+            for bucket in self.hr_service.downsample(records, bucket_seconds)
+        )
+
+        def next_bucket_cursor(item: Dict) -> str:
+            resume_at = datetime.fromisoformat(item["bucket_start"]) + timedelta(seconds=bucket_seconds)
+            return encode_cursor({"t": resume_at.isoformat(), "b": bucket_seconds})
+
+        return HeartRateHistoryPage(items, limit, next_bucket_cursor)
+
+    def get_heart_rate_analytics(self, member_id: str, window_seconds: int = 86400,
+                                 max_hr: Optional[float] = None,
+                                 rolling_window: Optional[float] = None) -> Dict:
+        """Analyze a member's stored heart rate over the last `window_seconds`.
+
+        Loads the samples as arrays in one query and computes time in zones, rolling mean and
+        standard deviation, peak/recovery rates and per-visit summaries (visits are separated by
+        HR_ANALYTICS_VISIT_GAP seconds without data). Results are cached per (member, window,
+        parameters) for HR_ANALYTICS_CACHE_TTL seconds.
+
+        Args:
+            member_id (str): Member identifier (NFC UID).
+            window_seconds (int): How far back to look, in seconds.
+            max_hr (Optional[float]): Maximum heart rate for the zones (default HR_MAX_BPM).
+            rolling_window (Optional[float]): Rolling window in seconds (default HR_ANALYTICS_ROLLING_WINDOW).
+
+        Returns:
+            Dict: Analytics of the window.
+
+        Raises:
+            ValueError: If a parameter is not a positive finite number.
+        """
+        max_hr = HR_MAX_BPM if max_hr is None else max_hr
+        rolling_window = HR_ANALYTICS_ROLLING_WINDOW if rolling_window is None else rolling_window
+        if not all(math.isfinite(value) and value > 0 for value in (window_seconds, max_hr, rolling_window)):
+            raise ValueError("window, max_hr and rolling must be positive")
+
+        key = (str(member_id), window_seconds, max_hr, rolling_window)
+        cached = self.analytics_cache.get(key)
+        if cached is not None:
+            return cached
+
+        end = datetime.now()
+        t, bpm = self.hr_repository.load_series(str(member_id), end - timedelta(seconds=window_seconds))
+        result = analytics.analyze(
+            t, bpm, max_hr=max_hr, rolling_window=rolling_window, visit_gap=HR_ANALYTICS_VISIT_GAP,
+            max_gap=HR_ANALYTICS_MAX_GAP, recovery_horizon=HR_ANALYTICS_RECOVERY_HORIZON,
+            max_points=HR_ANALYTICS_MAX_POINTS,
+        )
+        result = dict(result, member_id=str(member_id), window_seconds=window_seconds, max_hr=max_hr,
+                      rolling_window=rolling_window, computed_at=end.isoformat())
+        self.analytics_cache.put(key, result)
+        return result
+
+    def get_analytics_cache_stats(self) -> Dict:
+        """Get hit/miss statistics of the analytics cache.
+
+        Returns:
+            Dict: Cache statistics.
+        """
+        return self.analytics_cache.stats()
+
+    def archive_old_records(self, retention_days: float = HR_RETENTION_DAYS,
+                            segment_max_rows: int = HR_COLD_SEGMENT_MAX_ROWS) -> Dict:
+        """Move records measured more than `retention_days` ago into cold segments.
+
+        Each batch is written to a new segment file first, then deleted from the hot table in short
+        transactions; a segment stays marked pending until its rows are gone, so a run interrupted
+        in between is completed by the next one (readers skip the duplicates meanwhile). Freed
+        pages are then released with incremental vacuum.
+
+        Args:
+            retention_days (float): Age in days after which records are archived.
+            segment_max_rows (int): Maximum rows per segment file.
+
+        Returns:
+            Dict: Segments written, rows archived and pages released.
+        """
+        archived = 0
+        segments = 0
+        for segment in self.cold_store.pending_segments():
+            self.hr_repository.delete_by_ids(segment.all_ids().tolist())
+            self.cold_store.mark_archived(segment)
+
+        cutoff = datetime.now() - timedelta(days=retention_days)
+        while True:
+            columns = self.hr_repository.find_columns_older_than(cutoff, segment_max_rows)
+            if columns is None:
+                break
+            segment = self.cold_store.add_segment(*columns)
+            self.hr_repository.delete_by_ids(columns[1].tolist())
+            self.cold_store.mark_archived(segment)
+            archived += segment.rows
+            segments += 1
+            if segment.rows < segment_max_rows:
+                break
+        released = incremental_vacuum() if archived else 0
+        return {"segments": segments, "archived_rows": archived, "released_pages": released}
+
+    def start_retention_worker(self, interval: float = HR_RETENTION_INTERVAL) -> Optional[PeriodicWorker]:
+        """Archive old records now and then every `interval` seconds (disabled if HR_RETENTION_DAYS <= 0).
+
+        Args:
+            interval (float): Seconds between two archive runs.
+
+        Returns:
+            Optional[PeriodicWorker]: The started background worker, or None if retention is disabled.
+        """
+        if HR_RETENTION_DAYS <= 0:
+            return None
+        worker = PeriodicWorker("hr-retention", interval, self.archive_old_records)
+        worker.start()
+        worker.wake()
+        return worker
+
+    def get_cold_storage_stats(self) -> Dict:
+        """Get segment counts and sizes of the cold storage.
+
+        Returns:
+            Dict: Cold storage statistics.
+        """
+        return self.cold_store.stats()
+
+    def start_forward_replayer(self, replay: bool = True) -> None:
+        """Start replaying heart rate samples queued while the backend was unreachable.
+
+        Also starts the per-member coalescing of forwarded samples when HR_FORWARD_COALESCE_MS is set.
+
+        Args:
+            replay (bool): Replay from this process (False in single-writer worker processes).
+        """
+        self.forward_queue.start(replay)
+        self.forward_coalescer.start()
+
+    def start_write_buffer(self) -> None:
+        """Start committing buffered heart rate records in batches (no-op with HR_WRITE_MODE=direct)."""
+        self.write_buffer.start()
+
+    def get_write_buffer_stats(self) -> Dict:
+        """Get mode, pending rows and commit statistics of the heart rate write-behind buffer.
+
+        Returns:
+            Dict: Write-behind buffer statistics.
+        """
+        return self.write_buffer.stats()
+
+    def get_forward_queue_stats(self) -> Dict:
+        """Get depth, replay lag and delivery counters of the heart rate forward queue.
+
+        Returns:
+            Dict: Forward queue statistics.
+        """
+        return self.forward_queue.stats()
+
+    def _parse_time_bound(self, value: Union[str, float, datetime, None], name: str) -> Optional[datetime]:
+        """Parse a range bound; numeric strings (query params) are epoch seconds or milliseconds."""
+        if value is None or value == "":
+            return None
+        if isinstance(value, str):
+            try:
+                value = float(value)
+            except ValueError:
+                pass
+        try:
+            return self.hr_service.parse_measured_at(value)
+        except (ValueError, TypeError, OverflowError, OSError):
+            raise ValueError(f"Invalid {name} timestamp")
@@ -0,0 +1,189 @@
+"""
+Vectorized heart rate analytics for the simplified health bounded context.
+
+Works on a member's samples as two NumPy arrays (timestamps in seconds and BPM, ordered by time)
+so every metric is a handful of array operations instead of a Python loop over entities.
+Timestamps are seconds since BUCKET_EPOCH (naive local time, like the stored measured_at).
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from health.domain.services import BUCKET_EPOCH
+
+# Lower bounds of zones 1-5 as a fraction of the maximum heart rate; below zone 1 is "rest"
+ZONE_BOUNDS = (0.5, 0.6, 0.7, 0.8, 0.9)
+ZONE_NAMES = ("rest", "zone1", "zone2", "zone3", "zone4", "zone5")
+
+
+def to_datetime(seconds: float) -> datetime:
+    """Convert seconds since BUCKET_EPOCH back into a naive datetime."""
+    return BUCKET_EPOCH + timedelta(seconds=float(seconds))
+
+
+def sample_durations(t: np.ndarray, max_gap: float) -> np.ndarray:
+    """Time each sample stands for: the interval to the next sample.
+
+    Intervals longer than `max_gap` (sensor off, member left) and the last sample count as the
+    typical sampling interval instead.
+
+    Args:
+        t (np.ndarray): Timestamps in seconds, ascending.
+        max_gap (float): Longest interval still considered continuous, in seconds.
+
+    Returns:
+        np.ndarray: Duration of each sample in seconds.
+    """
+    if t.size < 2:
+        return np.ones_like(t)
+    intervals = np.diff(t)
+    continuous = intervals <= max_gap
+    typical = float(np.median(intervals[continuous])) if continuous.any() else 1.0
+    return np.append(np.where(continuous, intervals, typical), typical)
+
+
+def time_in_zones(bpm: np.ndarray, durations: np.ndarray, max_hr: float) -> Dict[str, float]:
+    """Seconds spent in each heart rate zone.
+
+    Args:
+        bpm (np.ndarray): Heart rate samples.
+        durations (np.ndarray): Duration of each sample in seconds.
+        max_hr (float): Maximum heart rate the zones are relative to.
+
+    Returns:
+        Dict[str, float]: Seconds per zone name.
+    """
+    zones = np.digitize(bpm / max_hr, ZONE_BOUNDS)
+    seconds = np.bincount(zones, weights=durations, minlength=len(ZONE_NAMES))
+    return {name: round(float(value), 1) for name, value in zip(ZONE_NAMES, seconds)}
+
+
+def rolling_stats(t: np.ndarray, bpm: np.ndarray, window: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Trailing time-window mean and variance at every sample (irregular sampling allowed).
+
+    Uses prefix sums, so the cost is O(n log n) for the window lookups regardless of window size.
+
+    Args:
+        t (np.ndarray): Timestamps in seconds, ascending.
+        bpm (np.ndarray): Heart rate samples.
+        window (float): Window length in seconds (samples in (t - window, t]).
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (rolling mean, rolling variance).
+    """
+    sums = np.concatenate(([0.0], np.cumsum(bpm)))
+    squares = np.concatenate(([0.0], np.cumsum(bpm * bpm)))
+    end = np.arange(1, t.size + 1)
+    start = np.searchsorted(t, t - window, side="right")
+    count = end - start
+    mean = (sums[end] - sums[start]) / count
+    variance = np.maximum((squares[end] - squares[start]) / count - mean * mean, 0.0)
+    return mean, variance
+
+
+def split_visits(t: np.ndarray, visit_gap: float) -> List[Tuple[int, int]]:
+    """Split the series into visits wherever no sample arrived for more than `visit_gap` seconds.
+
+    Returns:
+        List[Tuple[int, int]]: (start index, end index exclusive) of each visit.
+    """
+    if t.size == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(t) > visit_gap) + 1
+    bounds = np.concatenate(([0], breaks, [t.size]))
+    return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+
+def rate_of_change(t: np.ndarray, smoothed: np.ndarray, horizon: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Change of the smoothed heart rate over the following `horizon` seconds, in BPM per minute.
+
+    Args:
+        t (np.ndarray): Timestamps of one visit, ascending.
+        smoothed (np.ndarray): Smoothed heart rate (e.g. rolling mean).
+        horizon (float): Look-ahead in seconds.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (change per minute, mask of samples with a full horizon).
+    """
+    ahead = np.interp(t + horizon, t, smoothed)
+    valid = t + horizon <= t[-1]
+    return (ahead - smoothed) * (60.0 / horizon), valid
+
+
+def summarize_visit(t: np.ndarray, bpm: np.ndarray, durations: np.ndarray, smoothed: np.ndarray,
+                    max_hr: float, recovery_horizon: float) -> Dict:
+    """Summary of one visit: duration, BPM statistics, zones, peak effort and recovery.
+
+    Peak is the highest rolling mean; heart rate recovery is how far the rolling mean dropped
+    `recovery_horizon` seconds after the peak. Peak rise/recovery rates are the fastest increase
+    and decrease of the rolling mean over the horizon.
+
+    Returns:
+        Dict: Visit summary (JSON-serializable).
+    """
+    change, valid = rate_of_change(t, smoothed, recovery_horizon)
+    peak = int(np.argmax(smoothed))
+    recovery = None
+    if t[peak] + recovery_horizon <= t[-1]:
+        recovery = round(float(smoothed[peak] - np.interp(t[peak] + recovery_horizon, t, smoothed)), 1)
+    return {
+        "start": to_datetime(t[0]).isoformat(),
+        "end": to_datetime(t[-1]).isoformat(),
+        "duration_seconds": round(float(t[-1] - t[0]), 1),
+        "samples": int(t.size),
+        "avg_bpm": round(float(np.average(bpm, weights=durations)), 1),
+        "min_bpm": float(bpm.min()),
+        "max_bpm": float(bpm.max()),
+        "time_in_zones": time_in_zones(bpm, durations, max_hr),
+        "peak": {"bpm": round(float(smoothed[peak]), 1), "at": to_datetime(t[peak]).isoformat()},
+        "recovery_bpm": recovery,
+        "max_rise_bpm_per_min": round(float(change[valid].max()), 1) if valid.any() else None,
+        "max_recovery_bpm_per_min": round(float(-change[valid].min()), 1) if valid.any() else None,
+    }
+
+
+def analyze(t: np.ndarray, bpm: np.ndarray, max_hr: float, rolling_window: float, visit_gap: float,
+            max_gap: float, recovery_horizon: float, max_points: int) -> Dict:
+    """Compute zones, rolling statistics, peak/recovery rates and per-visit summaries.
+
+    Args:
+        t (np.ndarray): Timestamps in seconds since BUCKET_EPOCH, ascending.
+        bpm (np.ndarray): Heart rate samples.
+        max_hr (float): Maximum heart rate the zones are relative to.
+        rolling_window (float): Rolling window in seconds.
+        visit_gap (float): Silence in seconds that separates two visits.
+        max_gap (float): Longest interval counted as continuous time, in seconds.
+        recovery_horizon (float): Look-ahead for recovery/rise rates, in seconds.
+        max_points (int): Maximum points of the returned rolling series.
+
+    Returns:
+        Dict: Analytics (JSON-serializable).
+    """
+    if t.size == 0:
+        return {"samples": 0, "time_in_zones": time_in_zones(bpm, np.zeros(0), max_hr), "rolling": [], "visits": []}
+
+    durations = sample_durations(t, max_gap)
+    mean = np.empty_like(bpm)
+    variance = np.empty_like(bpm)
+    visits = []
+    # Rolling windows and rates never span two visits
+    for start, end in split_visits(t, visit_gap):
+        mean[start:end], variance[start:end] = rolling_stats(t[start:end], bpm[start:end], rolling_window)
+        visits.append(summarize_visit(t[start:end], bpm[start:end], durations[start:end], mean[start:end],
+                                      max_hr, recovery_horizon))
+
+    points = np.unique(np.linspace(0, t.size - 1, num=min(max_points, t.size)).astype(np.int64))
+    return {
+        "samples": int(t.size),
+        "from": to_datetime(t[0]).isoformat(),
+        "to": to_datetime(t[-1]).isoformat(),
+        "avg_bpm": round(float(np.average(bpm, weights=durations)), 1),
+        "time_in_zones": time_in_zones(bpm, durations, max_hr),
+        "rolling": [
+            {"at": to_datetime(t[i]).isoformat(), "mean": round(float(mean[i]), 1),
+             "std": round(float(np.sqrt(variance[i])), 2)}
+            for i in points.tolist()
+        ],
+        "visits": visits,
+    }
@@ -97,3 +97,32 @@ class HeartRateRecord:
         self.bpm = bpm
         self.measured_at = measured_at
         self.created_at = created_at or datetime.now()
+
+
+class QueuedHeartRate:
+    """Represents a heart rate sample waiting to be forwarded to the backend.
+
+    Attributes:
+        id (int): Position in the forward queue (samples are replayed in id order).
+        member_id (str): Identifier for the member.
+        payload (dict): JSON body sent to the backend.
+        attempts (int): Number of failed replay attempts so far.
+        created_at (datetime): Timestamp when the sample was queued.
+    """
+
+    def __init__(self, member_id: str, payload: dict, attempts: int = 0,
+                 created_at: Optional[datetime] = None, id: Optional[int] = None):
+        """Initialize a QueuedHeartRate instance.
+
+        Args:
+            member_id (str): Member ID / NFC UID.
+            payload (dict): JSON body for the backend.
+            attempts (int, optional): Failed replay attempts so far.
+            created_at (datetime, optional): Queue timestamp.
+            id (int, optional): Queue position.
+        """
+        self.id = id
+        self.member_id = member_id
+        self.payload = payload
+        self.attempts = attempts
+        self.created_at = created_at or datetime.now()
@@ -1,7 +1,15 @@
 """Domain services for the simplified health bounded context."""
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+
 from health.domain.entities import HeartRateRecord
 
+MIN_BPM = 30
+MAX_BPM = 220
+
+# Buckets are aligned on multiples of their size since this (naive, local) instant
+BUCKET_EPOCH = datetime(1970, 1, 1)
+
 
 class HeartRateService:
     """Service for managing heart rate records."""
@@ -26,7 +34,7 @@ class HeartRateService:
         """
         try:
             bpm = float(bpm)
-            if not (30 <= bpm <= 220):
+            if not (MIN_BPM <= bpm <= MAX_BPM):
                 raise ValueError("Invalid BPM value: must be between 30 and 220")
         except (ValueError, TypeError):
             raise ValueError("Invalid BPM format")
@@ -38,3 +46,123 @@ class HeartRateService:
             bpm=bpm,
             measured_at=measured_at
         )
+
+    @staticmethod
+    def create_records(samples: List[Dict]) -> Tuple[List[HeartRateRecord], List[Dict]]:
+        """Validate a batch of samples in a single pass.
+
+        Each sample is a dict with member_id, bpm and an optional measured_at (ISO 8601 string or
+        epoch seconds/milliseconds). Invalid samples are reported instead of failing the batch.
+
+        The pass is plain Python rather than numpy arrays: samples are heterogeneous JSON with a
+        per-item error to report, and most of the cost is building the HeartRateRecord entities,
+        which arrays do not save.
+
+        Args:
+            samples (List[Dict]): Raw samples.
+
+        Returns:
+            Tuple[List[HeartRateRecord], List[Dict]]: (valid records, rejects as {index, error}).
+        """
+        records = []
+        rejects = []
+        now = datetime.now()
+        for index, sample in enumerate(samples):
+            if not isinstance(sample, dict):
+                rejects.append({"index": index, "error": "Sample must be an object"})
+                continue
+            member_id = sample.get("member_id")
+            if member_id is None or str(member_id) == "":
+                rejects.append({"index": index, "error": "Missing member_id"})
+                continue
+            try:
+                bpm = float(sample.get("bpm"))
+            except (ValueError, TypeError):
+                rejects.append({"index": index, "error": "Invalid BPM format"})
+                continue
+            if not (MIN_BPM <= bpm <= MAX_BPM):
+                rejects.append({"index": index, "error": f"Invalid BPM value: must be between {MIN_BPM} and {MAX_BPM}"})
+                continue
+            try:
+                measured_at = HeartRateService.parse_measured_at(sample.get("measured_at"), default=now)
+            except (ValueError, TypeError, OverflowError, OSError):
+                rejects.append({"index": index, "error": "Invalid measured_at format"})
+                continue
+            records.append(HeartRateRecord(member_id=str(member_id), bpm=bpm, measured_at=measured_at, created_at=now))
+        return records, rejects
+
+    @staticmethod
+    def parse_measured_at(value: Union[str, int, float, datetime, None], default: datetime = None) -> datetime:
+        """Parse a measurement timestamp into a naive local datetime.
+
+        Args:
+            value: ISO 8601 string, epoch seconds or milliseconds, datetime, or None.
+            default (datetime, optional): Returned when value is None (defaults to now).
+
+        Returns:
+            datetime: Parsed timestamp.
+
+        Raises:
+            ValueError: If the value cannot be parsed.
+        """
+        if value is None:
+            return default or datetime.now()
+        if isinstance(value, datetime):
+            parsed = value
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            # ESP32 clocks usually report milliseconds
+            seconds = value / 1000.0 if value > 1e11 else float(value)
+            return datetime.fromtimestamp(seconds)
+        elif isinstance(value, str):
+            parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+        else:
+            raise ValueError("Invalid measured_at format")
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone().replace(tzinfo=None)
+        return parsed
+
+    @staticmethod
+    def bucket_start(measured_at: datetime, bucket_seconds: int) -> datetime:
+        """Return the start of the fixed-size time bucket containing a timestamp.
+
+        Args:
+            measured_at (datetime): Measurement timestamp.
+            bucket_seconds (int): Bucket size in seconds.
+
+        Returns:
+            datetime: Bucket start.
+        """
+        offset = (measured_at - BUCKET_EPOCH).total_seconds()
+        return BUCKET_EPOCH + timedelta(seconds=int(offset // bucket_seconds) * bucket_seconds)
+
+    @staticmethod
+    def downsample(records: Iterable[HeartRateRecord], bucket_seconds: int) -> Iterator[Dict]:
+        """Aggregate chronologically ordered records into fixed-size time buckets.
+
+        Consumes the records lazily and yields each bucket as soon as it is complete, so a long
+        history is downsampled in constant memory. Empty buckets are skipped.
+
+        Args:
+            records (Iterable[HeartRateRecord]): Records ordered by measured_at.
+            bucket_seconds (int): Bucket size in seconds.
+
+        Returns:
+            Iterator[Dict]: Buckets with bucket_start, count, avg_bpm, min_bpm and max_bpm.
+        """
+        current = None
+        count = total = 0
+        low = high = 0.0
+        for record in records:
+            start = HeartRateService.bucket_start(record.measured_at, bucket_seconds)
+            if start != current:
+                if current is not None:
+                    yield {"bucket_start": current, "count": count, "avg_bpm": round(total / count, 1),
+                           "min_bpm": low, "max_bpm": high}
+                current, count, total, low, high = start, 0, 0.0, record.bpm, record.bpm
+            count += 1
+            total += record.bpm
+            low = min(low, record.bpm)
+            high = max(high, record.bpm)
+        if current is not None:
+            yield {"bucket_start": current, "count": count, "avg_bpm": round(total / count, 1),
+                   "min_bpm": low, "max_bpm": high}
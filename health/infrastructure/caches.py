@@ -0,0 +1,10 @@
+"""In-process caches for the simplified health bounded context."""
+import os
+
+from shared.infrastructure.cache import LRUCache
+
+HR_ANALYTICS_CACHE_SIZE = int(os.getenv("HR_ANALYTICS_CACHE_SIZE", "256"))
+HR_ANALYTICS_CACHE_TTL = float(os.getenv("HR_ANALYTICS_CACHE_TTL", "60"))
+
+# (member_id, window, parameters) -> analytics result; short TTL since windows end at "now"
+analytics_cache = LRUCache(max_entries=HR_ANALYTICS_CACHE_SIZE, ttl_seconds=HR_ANALYTICS_CACHE_TTL)
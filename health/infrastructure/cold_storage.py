@@ -0,0 +1,347 @@
+"""
+Cold storage of old heart rate records as immutable, compressed, columnar segment files.
+
+Rows older than the retention age leave the hot heart_rate_records table and are written to
+segment files. A segment holds, per member, one zlib block of columns sorted by
+(measured_at, id): id and measured_at/created_at (microseconds) delta-encoded as int64, BPM as
+float32. A JSON header maps each member to its block, so reading one member's history maps the
+file and decompresses only that member's block.
+
+File layout: SEGMENT_MAGIC, uint32 header length (little endian), JSON header, member blocks.
+"""
+import heapq
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from health.domain.services import BUCKET_EPOCH
+from shared.infrastructure.database import DATABASE_PATH
+
+logger = logging.getLogger(__name__)
+
+HR_COLD_STORAGE_DIR = os.getenv("HR_COLD_STORAGE_DIR", str(Path(DATABASE_PATH).with_suffix("")) + "_cold")
+HR_COLD_COMPRESSION_LEVEL = int(os.getenv("HR_COLD_COMPRESSION_LEVEL", "6"))
+
+SEGMENT_MAGIC = b"HRSEG01\n"
+SEGMENT_SUFFIX = ".seg"
+# Marker written before a segment's rows are deleted from the hot table, removed once they are
+PENDING_SUFFIX = ".pending"
+
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def to_micros(value: datetime) -> int:
+    """Convert a naive datetime into microseconds since BUCKET_EPOCH."""
+    return (value - BUCKET_EPOCH) // _MICROSECOND
+
+
+def from_micros(value: int) -> datetime:
+    """Convert microseconds since BUCKET_EPOCH back into a naive datetime."""
+    return BUCKET_EPOCH + timedelta(microseconds=int(value))
+
+
+class SegmentColumns:
+    """Rows of one member in a segment, as parallel arrays ordered by (measured_at, id)."""
+
+    def __init__(self, ids: np.ndarray, measured_at: np.ndarray, created_at: np.ndarray, bpm: np.ndarray):
+        self.ids = ids
+        self.measured_at = measured_at
+        self.created_at = created_at
+        self.bpm = bpm
+
+
+class ColdSegment:
+    """One memory-mapped segment file.
+
+    Attributes:
+        path (Path): Segment file.
+        rows (int): Rows in the segment.
+        members (Dict[str, list]): member_id -> [offset, length, rows, first measured_at, last measured_at].
+    """
+
+    def __init__(self, path: Path):
+        """Open and map a segment file.
+
+        Args:
+            path (Path): Segment file.
+
+        Raises:
+            ValueError: If the file is not a segment.
+        """
+        self.path = path
+        with open(path, "rb") as fh:
+            self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(SEGMENT_MAGIC)] != SEGMENT_MAGIC:
+            raise ValueError(f"{path} is not a heart rate segment")
+        start = len(SEGMENT_MAGIC)
+        (header_length,) = struct.unpack_from("<I", self._map, start)
+        header = json.loads(self._map[start + 4:start + 4 + header_length])
+        self._data_offset = start + 4 + header_length
+        self.rows: int = header["rows"]
+        self.min_measured_at: int = header["min_measured_at"]
+        self.max_measured_at: int = header["max_measured_at"]
+        self.members: Dict[str, list] = header["members"]
+
+    @property
+    def size_bytes(self) -> int:
+        """Size of the file on disk."""
+        return len(self._map)
+
+    def read_member(self, member_id: str) -> Optional[SegmentColumns]:
+        """Decompress one member's rows.
+
+        Args:
+            member_id (str): Member identifier.
+
+        Returns:
+            Optional[SegmentColumns]: The member's rows, or None if the segment has none.
+        """
+        entry = self.members.get(member_id)
+        if entry is None:
+            return None
+        offset, length, rows = entry[0], entry[1], entry[2]
+        start = self._data_offset + offset
+        raw = zlib.decompress(self._map[start:start + length])
+        ids = np.cumsum(np.frombuffer(raw, dtype="<i8", count=rows))
+        measured_at = np.cumsum(np.frombuffer(raw, dtype="<i8", count=rows, offset=8 * rows))
+        created_at = measured_at + np.frombuffer(raw, dtype="<i8", count=rows, offset=16 * rows)
+        bpm = np.frombuffer(raw, dtype="<f4", count=rows, offset=24 * rows)
+        return SegmentColumns(ids, measured_at, created_at, bpm)
+
+    def all_ids(self) -> np.ndarray:
+        """Return the ids of every row in the segment (used to finish an interrupted archive run)."""
+        return np.concatenate([self.read_member(member).ids for member in self.members] or [np.empty(0, "i8")])
+
+    @staticmethod
+    def write(path: Path, member_ids: np.ndarray, ids: np.ndarray, measured_at: np.ndarray,
+              created_at: np.ndarray, bpm: np.ndarray, level: int = HR_COLD_COMPRESSION_LEVEL) -> "ColdSegment":
+        """Write rows into a new segment file atomically (temporary file, fsync, rename).
+
+        Args:
+            path (Path): Destination file (must not exist).
+            member_ids (np.ndarray): Member identifier of each row (str objects).
+            ids (np.ndarray): Record ids.
+            measured_at (np.ndarray): Microseconds since BUCKET_EPOCH.
+            created_at (np.ndarray): Microseconds since BUCKET_EPOCH.
+            bpm (np.ndarray): Heart rate.
+            level (int): zlib compression level.
+
+        Returns:
+            ColdSegment: The new segment, opened.
+        """
+        order = np.lexsort((ids, measured_at, member_ids))
+        member_ids, ids, measured_at = member_ids[order], ids[order], measured_at[order]
+        created_at, bpm = created_at[order], bpm[order]
+        boundaries = np.flatnonzero(member_ids[1:] != member_ids[:-1]) + 1
+        starts = np.concatenate(([0], boundaries)).tolist()
+        ends = np.concatenate((boundaries, [len(ids)])).tolist()
+
+        blocks: List[bytes] = []
+        members: Dict[str, list] = {}
+        offset = 0
+        for start, end in zip(starts, ends):
+            member_measured_at = measured_at[start:end]
+            block = zlib.compress(
+                np.diff(ids[start:end], prepend=0).astype("<i8").tobytes()
+                + np.diff(member_measured_at, prepend=0).astype("<i8").tobytes()
+                + (created_at[start:end] - member_measured_at).astype("<i8").tobytes()
+                + bpm[start:end].astype("<f4").tobytes(),
+                level,
+            )
+            members[str(member_ids[start])] = [offset, len(block), end - start,
+                                               int(member_measured_at[0]), int(member_measured_at[-1])]
+            blocks.append(block)
+            offset += len(block)
+
+        header = json.dumps({
+            "version": 1,
+            "rows": int(len(ids)),
+            "min_measured_at": int(measured_at.min()),
+            "max_measured_at": int(measured_at.max()),
+            "created_at": datetime.now().isoformat(),
+            "members": members,
+        }).encode("utf-8")
+        temporary = path.with_name(path.name + ".tmp")
+        with open(temporary, "wb") as fh:
+            fh.write(SEGMENT_MAGIC)
+            fh.write(struct.pack("<I", len(header)))
+            fh.write(header)
+            for block in blocks:
+                fh.write(block)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(temporary, path)
+        return ColdSegment(path)
+
+
+class ColdStore:
+    """The set of segment files in a directory, queried together.
+
+    Attributes:
+        directory (Path): Directory holding the segments.
+    """
+
+    def __init__(self, directory: str = HR_COLD_STORAGE_DIR):
+        """Initialize a ColdStore (segments are loaded on first use).
+
+        Args:
+            directory (str): Directory holding the segments.
+        """
+        self.directory = Path(directory)
+        self._segments: Optional[List[ColdSegment]] = None
+        self._scanned_mtime: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def segments(self) -> List[ColdSegment]:
+        """Return the current segments, oldest first.
+
+        The directory is rescanned whenever its mtime changes, so a segment archived by the
+        retention worker of another process is visible here before its rows leave the hot table.
+        Segments already mapped are reused. A directory changed within the last second is rescanned
+        on every call, in case a later change fell into the same mtime tick.
+        """
+        try:
+            mtime = self.directory.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        with self._lock:
+            if (self._segments is None or mtime != self._scanned_mtime
+                    or (mtime is not None and time.time_ns() - mtime < 1_000_000_000)):
+                loaded = {segment.path: segment for segment in self._segments or []}
+                segments = []
+                if mtime is not None:
+                    for path in sorted(self.directory.glob("*" + SEGMENT_SUFFIX)):
+                        segment = loaded.get(path)
+                        if segment is None:
+                            try:
+                                segment = ColdSegment(path)
+                            except (OSError, ValueError):
+                                logger.exception("Skipping unreadable segment %s", path)
+                                continue
+                        segments.append(segment)
+                self._segments = segments
+                self._scanned_mtime = mtime
+            return list(self._segments)
+
+    def add_segment(self, member_ids: np.ndarray, ids: np.ndarray, measured_at: np.ndarray,
+                    created_at: np.ndarray, bpm: np.ndarray) -> ColdSegment:
+        """Write rows into a new segment, marked pending until mark_archived() is called.
+
+        Returns:
+            ColdSegment: The new segment (already visible to readers).
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        existing = self.segments()
+        name = "hr-%06d" % (int(existing[-1].path.stem.split("-")[1]) + 1 if existing else 1)
+        path = self.directory / (name + SEGMENT_SUFFIX)
+        path.with_suffix(PENDING_SUFFIX).touch()
+        segment = ColdSegment.write(path, member_ids, ids, measured_at, created_at, bpm)
+        with self._lock:
+            if all(known.path != path for known in self._segments):
+                self._segments.append(segment)
+        return segment
+
+    def pending_segments(self) -> List[ColdSegment]:
+        """Return segments whose rows may still be in the hot table."""
+        return [segment for segment in self.segments() if segment.path.with_suffix(PENDING_SUFFIX).exists()]
+
+    @staticmethod
+    def mark_archived(segment: ColdSegment) -> None:
+        """Record that a segment's rows were removed from the hot table."""
+        segment.path.with_suffix(PENDING_SUFFIX).unlink(missing_ok=True)
+
+    def iter_member(self, member_id: str, start: Optional[int] = None, end: Optional[int] = None,
+                    after: Optional[Tuple[int, int]] = None) -> Iterator[Tuple[int, int, int, float]]:
+        """Stream a member's archived rows in (measured_at, id) order across segments.
+
+        Args:
+            member_id (str): Member identifier.
+            start (Optional[int]): Inclusive lower bound of measured_at (microseconds).
+            end (Optional[int]): Exclusive upper bound of measured_at (microseconds).
+            after (Optional[Tuple[int, int]]): Only rows after this (measured_at, id) position.
+
+        Returns:
+            Iterator[Tuple[int, int, int, float]]: (measured_at, id, created_at, bpm) rows.
+        """
+        sources = []
+        for segment in self.segments():
+            entry = segment.members.get(member_id)
+            if entry is None or (start is not None and entry[4] < start) or (end is not None and entry[3] >= end):
+                continue
+            if after is not None and entry[4] < after[0]:
+                continue
+            sources.append(self._iter_segment_rows(segment, member_id, start, end, after))
+        if len(sources) == 1:
+            return sources[0]
+        return heapq.merge(*sources)
+
+    @staticmethod
+    def _iter_segment_rows(segment: ColdSegment, member_id: str, start: Optional[int], end: Optional[int],
+                           after: Optional[Tuple[int, int]]) -> Iterator[Tuple[int, int, int, float]]:
+        columns = segment.read_member(member_id)
+        mask = np.ones(len(columns.ids), dtype=bool)
+        if start is not None:
+            mask &= columns.measured_at >= start
+        if end is not None:
+            mask &= columns.measured_at < end
+        if after is not None:
+            mask &= (columns.measured_at > after[0]) | ((columns.measured_at == after[0]) & (columns.ids > after[1]))
+        yield from zip(columns.measured_at[mask].tolist(), columns.ids[mask].tolist(),
+                       columns.created_at[mask].tolist(), columns.bpm[mask].tolist())
+
+    def load_member(self, member_id: str, start: Optional[int] = None,
+                    end: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Load a member's archived samples as arrays.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (measured_at in microseconds, BPM as float64), ordered by time.
+        """
+        times, values = [], []
+        for segment in self.segments():
+            entry = segment.members.get(member_id)
+            if entry is None or (start is not None and entry[4] < start) or (end is not None and entry[3] >= end):
+                continue
+            columns = segment.read_member(member_id)
+            mask = np.ones(len(columns.ids), dtype=bool)
+            if start is not None:
+                mask &= columns.measured_at >= start
+            if end is not None:
+                mask &= columns.measured_at < end
+            times.append(columns.measured_at[mask])
+            values.append(columns.bpm[mask].astype(np.float64))
+        if not times:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        t, bpm = np.concatenate(times), np.concatenate(values)
+        if len(times) > 1:
+            order = np.argsort(t, kind="stable")
+            t, bpm = t[order], bpm[order]
+        return t, bpm
+
+    def stats(self) -> Dict:
+        """Return segment counts and sizes.
+
+        Returns:
+            Dict: Directory, segments, rows and bytes on disk.
+        """
+        segments = self.segments()
+        return {
+            "directory": str(self.directory),
+            "segments": len(segments),
+            "rows": sum(segment.rows for segment in segments),
+            "bytes": sum(segment.size_bytes for segment in segments),
+            "pending": len(self.pending_segments()),
+        }
+
+
+# Shared cold store of heart rate records
+cold_store = ColdStore()
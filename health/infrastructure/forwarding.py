@@ -0,0 +1,525 @@
+"""
+Store-and-forward delivery of heart rate samples to the backend.
+
+The heart rate proxy forwards each sample straight to the backend while it is reachable. When the
+call fails (connection error, timeout, open circuit, 5xx/408/429) the sample is appended to a durable
+queue in SQLite instead of being dropped, and every later sample joins the queue behind it so the
+backend keeps receiving samples in order. A background replayer drains the queue in bounded
+batches, rate limited, once the backend answers again.
+
+With HR_FORWARD_COALESCE_MS set, samples are not forwarded one request at a time: they are
+acknowledged right away, buffered per member and sent as one batched request per window.
+"""
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from health.domain.entities import QueuedHeartRate
+from health.infrastructure.repositories import HeartRateForwardRepository
+from shared.infrastructure.database import unit_of_work
+from shared.infrastructure.http_client import LatencyStats, backend_client
+from shared.infrastructure.metrics import metrics
+from shared.infrastructure.workers import PeriodicWorker
+
+BACKEND_BASE_URL = os.getenv("BACKEND_BASE_URL", "http://localhost:8080")
+BACKEND_TOKEN = os.getenv("BACKEND_TOKEN")  # Bearer token for secured backend
+
+HR_FORWARD_QUEUE_ENABLED = os.getenv("HR_FORWARD_QUEUE_ENABLED", "true").lower() in ("1", "true", "yes")
+HR_FORWARD_QUEUE_MAX = int(os.getenv("HR_FORWARD_QUEUE_MAX", "100000"))
+HR_FORWARD_REPLAY_INTERVAL = float(os.getenv("HR_FORWARD_REPLAY_INTERVAL", "5"))
+HR_FORWARD_REPLAY_BATCH = int(os.getenv("HR_FORWARD_REPLAY_BATCH", "50"))
+HR_FORWARD_REPLAY_RATE = float(os.getenv("HR_FORWARD_REPLAY_RATE", "20"))
+HR_FORWARD_COALESCE_MS = float(os.getenv("HR_FORWARD_COALESCE_MS", "0"))  # 0 = one backend call per sample
+HR_FORWARD_COALESCE_MAX_SAMPLES = int(os.getenv("HR_FORWARD_COALESCE_MAX_SAMPLES", "500"))
+HR_FORWARD_COALESCE_MAX_BUFFERED = int(os.getenv("HR_FORWARD_COALESCE_MAX_BUFFERED", "5000"))
+HR_FORWARD_BATCH_URL = os.getenv("HR_FORWARD_BATCH_URL", f"{BACKEND_BASE_URL}/api/heart-rate/batch")
+
+
+def backend_headers() -> Dict[str, str]:
+    """Build headers for forwarding to backend."""
+    headers = {"Content-Type": "application/json"}
+    if BACKEND_TOKEN:
+        headers["Authorization"] = f"Bearer {BACKEND_TOKEN}"
+    return headers
+
+
+def heart_rate_url(member_id: str) -> str:
+    """Backend endpoint receiving a member's heart rate samples."""
+    return f"{BACKEND_BASE_URL}/api/heart-rate/{member_id}"
+
+
+def should_retry(status_code: int) -> bool:
+    """Check if a backend answer means "try again later" rather than "rejected"."""
+    return status_code >= 500 or status_code in (408, 429)
+
+
+def post_heart_rate(member_id: str, payload: Dict) -> Dict:
+    """Send one queued sample to the backend.
+
+    Returns:
+        Dict: {"sent": True, "status_code"} if the backend answered, else {"sent": False, "message"}.
+    """
+    try:
+        resp = backend_client.post(heart_rate_url(member_id), json=payload, headers=backend_headers())
+        return {"sent": True, "status_code": resp.status_code}
+    except Exception as exc:  # noqa: BLE001
+        return {"sent": False, "message": str(exc)}
+
+
+def post_heart_rate_batch(batch: List[Dict]) -> Dict:
+    """Send coalesced samples to the backend as {"members": [{"member_id", "samples"}, ...]}.
+
+    Returns:
+        Dict: {"sent": True, "status_code"} if the backend answered, else {"sent": False, "message"}.
+    """
+    try:
+        resp = backend_client.post(HR_FORWARD_BATCH_URL, json={"members": batch}, headers=backend_headers())
+        return {"sent": True, "status_code": resp.status_code}
+    except Exception as exc:  # noqa: BLE001
+        return {"sent": False, "message": str(exc)}
+
+
+class HeartRateForwardQueue:
+    """Durable, ordered queue of heart rate samples waiting for the backend, with its replayer.
+
+    The queue depth is tracked in memory so the request path can tell whether a backlog exists
+    without querying the table. Replay stops at the first sample the backend cannot take yet
+    (keeping order); samples it rejects with a 4xx are dead-lettered so they never block the queue.
+
+    Attributes:
+        queued (int): Samples queued since start.
+        replayed (int): Samples delivered by the replayer since start.
+        dead (int): Samples the backend rejected during replay since start.
+    """
+
+    def __init__(self, repository: HeartRateForwardRepository = None,
+                 sender: Callable[[str, Dict], Dict] = post_heart_rate,
+                 enabled: bool = HR_FORWARD_QUEUE_ENABLED, max_depth: int = HR_FORWARD_QUEUE_MAX,
+                 replay_interval: float = HR_FORWARD_REPLAY_INTERVAL, batch_size: int = HR_FORWARD_REPLAY_BATCH,
+                 rate: float = HR_FORWARD_REPLAY_RATE):
+        """Initialize a HeartRateForwardQueue instance.
+
+        Args:
+            repository (HeartRateForwardRepository, optional): Queue persistence.
+            sender (Callable[[str, Dict], Dict]): Delivers one (member_id, payload), returns a result dict.
+            enabled (bool): Queue failed forwards (False restores fail-fast 502 responses).
+            max_depth (int): Pending samples above which new samples are refused.
+            replay_interval (float): Seconds between replay runs when not woken up.
+            batch_size (int): Samples fetched and committed per replay batch.
+            rate (float): Maximum samples per second sent by the replayer.
+        """
+        self.repository = repository or HeartRateForwardRepository()
+        self.sender = sender
+        self.enabled = enabled
+        self.max_depth = max_depth
+        self.batch_size = batch_size
+        self.min_send_interval = 1.0 / rate if rate > 0 else 0.0
+        self._worker = PeriodicWorker("hr-forward-replayer", replay_interval, self.replay_pending)
+        self._replay_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._next_send = 0.0
+        self._depth = 0
+        self.queued = 0
+        self.replayed = 0
+        self.dead = 0
+        self.last_error: Optional[str] = None
+        self.last_replay_at: Optional[datetime] = None
+
+    def start(self, replay: bool = True) -> None:
+        """Load the queue depth left by a previous run and start the background replayer.
+
+        Args:
+            replay (bool): Replay queued samples from this process. Worker processes of a
+                single-writer deployment pass False: the writer process replays, and the worker
+                only refreshes its view of the queue depth every replay interval.
+        """
+        if not self.enabled:
+            return
+        self._depth = self.repository.pending_summary()[0]
+        if not replay:
+            self._worker = PeriodicWorker("hr-forward-depth", self._worker.interval, self.refresh_depth)
+        self._stopping.clear()
+        self._worker.start()
+        if self._depth:
+            self._worker.wake()
+
+    def stop(self, timeout: float = None) -> None:
+        """Stop the background replayer after the sample being sent.
+
+        Args:
+            timeout (float, optional): Seconds to wait for the current run to finish.
+        """
+        self._stopping.set()
+        self._worker.stop(timeout)
+
+    def refresh_depth(self) -> None:
+        """Re-read the queue depth from the database (samples may be replayed by another process)."""
+        self._depth = self.repository.pending_summary()[0]
+
+    @property
+    def depth(self) -> int:
+        """Pending samples in the queue (tracked in memory, recounted on start and refresh)."""
+        return self._depth
+
+    def has_backlog(self) -> bool:
+        """Check if samples are waiting, in which case new samples must queue behind them."""
+        return self._depth > 0
+
+    def enqueue(self, member_id: str, bpm: float, error: Optional[str] = None) -> Tuple[Dict, int]:
+        """Queue a sample for later delivery and build the proxy response.
+
+        The queued payload carries the time the sample was received, since it may reach the
+        backend much later.
+
+        Args:
+            member_id (str): Member ID.
+            bpm (float): Heart rate in beats per minute.
+            error (Optional[str]): Why the direct forward failed, if it was attempted.
+
+        Returns:
+            Tuple[Dict, int]: (response body, status code): 202 when queued, 502 when queueing is
+            disabled and 503 when the queue is full.
+        """
+        if not self.enabled:
+            return {"error": f"Forwarding failed: {error}"}, 502
+        if self._depth >= self.max_depth:
+            return {"error": "Forward queue full", "queue_depth": self._depth}, 503
+        self.repository.enqueue(member_id, {"bpm": bpm, "measured_at": datetime.now().isoformat()})
+        with self._lock:
+            self._depth += 1
+            self.queued += 1
+            if error:
+                self.last_error = error
+        return {"queued": True, "queue_depth": self._depth}, 202
+
+    def enqueue_samples(self, member_id: str, samples: List[Dict], error: Optional[str] = None) -> int:
+        """Queue samples of one member that already carry their reception time (a failed batch).
+
+        Args:
+            member_id (str): Member ID.
+            samples (List[Dict]): {"bpm", "measured_at"} payloads, oldest first.
+            error (Optional[str]): Why the delivery failed.
+
+        Returns:
+            int: Number of samples queued (0 if queueing is disabled or the queue is full).
+        """
+        if not self.enabled or self._depth + len(samples) > self.max_depth:
+            return 0
+        self.repository.enqueue_many(member_id, samples)
+        with self._lock:
+            self._depth += len(samples)
+            self.queued += len(samples)
+            if error:
+                self.last_error = error
+        return len(samples)
+
+    def forward(self, member_id: str, bpm: float) -> Tuple[Dict, int]:
+        """Forward a sample to the backend, or queue it if there is a backlog or the call fails.
+
+        Args:
+            member_id (str): Member ID.
+            bpm (float): Heart rate in beats per minute.
+
+        Returns:
+            Tuple[Dict, int]: (backend or queue response body, status code).
+        """
+        if self.has_backlog():
+            return self.enqueue(member_id, bpm)
+        try:
+            resp = backend_client.post(heart_rate_url(member_id), json={"bpm": bpm}, headers=backend_headers())
+        except Exception as e:  # noqa: BLE001
+            return self.enqueue(member_id, bpm, str(e))
+        if self.enabled and should_retry(resp.status_code):
+            return self.enqueue(member_id, bpm, f"HTTP {resp.status_code}")
+        return resp.json(), resp.status_code
+
+    def replay_pending(self) -> Dict:
+        """Deliver queued samples in order, batch by batch, until the queue is empty or a send fails.
+
+        Returns:
+            Dict: Number of samples delivered and dead-lettered in this run.
+        """
+        totals = {"replayed": 0, "dead": 0}
+        with self._replay_lock:
+            while not self._stopping.is_set():
+                items = self.repository.find_pending(self.batch_size)
+                if not items:
+                    break
+                delivered, rejected, blocked = self._replay_batch(items)
+                totals["replayed"] += delivered
+                totals["dead"] += rejected
+                if blocked or len(items) < self.batch_size:
+                    break
+            self.last_replay_at = datetime.now()
+        return totals
+
+    def _replay_batch(self, items: List[QueuedHeartRate]) -> Tuple[int, int, bool]:
+        """Send a batch in order and record the outcome in one transaction.
+
+        Returns:
+            Tuple[int, int, bool]: (delivered, dead-lettered, True if a retryable failure stopped the batch).
+        """
+        delivered = []
+        failures = []
+        blocked = False
+        for item in items:
+            if self._stopping.is_set():
+                break
+            self._throttle()
+            result = self.sender(item.member_id, item.payload)
+            status_code = result.get("status_code")
+            if result.get("sent") and status_code < 400:
+                delivered.append(item.id)
+                continue
+            if result.get("sent"):
+                error = f"HTTP {status_code}"
+                dead = not should_retry(status_code)
+            else:
+                error = result.get("message") or "unknown error"
+                dead = False
+            self.last_error = error
+            failures.append((item.id, error, dead))
+            if not dead:
+                blocked = True
+                break
+
+        with unit_of_work():
+            self.repository.delete(delivered)
+            for forward_id, error, dead in failures:
+                self.repository.mark_failed(forward_id, error, dead)
+
+        rejected = sum(1 for _, _, dead in failures if dead)
+        with self._lock:
+            self._depth = max(0, self._depth - len(delivered) - rejected)
+            self.replayed += len(delivered)
+            self.dead += rejected
+        return len(delivered), rejected, blocked
+
+    def _throttle(self) -> None:
+        """Wait so the replayer sends at most one sample every `min_send_interval` seconds."""
+        now = time.monotonic()
+        if self._next_send > now:
+            time.sleep(self._next_send - now)
+        self._next_send = max(now, self._next_send) + self.min_send_interval
+
+    def stats(self) -> Dict:
+        """Return queue depth, replay lag and delivery counters.
+
+        Returns:
+            Dict: Forward queue statistics; replay_lag_seconds is the age of the oldest pending sample.
+        """
+        depth, oldest = self.repository.pending_summary()
+        return {
+            "enabled": self.enabled,
+            "running": self._worker.is_running(),
+            "depth": depth,
+            "replay_lag_seconds": round((datetime.now() - oldest).total_seconds(), 3) if oldest else 0.0,
+            "queued": self.queued,
+            "replayed": self.replayed,
+            "dead": self.dead,
+            "dead_letters": self.repository.count_dead(),
+            "last_error": self.last_error,
+            "last_replay_at": self.last_replay_at.isoformat() if self.last_replay_at else None,
+        }
+
+
+forward_queue = HeartRateForwardQueue()
+metrics.gauge_callback("edge_hr_forward_queue_depth", "Heart rate samples waiting in the durable forward queue.",
+                       lambda: forward_queue.depth)
+
+
+class HeartRateCoalescer:
+    """Buffers forwarded samples per member and sends them to the backend as one batched request.
+
+    The buffers are flushed `window_ms` after the first buffered sample, or as soon as they hold
+    `max_samples` samples, as {"members": [{"member_id", "samples": [{"bpm", "measured_at"}, ...]}]}.
+    Every sample goes through the buffer, also while the forward queue has a backlog, and a single
+    flusher thread sends or queues the batches one after the other, so samples reach the backend
+    (or the queue) in the order they arrived. While a batch is in flight new samples keep buffering
+    into the next one, up to `max_buffered`; beyond that new samples are refused (503) until the
+    flush completes. Batches the backend cannot take go to the durable forward queue (and while
+    that queue has a backlog, batches join it directly).
+
+    Attributes:
+        enabled (bool): True if coalescing is configured (window_ms > 0).
+        flush_latency (LatencyStats): Duration of the batched backend calls.
+        delivery_delay (LatencyStats): Time from a batch's first sample to its delivery.
+    """
+
+    def __init__(self, queue: HeartRateForwardQueue, window_ms: float = HR_FORWARD_COALESCE_MS,
+                 max_samples: int = HR_FORWARD_COALESCE_MAX_SAMPLES,
+                 max_buffered: int = HR_FORWARD_COALESCE_MAX_BUFFERED,
+                 sender: Callable[[List[Dict]], Dict] = post_heart_rate_batch):
+        """Initialize a HeartRateCoalescer instance.
+
+        Args:
+            queue (HeartRateForwardQueue): Durable queue taking batches the backend cannot take.
+            window_ms (float): Maximum time a sample waits in its buffer (0 disables coalescing).
+            max_samples (int): Buffered samples that trigger an immediate flush.
+            max_buffered (int): Buffered samples above which new samples are refused while a
+                flush is in flight.
+            sender (Callable[[List[Dict]], Dict]): Delivers one batch (list of per-member entries).
+        """
+        self.queue = queue
+        self.enabled = window_ms > 0
+        self.window = window_ms / 1000.0
+        self.max_samples = max(1, max_samples)
+        self.max_buffered = max(self.max_samples, max_buffered)
+        self.sender = sender
+        self.flush_latency = LatencyStats()
+        self.delivery_delay = LatencyStats()
+        self._buffers: Dict[str, List[Dict]] = {}
+        self._pending = 0
+        self._first_at: Optional[float] = None
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._sizes = deque(maxlen=1024)
+        self.buffered = 0
+        self.flushes = 0
+        self.delivered = 0
+        self.queued = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+
+    def start(self) -> None:
+        """Start the flusher thread (no-op if coalescing is disabled)."""
+        if not self.enabled or self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="hr-coalescer", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Flush the buffers and wait until the last batch is delivered or queued."""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join()
+        self._thread = None
+
+    @property
+    def pending(self) -> int:
+        """Samples buffered for the next flush."""
+        return self._pending
+
+    def add(self, member_id: str, bpm: float) -> Tuple[Dict, int]:
+        """Buffer a sample and acknowledge it right away.
+
+        Args:
+            member_id (str): Member ID.
+            bpm (float): Heart rate in beats per minute.
+
+        Returns:
+            Tuple[Dict, int]: ({"accepted": True, "buffered"}, 202), or 503 when the buffer is full.
+        """
+        sample = {"bpm": bpm, "measured_at": datetime.now().isoformat()}
+        with self._cond:
+            if self._pending >= self.max_buffered:
+                self.rejected += 1
+                return {"error": "Forward buffer full", "buffered": self._pending}, 503
+            self._buffers.setdefault(member_id, []).append(sample)
+            self._pending += 1
+            self.buffered += 1
+            if self._first_at is None:
+                self._first_at = time.monotonic()
+                self._cond.notify()
+            elif self._pending >= self.max_samples:
+                self._cond.notify()
+            pending = self._pending
+        return {"accepted": True, "buffered": pending}, 202
+
+    def _run(self) -> None:
+        """Flusher thread: send the buffers when the window is over or they are full."""
+        while True:
+            with self._cond:
+                while True:
+                    if self._first_at is not None and (self._stopping or self._pending >= self.max_samples):
+                        break
+                    if self._first_at is None:
+                        if self._stopping:
+                            return
+                        self._cond.wait()
+                        continue
+                    remaining = self._first_at + self.window - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                buffers, first_at, size = self._buffers, self._first_at, self._pending
+                self._buffers, self._first_at, self._pending = {}, None, 0
+            self._flush(buffers, first_at, size)
+
+    def _flush(self, buffers: Dict[str, List[Dict]], first_at: float, size: int) -> None:
+        """Send one batch; queue it durably if the backend cannot take it."""
+        self._sizes.append(size)
+        self.flushes += 1
+        if self.queue.has_backlog():
+            self._queue(buffers, None)
+            return
+        batch = [{"member_id": member_id, "samples": samples} for member_id, samples in buffers.items()]
+        started = time.perf_counter()
+        result = self.sender(batch)
+        status_code = result.get("status_code")
+        delivered = bool(result.get("sent")) and status_code < 400
+        self.flush_latency.record(time.perf_counter() - started, error=not delivered)
+        if delivered:
+            self.delivery_delay.record(time.monotonic() - first_at, error=False)
+            self.delivered += size
+        elif result.get("sent") and not should_retry(status_code):
+            self.last_error = f"HTTP {status_code}"
+            self.dropped += size
+        else:
+            self._queue(buffers, result.get("message") or f"HTTP {status_code}")
+
+    def _queue(self, buffers: Dict[str, List[Dict]], error: Optional[str]) -> None:
+        """Move a batch to the durable forward queue, member by member."""
+        if error:
+            self.last_error = error
+        for member_id, samples in buffers.items():
+            queued = self.queue.enqueue_samples(member_id, samples, error)
+            self.queued += queued
+            self.dropped += len(samples) - queued
+
+    def stats(self) -> Dict:
+        """Return batch size percentiles, flush latency and delivery counters.
+
+        Returns:
+            Dict: Coalescer statistics.
+        """
+        sizes = sorted(self._sizes)
+
+        def percentile(p: float) -> Optional[int]:
+            return sizes[min(len(sizes) - 1, int(p * len(sizes)))] if sizes else None
+
+        return {
+            "enabled": self.enabled,
+            "window_ms": self.window * 1000,
+            "max_samples": self.max_samples,
+            "max_buffered": self.max_buffered,
+            "pending": self._pending,
+            "buffered": self.buffered,
+            "flushes": self.flushes,
+            "delivered": self.delivered,
+            "queued": self.queued,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "last_error": self.last_error,
+            "flush_size": {"mean": round(sum(sizes) / len(sizes), 1) if sizes else None,
+                           "p50": percentile(0.50), "p95": percentile(0.95), "max": sizes[-1] if sizes else None},
+            "flush_latency": self.flush_latency.snapshot(),
+            "delivery_delay": self.delivery_delay.snapshot(),
+        }
+
+
+forward_coalescer = HeartRateCoalescer(forward_queue)
+metrics.gauge_callback("edge_hr_forward_coalescer_pending", "Heart rate samples buffered for the next coalesced flush.",
+                       lambda: forward_coalescer.pending)
@@ -0,0 +1,262 @@
+"""
+In-memory live heart rate store.
+
+Keeps, per member, a ring buffer of the most recent raw samples and fixed-size rollup rings at
+several resolutions (1 s, 10 s, 1 min). All data lives in typed arrays so the footprint per member
+is bounded and independent of how long the member has been training.
+"""
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from shared.infrastructure.metrics import metrics
+
+HR_LIVE_RAW_CAPACITY = int(os.getenv("HR_LIVE_RAW_CAPACITY", "600"))
+HR_LIVE_MAX_MEMBERS = int(os.getenv("HR_LIVE_MAX_MEMBERS", "512"))
+
+# resolution in seconds -> number of buckets kept (5 min at 1 s, 1 h at 10 s, 4 h at 1 min)
+ROLLUP_LAYOUT = {1: 300, 10: 360, 60: 240}
+# Longest span any buffer covers, in seconds (the 1 min rollups)
+LIVE_HORIZON_SECONDS = max(resolution * buckets for resolution, buckets in ROLLUP_LAYOUT.items())
+
+
+class RollupRing:
+    """Ring of fixed-width time buckets holding min/max/sum/count of the samples that fall in them.
+
+    Attributes:
+        resolution (int): Bucket width in seconds.
+        buckets (int): Number of buckets kept.
+    """
+
+    def __init__(self, resolution: int, buckets: int):
+        """Initialize an empty RollupRing.
+
+        Args:
+            resolution (int): Bucket width in seconds.
+            buckets (int): Number of buckets kept.
+        """
+        self.resolution = resolution
+        self.buckets = buckets
+        self._keys = array('q', [-1]) * buckets  # bucket number (epoch // resolution) stored in each slot
+        self._min = array('f', [0.0]) * buckets
+        self._max = array('f', [0.0]) * buckets
+        self._sum = array('d', [0.0]) * buckets
+        self._count = array('I', [0]) * buckets
+        self._head = -1  # newest bucket number seen
+
+    def add(self, timestamp: float, bpm: float) -> None:
+        """Fold a sample into its bucket (samples older than the ring are dropped).
+
+        Args:
+            timestamp (float): Epoch seconds of the sample.
+            bpm (float): Heart rate.
+        """
+        key = int(timestamp // self.resolution)
+        if key <= self._head - self.buckets:
+            return
+        slot = key % self.buckets
+        current = self._keys[slot]
+        if current != key:
+            if current > key:
+                return
+            self._keys[slot] = key
+            self._min[slot] = bpm
+            self._max[slot] = bpm
+            self._sum[slot] = 0.0
+            self._count[slot] = 0
+        elif bpm < self._min[slot]:
+            self._min[slot] = bpm
+        elif bpm > self._max[slot]:
+            self._max[slot] = bpm
+        self._sum[slot] += bpm
+        self._count[slot] += 1
+        if key > self._head:
+            self._head = key
+
+    def query(self, since: float) -> List[Dict]:
+        """Return the non-empty buckets starting at or after `since`, oldest first.
+
+        Args:
+            since (float): Epoch seconds.
+
+        Returns:
+            List[Dict]: Buckets as {start, min, max, mean, count}.
+        """
+        if self._head < 0:
+            return []
+        first = max(self._head - self.buckets + 1, int(since // self.resolution))
+        result = []
+        for key in range(first, self._head + 1):
+            slot = key % self.buckets
+            if self._keys[slot] != key or not self._count[slot]:
+                continue
+            count = self._count[slot]
+            result.append({
+                "start": datetime.fromtimestamp(key * self.resolution).isoformat(),
+                "min": round(self._min[slot], 1),
+                "max": round(self._max[slot], 1),
+                "mean": round(self._sum[slot] / count, 1),
+                "count": count,
+            })
+        return result
+
+    def nbytes(self) -> int:
+        """Return the memory used by the bucket arrays."""
+        return sum(a.itemsize * len(a) for a in (self._keys, self._min, self._max, self._sum, self._count))
+
+
+class HeartRateRingBuffer:
+    """Most recent raw samples of one member plus their multi-resolution rollups."""
+
+    def __init__(self, capacity: int = HR_LIVE_RAW_CAPACITY):
+        """Initialize an empty HeartRateRingBuffer.
+
+        Args:
+            capacity (int): Number of raw samples kept.
+        """
+        self.capacity = capacity
+        self._timestamps = array('d', [0.0]) * capacity
+        self._bpm = array('f', [0.0]) * capacity
+        self._next = 0
+        self._size = 0
+        self.rollups = {resolution: RollupRing(resolution, buckets) for resolution, buckets in ROLLUP_LAYOUT.items()}
+        self._lock = threading.Lock()
+
+    def add(self, timestamp: float, bpm: float) -> None:
+        """Append a sample and update every rollup.
+
+        Args:
+            timestamp (float): Epoch seconds of the sample.
+            bpm (float): Heart rate.
+        """
+        with self._lock:
+            self._timestamps[self._next] = timestamp
+            self._bpm[self._next] = bpm
+            self._next = (self._next + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+            for ring in self.rollups.values():
+                ring.add(timestamp, bpm)
+
+    def latest(self, since: float = 0.0) -> List[Dict]:
+        """Return the raw samples newer than `since`, oldest first (arrival order).
+
+        Args:
+            since (float): Epoch seconds.
+
+        Returns:
+            List[Dict]: Samples as {measured_at, bpm}.
+        """
+        with self._lock:
+            start = (self._next - self._size) % self.capacity
+            indexes = [(start + i) % self.capacity for i in range(self._size)]
+            return [
+                {"measured_at": datetime.fromtimestamp(self._timestamps[i]).isoformat(), "bpm": round(self._bpm[i], 1)}
+                for i in indexes if self._timestamps[i] >= since
+            ]
+
+    def last(self) -> Optional[Dict]:
+        """Return the most recently received sample, or None if empty."""
+        with self._lock:
+            if not self._size:
+                return None
+            i = (self._next - 1) % self.capacity
+            return {"measured_at": datetime.fromtimestamp(self._timestamps[i]).isoformat(), "bpm": round(self._bpm[i], 1)}
+
+    def query_rollup(self, resolution: int, since: float) -> List[Dict]:
+        """Return rollup buckets of a resolution starting at or after `since`.
+
+        Args:
+            resolution (int): One of the configured resolutions in seconds.
+            since (float): Epoch seconds.
+
+        Returns:
+            List[Dict]: Buckets as {start, min, max, mean, count}.
+        """
+        with self._lock:
+            return self.rollups[resolution].query(since)
+
+    def nbytes(self) -> int:
+        """Return the memory used by the sample and rollup arrays."""
+        raw = self._timestamps.itemsize * len(self._timestamps) + self._bpm.itemsize * len(self._bpm)
+        return raw + sum(ring.nbytes() for ring in self.rollups.values())
+
+
+class LiveHeartRateStore:
+    """Bounded map of member ID to HeartRateRingBuffer; the least recently updated member is evicted."""
+
+    def __init__(self, max_members: int = HR_LIVE_MAX_MEMBERS, capacity: int = HR_LIVE_RAW_CAPACITY):
+        """Initialize an empty LiveHeartRateStore.
+
+        Args:
+            max_members (int): Maximum number of members tracked.
+            capacity (int): Raw samples kept per member.
+        """
+        self.max_members = max_members
+        self.capacity = capacity
+        self._buffers: "OrderedDict[str, HeartRateRingBuffer]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.samples = 0
+        self.evictions = 0
+
+    @property
+    def member_count(self) -> int:
+        """Number of members with a buffer."""
+        return len(self._buffers)
+
+    def add(self, member_id: str, bpm: float, measured_at: datetime) -> None:
+        """Record a sample for a member.
+
+        Args:
+            member_id (str): Member ID / NFC UID.
+            bpm (float): Heart rate.
+            measured_at (datetime): Measurement timestamp.
+        """
+        with self._lock:
+            buffer = self._buffers.get(member_id)
+            if buffer is None:
+                buffer = self._buffers[member_id] = HeartRateRingBuffer(self.capacity)
+                while len(self._buffers) > self.max_members:
+                    self._buffers.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._buffers.move_to_end(member_id)
+            self.samples += 1
+        buffer.add(measured_at.timestamp(), bpm)
+
+    def get(self, member_id: str) -> Optional[HeartRateRingBuffer]:
+        """Return the buffer of a member, or None if the member has no live data.
+
+        Args:
+            member_id (str): Member ID / NFC UID.
+
+        Returns:
+            Optional[HeartRateRingBuffer]: The member's buffer.
+        """
+        return self._buffers.get(member_id)
+
+    def stats(self) -> Dict:
+        """Return the number of tracked members, samples received and memory footprint.
+
+        Returns:
+            Dict: Store statistics.
+        """
+        with self._lock:
+            buffers = list(self._buffers.values())
+            members = len(buffers)
+        per_member = buffers[0].nbytes() if buffers else HeartRateRingBuffer(self.capacity).nbytes()
+        return {
+            "members": members,
+            "max_members": self.max_members,
+            "samples": self.samples,
+            "evictions": self.evictions,
+            "bytes_per_member": per_member,
+            "bytes_total": per_member * members,
+        }
+
+
+live_heart_rate_store = LiveHeartRateStore()
+metrics.gauge_callback("edge_hr_live_members", "Members with an in-memory heart rate ring buffer.",
+                       lambda: live_heart_rate_store.member_count)
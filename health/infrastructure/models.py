@@ -1,9 +1,12 @@
 """
 Peewee ORM models for equipment usage tracking.
 
-Defines database table structures for equipment, sessions, and heart rate records.
+Defines database table structures for equipment, sessions, heart rate records and the heart rate
+forward queue.
 """
-from peewee import Model, AutoField, FloatField, CharField, DateTimeField, IntegerField, ForeignKeyField
+from peewee import (
+    Model, AutoField, FloatField, CharField, DateTimeField, IntegerField, ForeignKeyField, TextField,
+)
 from shared.infrastructure.database import db
 
 
@@ -53,4 +56,31 @@ class HeartRateRecord(Model):
     class Meta:
         database = db
         table_name = 'heart_rate_records'
+        # History queries filter by member and walk a time range in order
+        indexes = (
+            (('member_id', 'measured_at'), False),
+            (('measured_at',), False),  # time-range scans across members (retention)
+        )
 
+
+class HeartRateForward(Model):
+    """
+    ORM model for the heart_rate_forwards table.
+    Durable store-and-forward queue of heart rate samples the backend could not take yet.
+    Rows are replayed in id order and deleted once delivered; rejected samples stay as 'dead'.
+    """
+    id = AutoField()
+    member_id = CharField()
+    payload = TextField()  # JSON body sent to the backend
+    status = CharField(default='pending')  # pending, dead
+    attempts = IntegerField(default=0)
+    last_error = TextField(null=True)
+    created_at = DateTimeField()
+
+    class Meta:
+        database = db
+        table_name = 'heart_rate_forwards'
+        # The replayer walks pending rows in queue order
+        indexes = (
+            (('status', 'id'), False),
+        )
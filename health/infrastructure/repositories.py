@@ -1,11 +1,31 @@
 """Repository for heart rate record persistence (simplified)."""
+import heapq
+import itertools
+import json
+import os
 from datetime import datetime
-from typing import List
+from typing import Dict, Iterator, List, Optional, Tuple
 
-from health.domain.entities import HeartRateRecord
+import numpy as np
+from peewee import chunked, fn
+
+from health.domain.entities import HeartRateRecord, QueuedHeartRate
+from health.infrastructure.cold_storage import cold_store, from_micros, to_micros
+from health.infrastructure.models import HeartRateForward as HeartRateForwardModel
 from health.infrastructure.models import HeartRateRecord as HeartRateRecordModel
+from shared.infrastructure.database import db, unit_of_work
+from shared.infrastructure.metrics import instrument_repository
+
+# julianday() of 1970-01-01 00:00, to turn stored timestamps into seconds since that instant
+_UNIX_EPOCH_JULIAN_DAY = 2440587.5
 
+# Rows per INSERT statement (4 bound parameters per row, well below SQLite's variable limit)
+HR_INSERT_CHUNK_SIZE = int(os.getenv("HR_INSERT_CHUNK_SIZE", "200"))
+# Rows per DELETE transaction when archiving, so writers are never blocked for long
+HR_RETENTION_DELETE_CHUNK = int(os.getenv("HR_RETENTION_DELETE_CHUNK", "2000"))
 
+
+@instrument_repository
 class HeartRateRecordRepository:
     """Repository for managing HeartRateRecord persistence."""
 
@@ -21,19 +41,321 @@ class HeartRateRecordRepository:
         record.id = record_model.id
         return record
 
+    @staticmethod
+    def save_many(records: List[HeartRateRecord]) -> int:
+        """Persist a batch of heart rate records with multi-row inserts in one transaction.
+
+        Args:
+            records (List[HeartRateRecord]): Records to persist.
+
+        Returns:
+            int: Number of rows inserted.
+        """
+        if not records:
+            return 0
+        rows = [
+            {
+                "member_id": record.member_id,
+                "bpm": record.bpm,
+                "measured_at": record.measured_at,
+                "created_at": record.created_at or datetime.now(),
+            }
+            for record in records
+        ]
+        with unit_of_work():
+            for chunk in chunked(rows, HR_INSERT_CHUNK_SIZE):
+                HeartRateRecordModel.insert_many(chunk).execute()
+        return len(rows)
+
     @staticmethod
     def find_by_member_id(member_id: str) -> List[HeartRateRecord]:
-        """Return all heart rate records for a member."""
-        records = HeartRateRecordModel.select().where(
-            HeartRateRecordModel.member_id == member_id
+        """Return all heart rate records for a member (prefer iter_by_member_id for long histories)."""
+        return list(HeartRateRecordRepository.iter_by_member_id(member_id))
+
+    @staticmethod
+    def iter_by_member_id(member_id: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                          after: Optional[Tuple[datetime, int]] = None,
+                          limit: Optional[int] = None) -> Iterator[HeartRateRecord]:
+        """Stream a member's records in (measured_at, id) order without materializing them.
+
+        Reads the hot table through the (member_id, measured_at) index and the archived cold
+        segments, merged into one ordered stream; rows are produced as the caller iterates, so
+        memory use does not grow with the history.
+
+        Args:
+            member_id (str): Member identifier (NFC UID).
+            start (Optional[datetime]): Inclusive lower bound of measured_at.
+            end (Optional[datetime]): Exclusive upper bound of measured_at.
+            after (Optional[Tuple[datetime, int]]): Keyset cursor: only records after this
+                (measured_at, id) position are returned.
+            limit (Optional[int]): Maximum number of records.
+
+        Returns:
+            Iterator[HeartRateRecord]: Records in chronological order.
+        """
+        hot = HeartRateRecordRepository._iter_hot(member_id, start, end, after, limit)
+        # Start the hot query before listing the segments: rows archived from here on stay in this
+        # query's snapshot, and rows archived before are in a segment listed below
+        first = next(hot, None)
+        hot = itertools.chain([first] if first is not None else [], hot)
+        cold_rows = cold_store.iter_member(
+            member_id,
+            to_micros(start) if start is not None else None,
+            to_micros(end) if end is not None else None,
+            (to_micros(after[0]), after[1]) if after is not None else None,
+        ) if cold_store.segments() else None
+        if cold_rows is None:
+            yield from hot
+            return
+
+        cold = (
+            HeartRateRecord(member_id=member_id, bpm=round(bpm, 2), measured_at=from_micros(measured_at),
+                            created_at=from_micros(created_at), id=record_id)
+            for measured_at, record_id, created_at, bpm in cold_rows
         )
-        return [
-            HeartRateRecord(
-                member_id=r.member_id,
-                bpm=r.bpm,
-                measured_at=r.measured_at,
-                created_at=r.created_at,
-                id=r.id,
+        returned = 0
+        last_id = None
+        for record in heapq.merge(cold, hot, key=lambda r: (r.measured_at, r.id)):
+            if record.id == last_id:
+                continue  # archived but not yet deleted from the hot table
+            last_id = record.id
+            yield record
+            returned += 1
+            if limit is not None and returned >= limit:
+                return
+
+    @staticmethod
+    def _iter_hot(member_id: str, start: Optional[datetime], end: Optional[datetime],
+                  after: Optional[Tuple[datetime, int]], limit: Optional[int]) -> Iterator[HeartRateRecord]:
+        """Stream a member's records from the hot table only (see iter_by_member_id)."""
+        model = HeartRateRecordModel
+        query = model.select(model.id, model.member_id, model.bpm, model.measured_at, model.created_at).where(
+            model.member_id == member_id
+        )
+        if after is not None:
+            after_measured_at, after_id = after
+            if start is None or after_measured_at > start:
+                start = after_measured_at
+            # The range bound uses the index; the second term skips rows already returned at that instant
+            query = query.where((model.measured_at > after_measured_at) | (model.id > after_id))
+        if start is not None:
+            query = query.where(model.measured_at >= start)
+        if end is not None:
+            query = query.where(model.measured_at < end)
+        query = query.order_by(model.measured_at, model.id)
+        if limit is not None:
+            query = query.limit(limit)
+
+        for record_id, record_member_id, bpm, measured_at, created_at in query.tuples().iterator():
+            yield HeartRateRecord(
+                member_id=record_member_id,
+                bpm=bpm,
+                measured_at=measured_at,
+                created_at=created_at,
+                id=record_id,
+            )
+
+    @staticmethod
+    def load_series(member_id: str, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Load a member's samples as arrays in one query, for vectorized analytics.
+
+        Timestamps are converted to seconds by SQLite and the rows are copied straight from the
+        cursor into a NumPy array, without creating an entity per row. Archived samples from the
+        cold segments are included.
+
+        Args:
+            member_id (str): Member identifier (NFC UID).
+            start (Optional[datetime]): Inclusive lower bound of measured_at.
+            end (Optional[datetime]): Exclusive upper bound of measured_at.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (seconds since 1970-01-01 in naive local time, BPM),
+            ordered by measured_at.
+        """
+        model = HeartRateRecordModel
+        seconds = (fn.julianday(model.measured_at) - _UNIX_EPOCH_JULIAN_DAY) * 86400.0
+        query = model.select(seconds, model.bpm).where(model.member_id == member_id)
+        if start is not None:
+            query = query.where(model.measured_at >= start)
+        if end is not None:
+            query = query.where(model.measured_at < end)
+        query = query.order_by(model.measured_at, model.id)
+
+        cursor = db.execute(query)
+        rows = np.fromiter(cursor, dtype=[("t", np.float64), ("bpm", np.float64)])
+        # julianday() has sub-millisecond noise: round back to milliseconds
+        t, bpm = np.round(rows["t"], 3), rows["bpm"].copy()
+
+        if cold_store.segments():
+            cold_t, cold_bpm = cold_store.load_member(
+                member_id,
+                to_micros(start) if start is not None else None,
+                to_micros(end) if end is not None else None,
             )
-            for r in records
+            if cold_t.size:
+                t = np.concatenate((cold_t / 1e6, t))
+                bpm = np.concatenate((cold_bpm, bpm))
+                order = np.argsort(t, kind="stable")
+                t, bpm = t[order], bpm[order]
+        return t, bpm
+
+    @staticmethod
+    def find_columns_older_than(cutoff: datetime, limit: int) -> Optional[Tuple[np.ndarray, ...]]:
+        """Read up to `limit` of the oldest-measured records measured before `cutoff`, as columns.
+
+        Args:
+            cutoff (datetime): Exclusive upper bound of measured_at.
+            limit (int): Maximum number of rows.
+
+        Returns:
+            Optional[Tuple[np.ndarray, ...]]: (member_ids, ids, measured_at, created_at, bpm) with
+            timestamps in microseconds, or None if there are no such rows.
+        """
+        model = HeartRateRecordModel
+        query = (model
+                 .select(model.member_id, model.id, model.measured_at, model.created_at, model.bpm)
+                 .where(model.measured_at < cutoff)
+                 .order_by(model.measured_at, model.id)
+                 .limit(limit))
+        rows = db.execute(query).fetchall()
+        if not rows:
+            return None
+        member_ids, ids, measured_at, created_at, bpm = zip(*rows)
+        return (
+            np.array(member_ids, dtype=str),
+            np.array(ids, dtype=np.int64),
+            np.array(measured_at, dtype="datetime64[us]").astype(np.int64),
+            np.array(created_at, dtype="datetime64[us]").astype(np.int64),
+            np.array(bpm, dtype=np.float64),
+        )
+
+    @staticmethod
+    def delete_by_ids(ids: List[int], chunk_size: int = HR_RETENTION_DELETE_CHUNK) -> int:
+        """Delete records by id, one short transaction per chunk.
+
+        Args:
+            ids (List[int]): Record ids.
+            chunk_size (int): Ids deleted per transaction.
+
+        Returns:
+            int: Number of rows deleted.
+        """
+        deleted = 0
+        for chunk in chunked(ids, chunk_size):
+            with unit_of_work():
+                deleted += HeartRateRecordModel.delete().where(HeartRateRecordModel.id.in_(chunk)).execute()
+        return deleted
+
+
+@instrument_repository
+class HeartRateForwardRepository:
+    """Repository for heart rate samples waiting in the forward queue."""
+
+    @staticmethod
+    def enqueue(member_id: str, payload: Dict) -> QueuedHeartRate:
+        """Append a sample to the end of the queue.
+
+        Args:
+            member_id (str): Member ID.
+            payload (Dict): JSON body for the backend.
+
+        Returns:
+            QueuedHeartRate: The queued sample with its queue position.
+        """
+        now = datetime.now()
+        model = HeartRateForwardModel.create(member_id=member_id, payload=json.dumps(payload), created_at=now)
+        return QueuedHeartRate(member_id, payload, created_at=now, id=model.id)
+
+    @staticmethod
+    def enqueue_many(member_id: str, payloads: List[Dict]) -> int:
+        """Append several samples of one member to the queue, in order, in one statement per chunk.
+
+        Args:
+            member_id (str): Member ID.
+            payloads (List[Dict]): JSON bodies for the backend, oldest first.
+
+        Returns:
+            int: Number of samples queued.
+        """
+        now = datetime.now()
+        rows = [{"member_id": member_id, "payload": json.dumps(payload), "created_at": now} for payload in payloads]
+        with unit_of_work():
+            for chunk in chunked(rows, HR_INSERT_CHUNK_SIZE):
+                HeartRateForwardModel.insert_many(chunk).execute()
+        return len(rows)
+
+    @staticmethod
+    def find_pending(limit: int) -> List[QueuedHeartRate]:
+        """Find the oldest pending samples, in queue order.
+
+        Args:
+            limit (int): Maximum number of samples.
+
+        Returns:
+            List[QueuedHeartRate]: Pending samples.
+        """
+        rows = (HeartRateForwardModel
+                .select()
+                .where(HeartRateForwardModel.status == 'pending')
+                .order_by(HeartRateForwardModel.id)
+                .limit(limit))
+        return [
+            QueuedHeartRate(r.member_id, json.loads(r.payload), attempts=r.attempts, created_at=r.created_at, id=r.id)
+            for r in rows
         ]
+
+    @staticmethod
+    def delete(ids: List[int]) -> int:
+        """Remove delivered samples from the queue.
+
+        Args:
+            ids (List[int]): Queue positions.
+
+        Returns:
+            int: Number of rows deleted.
+        """
+        if not ids:
+            return 0
+        return HeartRateForwardModel.delete().where(HeartRateForwardModel.id.in_(ids)).execute()
+
+    @staticmethod
+    def mark_failed(forward_id: int, error: str, dead: bool) -> None:
+        """Record a failed replay attempt.
+
+        Args:
+            forward_id (int): Queue position.
+            error (str): Error description.
+            dead (bool): True if the backend rejected the sample (it is no longer replayed).
+        """
+        HeartRateForwardModel.update(
+            status='dead' if dead else 'pending',
+            attempts=HeartRateForwardModel.attempts + 1,
+            last_error=error
+        ).where(HeartRateForwardModel.id == forward_id).execute()
+
+    @staticmethod
+    def pending_summary() -> Tuple[int, Optional[datetime]]:
+        """Count pending samples and find when the oldest one was queued.
+
+        Returns:
+            Tuple[int, Optional[datetime]]: (queue depth, queue time of the head or None if empty).
+        """
+        row = (HeartRateForwardModel
+               .select(fn.COUNT(HeartRateForwardModel.id).alias('depth'),
+                       fn.MIN(HeartRateForwardModel.id).alias('head'))
+               .where(HeartRateForwardModel.status == 'pending')
+               .dicts()
+               .get())
+        if not row['depth']:
+            return 0, None
+        return row['depth'], HeartRateForwardModel.get_by_id(row['head']).created_at
+
+    @staticmethod
+    def count_dead() -> int:
+        """Count samples the backend rejected.
+
+        Returns:
+            int: Number of dead samples.
+        """
+        return HeartRateForwardModel.select().where(HeartRateForwardModel.status == 'dead').count()
@@ -0,0 +1,250 @@
+"""
+Write-behind buffer for heart rate records.
+
+Storing every sample (or every small batch) in its own transaction pays one commit, and its WAL
+sync, per request. With HR_WRITE_MODE set, records are appended to an in-memory buffer instead
+and a flusher thread commits them in batches of up to HR_WRITE_BATCH_ROWS rows, at most
+HR_WRITE_BATCH_MS after the first buffered record:
+
+- "group": the request waits until its batch has committed, so an accepted sample is durable;
+  concurrent requests share one commit.
+- "async": the request returns as soon as its records are buffered. Samples buffered when the
+  process crashes are lost (at most one batch window); they are flushed on a normal shutdown.
+- "direct" (default): no buffering, one transaction per request.
+
+When HR_WRITE_BUFFER_MAX rows are waiting, new records wait up to HR_WRITE_FULL_WAIT_MS for room
+and are then refused (WriteBufferFullError, answered with 503) rather than growing the buffer.
+Live buffers are updated right away; history and analytics queries see a record once its batch
+has committed. Batches are stored through the single writer when WRITER_MODE=client.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from health.domain.entities import HeartRateRecord
+from shared.infrastructure.http_client import LatencyStats
+from shared.infrastructure.metrics import metrics
+from shared.infrastructure.writer import submit_write
+
+logger = logging.getLogger(__name__)
+
+HR_WRITE_MODE = os.getenv("HR_WRITE_MODE", "direct").lower()
+HR_WRITE_BATCH_ROWS = int(os.getenv("HR_WRITE_BATCH_ROWS", "500"))
+HR_WRITE_BATCH_MS = float(os.getenv("HR_WRITE_BATCH_MS", "50"))
+HR_WRITE_BUFFER_MAX = int(os.getenv("HR_WRITE_BUFFER_MAX", "20000"))
+HR_WRITE_FULL_WAIT_MS = float(os.getenv("HR_WRITE_FULL_WAIT_MS", "200"))
+
+WRITE_MODES = ("direct", "group", "async")
+if HR_WRITE_MODE not in WRITE_MODES:
+    raise ValueError(f"Unknown HR_WRITE_MODE {HR_WRITE_MODE!r} (expected one of {', '.join(WRITE_MODES)})")
+
+
+class WriteBufferFullError(RuntimeError):
+    """Raised when records cannot be buffered because the write-behind buffer stayed full."""
+
+
+def save_heart_rate_batch(records: List[HeartRateRecord]) -> int:
+    """Store one flushed batch in a single transaction (through the single writer if configured)."""
+    return submit_write("health.save_heart_rate_batch", records)
+
+
+class _Batch:
+    """Records buffered for the same commit, and the outcome "group" requests wait for."""
+
+    __slots__ = ("records", "first_at", "done", "error")
+
+    def __init__(self):
+        self.records: List[HeartRateRecord] = []
+        self.first_at: Optional[float] = None
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+
+class HeartRateWriteBuffer:
+    """Buffers heart rate records and commits them in batches bounded by size and by latency.
+
+    Attributes:
+        mode (str): "direct", "group" or "async" (see module docstring).
+        enabled (bool): True unless mode is "direct".
+        commit_latency (LatencyStats): Duration of the batch commits.
+    """
+
+    def __init__(self, mode: str = HR_WRITE_MODE, batch_rows: int = HR_WRITE_BATCH_ROWS,
+                 batch_ms: float = HR_WRITE_BATCH_MS, max_rows: int = HR_WRITE_BUFFER_MAX,
+                 full_wait_ms: float = HR_WRITE_FULL_WAIT_MS,
+                 sink: Callable[[List[HeartRateRecord]], int] = save_heart_rate_batch):
+        """Initialize a HeartRateWriteBuffer instance.
+
+        Args:
+            mode (str): Durability mode ("direct", "group" or "async").
+            batch_rows (int): Buffered rows that trigger an immediate commit.
+            batch_ms (float): Maximum time a record waits before its batch is committed.
+            max_rows (int): Rows buffered or being committed above which new records wait.
+            full_wait_ms (float): How long a request waits for room before being refused.
+            sink (Callable[[List[HeartRateRecord]], int]): Stores one batch in one transaction.
+        """
+        self.mode = mode
+        self.enabled = mode != "direct"
+        self.batch_rows = max(1, batch_rows)
+        self.window = batch_ms / 1000.0
+        self.max_rows = max(self.batch_rows, max_rows)
+        self.full_wait = full_wait_ms / 1000.0
+        self.sink = sink
+        self.commit_latency = LatencyStats()
+        self._batch = _Batch()
+        self._pending = 0  # rows buffered or being committed
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._sizes = deque(maxlen=1024)
+        self.buffered = 0
+        self.committed = 0
+        self.commits = 0
+        self.refused = 0
+        self.lost = 0
+        self.last_error: Optional[str] = None
+
+    def start(self) -> None:
+        """Start the flusher thread (no-op in "direct" mode)."""
+        if not self.enabled or self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="hr-write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Commit the buffered records and stop the flusher thread."""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._thread = None
+
+    @property
+    def pending(self) -> int:
+        """Rows buffered or being committed."""
+        return self._pending
+
+    def add(self, records: List[HeartRateRecord]) -> int:
+        """Buffer records for the next batch commit.
+
+        In "group" mode, returns once the batch holding the records has committed.
+
+        Args:
+            records (List[HeartRateRecord]): Validated records.
+
+        Returns:
+            int: Number of records accepted.
+
+        Raises:
+            WriteBufferFullError: If the buffer stayed full for HR_WRITE_FULL_WAIT_MS.
+            Exception: In "group" mode, the error of a failed batch commit.
+        """
+        if not records:
+            return 0
+        count = len(records)
+        with self._cond:
+            if self._thread is None:
+                raise RuntimeError("Write-behind buffer is not running")
+            deadline = time.monotonic() + self.full_wait
+            while self._pending + count > self.max_rows and self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.refused += count
+                    raise WriteBufferFullError(f"Heart rate write buffer full ({self._pending} rows pending)")
+                self._cond.wait(remaining)
+            batch = self._batch
+            if batch.first_at is None:
+                batch.first_at = time.monotonic()
+            batch.records.extend(records)
+            self._pending += count
+            self.buffered += count
+            if len(batch.records) == count or len(batch.records) >= self.batch_rows:
+                self._cond.notify_all()  # first record of the batch (starts the window) or batch full
+        if self.mode == "group":
+            batch.done.wait()
+            if batch.error is not None:
+                raise batch.error
+        return count
+
+    def _run(self) -> None:
+        """Flusher thread: commit the batch when its window is over or it is full."""
+        while True:
+            with self._cond:
+                while True:
+                    batch = self._batch
+                    if batch.records and (self._stopping or len(batch.records) >= self.batch_rows):
+                        break
+                    if not batch.records:
+                        if self._stopping:
+                            return
+                        self._cond.wait()
+                        continue
+                    remaining = batch.first_at + self.window - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                self._batch = _Batch()
+            self._commit(batch)
+
+    def _commit(self, batch: _Batch) -> None:
+        """Store one batch, release the requests waiting for it and make room for new records."""
+        size = len(batch.records)
+        started = time.perf_counter()
+        try:
+            self.sink(batch.records)
+        except Exception as e:  # noqa: BLE001 - reported to "group" waiters, counted in "async" mode
+            batch.error = e
+            self.last_error = str(e)
+            logger.exception("Committing %d buffered heart rate records failed", size)
+        self.commit_latency.record(time.perf_counter() - started, error=batch.error is not None)
+        self._sizes.append(size)
+        self.commits += 1
+        if batch.error is None:
+            self.committed += size
+        elif self.mode == "async":
+            self.lost += size  # already acknowledged: nobody is left to report the failure to
+        batch.done.set()
+        with self._cond:
+            self._pending -= size
+            self._cond.notify_all()
+
+    def stats(self) -> Dict:
+        """Return the mode, pending rows, commit sizes and latency, and refused/lost counters.
+
+        Returns:
+            Dict: Write-behind buffer statistics.
+        """
+        sizes = sorted(self._sizes)
+
+        def percentile(p: float) -> Optional[int]:
+            return sizes[min(len(sizes) - 1, int(p * len(sizes)))] if sizes else None
+
+        return {
+            "mode": self.mode,
+            "batch_rows": self.batch_rows,
+            "batch_ms": self.window * 1000,
+            "max_rows": self.max_rows,
+            "pending": self._pending,
+            "buffered": self.buffered,
+            "committed": self.committed,
+            "commits": self.commits,
+            "refused": self.refused,
+            "lost": self.lost,
+            "last_error": self.last_error,
+            "commit_size": {"mean": round(sum(sizes) / len(sizes), 1) if sizes else None,
+                            "p50": percentile(0.50), "p95": percentile(0.95), "max": sizes[-1] if sizes else None},
+            "commit_latency": self.commit_latency.snapshot(),
+        }
+
+
+heart_rate_write_buffer = HeartRateWriteBuffer()
+metrics.gauge_callback("edge_hr_write_buffer_pending", "Heart rate records buffered or being committed.",
+                       lambda: heart_rate_write_buffer.pending)
@@ -0,0 +1,99 @@
+"""Async (ASGI) interface of the simplified health bounded context, mirroring health.interfaces.services.
+
+Validation and response building are shared with the Flask handlers; blocking helpers run on the
+executor.
+"""
+from health.infrastructure.forwarding import forward_coalescer, forward_queue, heart_rate_url, should_retry
+from health.interfaces.services import (
+    BACKEND_BASE_URL, _backend_headers, heart_rate_analytics_response, heart_rate_batch_response,
+    heart_rate_history_response, heart_rate_service, heart_rate_stats, live_heart_rate_response,
+    parse_proxied_bpm,
+)
+from shared.infrastructure.async_http_client import async_backend_client
+from shared.infrastructure.http_client import backend_client
+from shared.interfaces.asgi import Request, Router, run_blocking
+
+equipment_routes = Router()
+
+
+@equipment_routes.route("/api/check/out", methods=["POST"])
+async def forward_check_out(request: Request):
+    """Forward check-out/in request from ESP32 to backend without blocking the event loop."""
+    try:
+        url = f"{BACKEND_BASE_URL}/api/check/out"
+        resp = await async_backend_client.post(url, headers=_backend_headers())
+        return resp.json(), resp.status_code
+    except Exception as e:
+        return {"error": f"Forwarding failed: {str(e)}"}, 502
+
+
+@equipment_routes.route("/api/heart-rate/<member_id>", methods=["POST"])
+async def forward_heart_rate(request: Request):
+    """Forward heart rate data from ESP32 to backend without blocking the event loop.
+
+    Queues or buffers the sample like health.interfaces.services.forward_heart_rate (the queue
+    insert runs on the executor).
+    """
+    member_id = request.path_params["member_id"]
+    try:
+        bpm = parse_proxied_bpm(request.json)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    # In-memory only, cheap enough to run on the loop
+    heart_rate_service.observe_heart_rate(member_id, bpm)
+    if forward_coalescer.enabled:
+        # Also during a backlog: the flusher queues buffered samples in arrival order
+        return forward_coalescer.add(member_id, bpm)
+    if forward_queue.has_backlog():
+        return await run_blocking(forward_queue.enqueue, member_id, bpm)
+    try:
+        resp = await async_backend_client.post(heart_rate_url(member_id), json={"bpm": bpm},
+                                               headers=_backend_headers())
+    except Exception as e:
+        return await run_blocking(forward_queue.enqueue, member_id, bpm, str(e))
+    if forward_queue.enabled and should_retry(resp.status_code):
+        return await run_blocking(forward_queue.enqueue, member_id, bpm, f"HTTP {resp.status_code}")
+    try:
+        return resp.json(), resp.status_code
+    except Exception as e:
+        return {"error": f"Forwarding failed: {str(e)}"}, 502
+
+
+@equipment_routes.route("/api/v1/heart-rate/batch", methods=["POST"])
+async def record_heart_rate_batch(request: Request):
+    """Store a batch of heart rate samples locally (see health.interfaces.services.record_heart_rate_batch)."""
+    return await run_blocking(heart_rate_batch_response, request.json)
+
+
+@equipment_routes.route("/api/v1/heart-rate/<member_id>/live", methods=["GET"])
+async def get_live_heart_rate(request: Request):
+    """Get a member's recent heart rate from memory (see health.interfaces.services.get_live_heart_rate)."""
+    # In-memory only, cheap enough to run on the loop
+    return live_heart_rate_response(request.path_params["member_id"], request.args)
+
+
+@equipment_routes.route("/api/v1/heart-rate/<member_id>/history", methods=["GET"])
+async def get_heart_rate_history(request: Request):
+    """Get a member's stored heart rate history (see health.interfaces.services.get_heart_rate_history).
+
+    The page is read on the executor (bounded by HR_HISTORY_MAX_LIMIT) and sent as one response.
+    """
+    return await run_blocking(heart_rate_history_response, request.path_params["member_id"], request.args)
+
+
+@equipment_routes.route("/api/v1/heart-rate/<member_id>/analytics", methods=["GET"])
+async def get_heart_rate_analytics(request: Request):
+    """Get heart rate analytics (see health.interfaces.services.get_heart_rate_analytics)."""
+    return await run_blocking(heart_rate_analytics_response, request.path_params["member_id"], request.args)
+
+
+@equipment_routes.route("/api/v1/heart-rate/stats", methods=["GET"])
+async def get_heart_rate_stats(request: Request):
+    """Get statistics of the heart rate buffers, channels, caches and queues."""
+    return await run_blocking(heart_rate_stats), 200
+
+
+@equipment_routes.route("/api/v1/upstream/stats", methods=["GET"])
+async def get_upstream_stats(request: Request):
+    """Get latency and circuit breaker state of each upstream backend (async and pooled clients)."""
+    return {"upstreams": async_backend_client.stats(), "background_upstreams": backend_client.stats()}, 200
@@ -1,22 +1,29 @@
 """Interface services for the simplified health bounded context."""
+import json
+import math
 import os
-from typing import Dict
+from typing import Dict, Iterator, Tuple
 
-import requests
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
+
+from health.application.services import HeartRateApplicationService
+from health.infrastructure.forwarding import BACKEND_BASE_URL, forward_coalescer, forward_queue
+from health.infrastructure.forwarding import backend_headers as _backend_headers
+from health.infrastructure.write_behind import WriteBufferFullError
+from health.interfaces.stream import telemetry_stream
+from shared.infrastructure.http_client import backend_client
+from shared.infrastructure.writer import WriterUnavailableError
 
 equipment_api = Blueprint("equipment_api", __name__)
 
-BACKEND_BASE_URL = os.getenv("BACKEND_BASE_URL", "http://localhost:8080")
-BACKEND_TOKEN = os.getenv("BACKEND_TOKEN")  # Bearer token for secured backend
+# Initialize dependencies
+heart_rate_service = HeartRateApplicationService()
 
+HR_BATCH_MAX_SAMPLES = int(os.getenv("HR_BATCH_MAX_SAMPLES", "2000"))
+HR_HISTORY_DEFAULT_LIMIT = int(os.getenv("HR_HISTORY_DEFAULT_LIMIT", "500"))
+HR_HISTORY_MAX_LIMIT = int(os.getenv("HR_HISTORY_MAX_LIMIT", "10000"))
 
-def _backend_headers() -> Dict[str, str]:
-    """Build headers for forwarding to backend."""
-    headers = {"Content-Type": "application/json"}
-    if BACKEND_TOKEN:
-        headers["Authorization"] = f"Bearer {BACKEND_TOKEN}"
-    return headers
+_json_encoder = json.JSONEncoder()
 
 
 @equipment_api.route("/api/check/out", methods=["POST"])
@@ -24,23 +31,300 @@ def forward_check_out():
     """Forward check-out/in request from ESP32 to backend."""
     try:
         url = f"{BACKEND_BASE_URL}/api/check/out"
-        resp = requests.post(url, headers=_backend_headers(), timeout=5)
+        resp = backend_client.post(url, headers=_backend_headers())
         return jsonify(resp.json()), resp.status_code
     except Exception as e:
         return jsonify({"error": f"Forwarding failed: {str(e)}"}), 502
 
 
+def parse_proxied_bpm(data):
+    """Return the bpm of a sample proxied to the backend.
+
+    Args:
+        data: Parsed JSON body.
+
+    Returns:
+        The bpm value, forwarded as sent.
+
+    Raises:
+        ValueError: If the body has no bpm field.
+    """
+    if not isinstance(data, dict) or "bpm" not in data:
+        raise ValueError("Missing required field: bpm")
+    return data["bpm"]
+
+
 @equipment_api.route("/api/heart-rate/<member_id>", methods=["POST"])
 def forward_heart_rate(member_id: str):
-    """Forward heart rate data from ESP32 to backend."""
-    data = request.json or {}
+    """Forward heart rate data from ESP32 to backend.
+
+    While the backend is unreachable (or samples are still queued) the sample is stored in the
+    forward queue and 202 {"queued": true} is returned; it is replayed in order later. With
+    coalescing enabled the sample is buffered and acknowledged with 202 {"accepted": true}.
+    """
     try:
-        bpm = data["bpm"]
-        url = f"{BACKEND_BASE_URL}/api/heart-rate/{member_id}"
-        resp = requests.post(url, json={"bpm": bpm}, headers=_backend_headers(), timeout=5)
-        return jsonify(resp.json()), resp.status_code
-    except KeyError:
-        return jsonify({"error": "Missing required field: bpm"}), 400
+        bpm = parse_proxied_bpm(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        heart_rate_service.observe_heart_rate(member_id, bpm)
+        if forward_coalescer.enabled:
+            # Also during a backlog: the flusher queues buffered samples in arrival order
+            body, status = forward_coalescer.add(member_id, bpm)
+        else:
+            body, status = forward_queue.forward(member_id, bpm)
+        return jsonify(body), status
     except Exception as e:
         return jsonify({"error": f"Forwarding failed: {str(e)}"}), 502
 
+
+def heart_rate_batch_response(data) -> Tuple[Dict, int]:
+    """Validate a batch body, store its samples and build the response.
+
+    Args:
+        data: Parsed JSON body ({"samples": [...]} or the bare list).
+
+    Returns:
+        Tuple[Dict, int]: (response payload, status code).
+    """
+    samples = data.get("samples") if isinstance(data, dict) else data
+    if not isinstance(samples, list):
+        return {"error": "Expected a JSON list of samples or {\"samples\": [...]}"}, 400
+    if len(samples) > HR_BATCH_MAX_SAMPLES:
+        return {"error": f"Batch too large: max {HR_BATCH_MAX_SAMPLES} samples"}, 413
+
+    try:
+        return heart_rate_service.record_heart_rate_batch(samples), 200
+    except (WriterUnavailableError, WriteBufferFullError) as e:
+        return {"error": str(e)}, 503
+    except Exception as e:
+        return {"error": f"Internal error: {str(e)}"}, 500
+
+
+@equipment_api.route("/api/v1/heart-rate/batch", methods=["POST"])
+def record_heart_rate_batch():
+    """Store a batch of heart rate samples locally.
+
+    Expects JSON {"samples": [{"member_id", "bpm", "measured_at"}, ...]} (or the bare list).
+    Invalid samples are reported per item without failing the rest of the batch.
+
+    Returns:
+        tuple: (JSON response with accepted count and rejects, status code).
+    """
+    body, status = heart_rate_batch_response(request.get_json(silent=True))
+    return jsonify(body), status
+
+
+def live_heart_rate_response(member_id: str, args) -> Tuple[Dict, int]:
+    """Validate a live heart rate request and read the buffers (in memory only).
+
+    Args:
+        member_id (str): Member identifier.
+        args: Query string mapping (resolution, window).
+
+    Returns:
+        Tuple[Dict, int]: (response payload, status code).
+    """
+    resolution = args.get("resolution", "10")
+    try:
+        window = int(args.get("window", "300"))
+    except ValueError:
+        return {"error": "window must be an integer number of seconds"}, 400
+
+    try:
+        return heart_rate_service.get_live_heart_rate(member_id, resolution, window), 200
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+
+@equipment_api.route("/api/v1/heart-rate/<member_id>/live", methods=["GET"])
+def get_live_heart_rate(member_id: str):
+    """Get a member's recent heart rate from memory (for live dashboards).
+
+    Query params: resolution (raw, 1, 10, 60; default 10) and window in seconds (default 300).
+
+    Returns:
+        tuple: (JSON response with latest sample and points, status code).
+    """
+    body, status = live_heart_rate_response(member_id, request.args)
+    return jsonify(body), status
+
+
+def parse_history_args(args) -> Dict:
+    """Validate the query params of a history request.
+
+    Args:
+        args: Query string mapping (from, to, limit, cursor, bucket).
+
+    Returns:
+        Dict: Keyword arguments for HeartRateApplicationService.get_heart_rate_history.
+
+    Raises:
+        ValueError: If limit or bucket is not a positive integer.
+    """
+    try:
+        limit = int(args.get("limit", HR_HISTORY_DEFAULT_LIMIT))
+        bucket = int(args["bucket"]) if args.get("bucket") else None
+    except ValueError:
+        raise ValueError("limit and bucket must be integers")
+    if not 0 < limit <= HR_HISTORY_MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {HR_HISTORY_MAX_LIMIT}")
+    return {
+        "start": args.get("from"),
+        "end": args.get("to"),
+        "limit": limit,
+        "cursor": args.get("cursor"),
+        "bucket_seconds": bucket,
+    }
+
+
+def heart_rate_history_response(member_id: str, args) -> Tuple[Dict, int]:
+    """Validate a history request and read its page.
+
+    The page is read completely (at most HR_HISTORY_MAX_LIMIT items) before anything is sent, so a
+    database error still gets a proper status instead of a truncated 200 body. The records behind a
+    downsampled page are streamed from the database and never held in memory.
+
+    Args:
+        member_id (str): Member identifier.
+        args: Query string mapping (see parse_history_args).
+
+    Returns:
+        Tuple[Dict, int]: ({member_id, bucket_seconds, items, next_cursor} or error payload, status code).
+    """
+    try:
+        params = parse_history_args(args)
+        page = heart_rate_service.get_heart_rate_history(member_id, **params)
+        items = list(page)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    except Exception as e:
+        return {"error": f"Internal error: {str(e)}"}, 500
+    return {
+        "member_id": member_id,
+        "bucket_seconds": params["bucket_seconds"],
+        "items": items,
+        "next_cursor": page.next_cursor
+    }, 200
+
+
+def iter_json(payload: Dict, chunk_size: int = 64 * 1024) -> Iterator[str]:
+    """Encode a payload as JSON in chunks of about chunk_size characters, for a streamed body."""
+    pending = []
+    size = 0
+    for piece in _json_encoder.iterencode(payload):
+        pending.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield "".join(pending)
+            pending, size = [], 0
+    if pending:
+        yield "".join(pending)
+
+
+@equipment_api.route("/api/v1/heart-rate/<member_id>/history", methods=["GET"])
+def get_heart_rate_history(member_id: str):
+    """Get a member's stored heart rate history, oldest first.
+
+    Query params: from and to (ISO 8601 or epoch; to is exclusive), limit, cursor (next_cursor of
+    the previous page) and bucket (downsample into buckets of that many seconds). The page is read
+    before the response starts; its JSON is then streamed in chunks instead of built as one string.
+
+    Returns:
+        Response: JSON {member_id, bucket_seconds, items, next_cursor}, or (JSON error, status code).
+    """
+    body, status = heart_rate_history_response(member_id, request.args)
+    if status != 200:
+        return jsonify(body), status
+    return Response(iter_json(body), mimetype="application/json")
+
+
+def parse_analytics_args(args) -> Dict:
+    """Validate the query params of an analytics request (window, max_hr, rolling).
+
+    Raises:
+        ValueError: If a param is not a finite number.
+    """
+    try:
+        params = {
+            "window_seconds": int(args.get("window", "86400")),
+            "max_hr": float(args["max_hr"]) if args.get("max_hr") else None,
+            "rolling_window": float(args["rolling"]) if args.get("rolling") else None,
+        }
+    except ValueError:
+        raise ValueError("window, max_hr and rolling must be numbers")
+    # float() accepts "nan" and "inf": NaN would reach the response as invalid JSON
+    if any(value is not None and not math.isfinite(value) for value in params.values()):
+        raise ValueError("window, max_hr and rolling must be finite numbers")
+    return params
+
+
+def heart_rate_analytics_response(member_id: str, args) -> Tuple[Dict, int]:
+    """Validate an analytics request and compute (or fetch from cache) its result.
+
+    Args:
+        member_id (str): Member identifier.
+        args: Query string mapping (see parse_analytics_args).
+
+    Returns:
+        Tuple[Dict, int]: (response payload, status code).
+    """
+    try:
+        params = parse_analytics_args(args)
+        return heart_rate_service.get_heart_rate_analytics(member_id, **params), 200
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    except Exception as e:
+        return {"error": f"Internal error: {str(e)}"}, 500
+
+
+@equipment_api.route("/api/v1/heart-rate/<member_id>/analytics", methods=["GET"])
+def get_heart_rate_analytics(member_id: str):
+    """Get heart rate analytics of a member's stored samples.
+
+    Query params: window in seconds (default 86400), max_hr for the zones and rolling window in
+    seconds.
+
+    Returns:
+        tuple: (JSON response with zones, rolling statistics and visit summaries, status code).
+    """
+    body, status = heart_rate_analytics_response(member_id, request.args)
+    return jsonify(body), status
+
+
+def heart_rate_stats() -> Dict:
+    """Collect the statistics of the heart rate buffers, channels, caches and queues.
+
+    Returns:
+        Dict: Statistics per component.
+    """
+    return {
+        "live_buffers": heart_rate_service.get_live_store_stats(),
+        "write_buffer": heart_rate_service.get_write_buffer_stats(),
+        "stream": telemetry_stream.stats(),
+        "analytics_cache": heart_rate_service.get_analytics_cache_stats(),
+        "cold_storage": heart_rate_service.get_cold_storage_stats(),
+        "forward_queue": heart_rate_service.get_forward_queue_stats(),
+        "forward_coalescer": forward_coalescer.stats()
+    }
+
+
+@equipment_api.route("/api/v1/heart-rate/stats", methods=["GET"])
+def get_heart_rate_stats():
+    """Get statistics of the heart rate buffers, channels, caches and queues.
+
+    Returns:
+        tuple: (JSON response with live buffer, write buffer, stream, cache, cold storage, forward
+        queue and coalescer statistics, status code).
+    """
+    return jsonify(heart_rate_stats()), 200
+
+
+@equipment_api.route("/api/v1/upstream/stats", methods=["GET"])
+def get_upstream_stats():
+    """Get latency and circuit breaker state of each upstream backend.
+
+    Returns:
+        tuple: (JSON response with per-upstream statistics, status code).
+    """
+    return jsonify({"upstreams": backend_client.stats()}), 200
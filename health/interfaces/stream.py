@@ -0,0 +1,334 @@
+"""
+Streaming telemetry interface of the simplified health bounded context.
+
+A long-lived, line-delimited TCP channel for ESP32 heart rate sensors: the device authenticates once
+and then streams one sample per line, instead of paying an HTTP request per BPM reading.
+
+Protocol (UTF-8, one message per line, "\\n" terminated):
+
+    -> {"device_id": "gym-esp32-001", "api_key": "..."}          first line: hello
+    <- {"ok": true, "batch_size": 100, "flush_ms": 500}
+    -> {"member_id": "ABC123", "bpm": 72, "measured_at": 1718000000123}
+    -> ABC123,73,1718000000623                                    compact form: member_id,bpm[,measured_at]
+    <- {"ack": 2, "accepted": 2, "rejected": []}                  after each micro-batch is stored
+
+Samples are numbered per connection from 1; "ack" is the number of the last sample covered, so the
+device can drop everything up to it from its local buffer. Rejected samples are reported as
+{"seq", "error"}. Samples are validated by HeartRateService and stored in micro-batches of up to
+HR_STREAM_BATCH_SIZE samples, or every HR_STREAM_FLUSH_MS, whichever comes first.
+"""
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from health.application.services import HeartRateApplicationService
+from shared.infrastructure.database import db
+from shared.infrastructure.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+HR_STREAM_ENABLED = os.getenv("HR_STREAM_ENABLED", "true").lower() == "true"
+HR_STREAM_HOST = os.getenv("HR_STREAM_HOST", os.getenv("HOST", "0.0.0.0"))
+HR_STREAM_PORT = int(os.getenv("HR_STREAM_PORT", "5001"))
+HR_STREAM_BATCH_SIZE = int(os.getenv("HR_STREAM_BATCH_SIZE", "100"))
+HR_STREAM_FLUSH_MS = int(os.getenv("HR_STREAM_FLUSH_MS", "500"))
+HR_STREAM_IDLE_TIMEOUT = float(os.getenv("HR_STREAM_IDLE_TIMEOUT", "120"))
+HR_STREAM_MAX_LINE_BYTES = int(os.getenv("HR_STREAM_MAX_LINE_BYTES", "1024"))
+
+# Authenticates a device: (device_id, api_key) -> bool
+Authenticator = Callable[[str, str], bool]
+
+
+def parse_sample_line(line: str) -> Dict:
+    """Parse one sample line (JSON object or compact "member_id,bpm[,measured_at]").
+
+    Args:
+        line (str): Line without its terminator.
+
+    Returns:
+        Dict: Sample with member_id, bpm and optional measured_at, ready for create_records().
+
+    Raises:
+        ValueError: If the line is neither a JSON object nor a compact sample.
+    """
+    if line.startswith("{"):
+        sample = json.loads(line)
+        if not isinstance(sample, dict):
+            raise ValueError("Sample must be an object")
+        return sample
+
+    parts = [part.strip() for part in line.split(",")]
+    if len(parts) not in (2, 3):
+        raise ValueError("Expected member_id,bpm[,measured_at]")
+    sample = {"member_id": parts[0], "bpm": parts[1]}
+    if len(parts) == 3 and parts[2]:
+        measured_at = parts[2]
+        try:
+            # Epoch seconds/milliseconds are sent as plain numbers
+            sample["measured_at"] = float(measured_at)
+        except ValueError:
+            sample["measured_at"] = measured_at
+    return sample
+
+
+class TelemetryStreamHandler(socketserver.BaseRequestHandler):
+    """Serves one device connection: hello, then a stream of samples stored in micro-batches."""
+
+    server: "_TelemetryTCPServer"
+
+    def setup(self) -> None:
+        self.stream: "TelemetryStream" = self.server.stream
+        self.buffer = b""
+        self.seq = 0
+        self.pending: List[Dict] = []
+        self.pending_seqs: List[int] = []
+        self.parse_rejects: List[Dict] = []
+        self.flush_deadline: Optional[float] = None
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle(self) -> None:
+        hello = self._read_line(HR_STREAM_IDLE_TIMEOUT)
+        if hello is None or not self._authenticate(hello):
+            return
+        self.stream.connection_opened()
+        try:
+            self._serve_samples()
+        finally:
+            self._flush()
+            self.stream.connection_closed()
+
+    def finish(self) -> None:
+        # Return the pooled connection used by this thread's micro-batches
+        if not db.is_closed():
+            db.close()
+
+    def _authenticate(self, line: bytes) -> bool:
+        try:
+            hello = json.loads(line)
+            device_id, api_key = hello["device_id"], hello["api_key"]
+        except (ValueError, TypeError, KeyError):
+            self._send({"ok": False, "error": "Expected {\"device_id\", \"api_key\"} as the first line"})
+            return False
+        if not self.stream.authenticate(str(device_id), str(api_key)):
+            self.stream.record_auth_failure()
+            self._send({"ok": False, "error": "Invalid device_id or API key"})
+            return False
+        return self._send({"ok": True, "batch_size": self.stream.batch_size, "flush_ms": self.stream.flush_ms})
+
+    def _serve_samples(self) -> None:
+        while True:
+            if self.flush_deadline is not None:
+                timeout = max(0.0, self.flush_deadline - time.monotonic())
+            else:
+                timeout = HR_STREAM_IDLE_TIMEOUT
+            line = self._read_line(timeout)
+            if line is None:
+                if self.flush_deadline is None:
+                    return  # idle timeout or disconnect with nothing pending
+                if not self._flush():
+                    return
+                if self.buffer is None:
+                    return  # disconnected
+                continue
+            self._accept_line(line)
+            if len(self.pending) >= self.stream.batch_size or (
+                    self.flush_deadline is not None and time.monotonic() >= self.flush_deadline):
+                if not self._flush():
+                    return
+
+    def _accept_line(self, line: bytes) -> None:
+        text = line.decode("utf-8", errors="replace").strip()
+        if not text:
+            return
+        self.seq += 1
+        try:
+            sample = parse_sample_line(text)
+        except ValueError as e:
+            self.parse_rejects.append({"seq": self.seq, "error": str(e) or "Malformed sample"})
+        else:
+            self.pending.append(sample)
+            self.pending_seqs.append(self.seq)
+        if self.flush_deadline is None:
+            self.flush_deadline = time.monotonic() + self.stream.flush_ms / 1000.0
+
+    def _flush(self) -> bool:
+        """Store the pending micro-batch and acknowledge it; returns False if the ack cannot be sent."""
+        if self.flush_deadline is None:
+            return True
+        samples, seqs, rejects = self.pending, self.pending_seqs, self.parse_rejects
+        self.pending, self.pending_seqs, self.parse_rejects = [], [], []
+        self.flush_deadline = None
+
+        received = len(samples) + len(rejects)
+        accepted = 0
+        if samples:
+            try:
+                result = self.stream.store(samples)
+            except Exception as e:
+                # Nothing of this batch was stored: do not acknowledge it, the device resends
+                logger.exception("Storing %d streamed samples failed", len(samples))
+                self._send({"error": f"Internal error: {str(e)}", "ack": seqs[0] - 1})
+                return False
+            accepted = result["accepted"]
+            rejects = rejects + [{"seq": seqs[r["index"]], "error": r["error"]} for r in result["rejected"]]
+            rejects.sort(key=lambda r: r["seq"])
+        self.stream.record_batch(received, accepted, len(rejects))
+        return self._send({"ack": self.seq, "accepted": accepted, "rejected": rejects})
+
+    def _read_line(self, timeout: float) -> Optional[bytes]:
+        """Return the next complete line, or None on timeout or disconnect (self.buffer is then None)."""
+        deadline = time.monotonic() + timeout
+        while b"\n" not in self.buffer:
+            if len(self.buffer) > HR_STREAM_MAX_LINE_BYTES:
+                self._send({"error": f"Line too long: max {HR_STREAM_MAX_LINE_BYTES} bytes"})
+                self.buffer = None
+                return None
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            self.request.settimeout(remaining)
+            try:
+                chunk = self.request.recv(65536)
+            except socket.timeout:
+                return None
+            except OSError:
+                chunk = b""
+            if not chunk:
+                self.buffer = None
+                return None
+            self.buffer += chunk
+        line, self.buffer = self.buffer.split(b"\n", 1)
+        return line
+
+    def _send(self, message: Dict) -> bool:
+        try:
+            self.request.sendall(json.dumps(message).encode("utf-8") + b"\n")
+            return True
+        except OSError:
+            return False
+
+
+class _TelemetryTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: Tuple[str, int], stream: "TelemetryStream"):
+        self.stream = stream
+        super().__init__(address, TelemetryStreamHandler)
+
+
+class TelemetryStream:
+    """Streaming heart rate ingest server (one thread per connected device).
+
+    Attributes:
+        batch_size (int): Maximum samples stored per micro-batch.
+        flush_ms (int): Maximum time a received sample waits before its batch is stored.
+    """
+
+    def __init__(self, heart_rate_service: HeartRateApplicationService = None,
+                 batch_size: int = HR_STREAM_BATCH_SIZE, flush_ms: int = HR_STREAM_FLUSH_MS):
+        """Initialize (without starting) a TelemetryStream.
+
+        Args:
+            heart_rate_service (HeartRateApplicationService): Service validating and storing batches.
+            batch_size (int): Maximum samples per micro-batch.
+            flush_ms (int): Maximum batching delay in milliseconds.
+        """
+        self.heart_rate_service = heart_rate_service or HeartRateApplicationService()
+        self.batch_size = batch_size
+        self.flush_ms = flush_ms
+        self.authenticate: Authenticator = lambda device_id, api_key: False
+        self._server: Optional[_TelemetryTCPServer] = None
+        self._lock = threading.Lock()
+        self._active_connections = 0
+        self._total_connections = 0
+        self._auth_failures = 0
+        self._batches = 0
+        self._samples = 0
+        self._accepted = 0
+        self._rejected = 0
+
+    @property
+    def address(self) -> Optional[Tuple[str, int]]:
+        """(host, port) the server listens on, or None when not started."""
+        return self._server.server_address if self._server else None
+
+    @property
+    def active_connections(self) -> int:
+        """Number of open stream connections."""
+        return self._active_connections
+
+    def start(self, authenticate: Authenticator, host: str = HR_STREAM_HOST, port: int = HR_STREAM_PORT) -> None:
+        """Start listening on a daemon thread (no-op if already started).
+
+        Args:
+            authenticate (Authenticator): Checks a device's (device_id, api_key) on hello.
+            host (str): Listening address.
+            port (int): Listening TCP port (0 picks a free one).
+        """
+        if self._server is not None:
+            return
+        self.authenticate = authenticate
+        self._server = _TelemetryTCPServer((host, port), self)
+        threading.Thread(target=self._server.serve_forever, name="hr-stream", daemon=True).start()
+
+    def stop(self) -> None:
+        """Stop accepting connections."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def store(self, samples: List[Dict]) -> Dict:
+        """Validate and persist one micro-batch (see HeartRateApplicationService.record_heart_rate_batch)."""
+        return self.heart_rate_service.record_heart_rate_batch(samples)
+
+    def connection_opened(self) -> None:
+        with self._lock:
+            self._active_connections += 1
+            self._total_connections += 1
+
+    def connection_closed(self) -> None:
+        with self._lock:
+            self._active_connections -= 1
+
+    def record_auth_failure(self) -> None:
+        with self._lock:
+            self._auth_failures += 1
+
+    def record_batch(self, samples: int, accepted: int, rejected: int) -> None:
+        with self._lock:
+            self._batches += 1
+            self._samples += samples
+            self._accepted += accepted
+            self._rejected += rejected
+
+    def stats(self) -> Dict:
+        """Get connection and ingest counters.
+
+        Returns:
+            Dict: Listening address, connections, micro-batches and sample counts.
+        """
+        with self._lock:
+            return {
+                "listening": "%s:%d" % self.address if self.address else None,
+                "active_connections": self._active_connections,
+                "total_connections": self._total_connections,
+                "auth_failures": self._auth_failures,
+                "batches": self._batches,
+                "samples": self._samples,
+                "accepted": self._accepted,
+                "rejected": self._rejected,
+                "avg_batch_size": round(self._samples / self._batches, 1) if self._batches else 0.0,
+            }
+
+
+# Shared streaming ingest server, started by initialize_service()
+telemetry_stream = TelemetryStream()
+metrics.gauge_callback("edge_hr_stream_connections", "Open heart rate stream connections.",
+                       lambda: telemetry_stream.active_connections)
@@ -1,10 +1,25 @@
 """Application services for the IAM bounded context."""
-from typing import Optional, Dict
-from datetime import datetime
+from typing import Optional, Dict, Union
+from datetime import datetime, timedelta
 
-from iam.domain.entities import Device, Member, CheckIn
-from iam.domain.services import AuthService, AccessControlService
-from iam.infrastructure.repositories import DeviceRepository, MemberRepository, CheckInRepository
+import peewee
+
+from iam.domain.entities import Device, Member, CheckIn, OccupancyBucket
+from iam.domain.services import AuthService, AccessControlService, OccupancySeriesService
+from iam.infrastructure.debounce import tap_debouncer
+from iam.infrastructure.occupancy import (
+    OCCUPANCY_RECONCILE_INTERVAL, OCCUPANCY_SERIES_MAX_BUCKETS, OccupancySubscription, occupancy_feed,
+)
+from iam.infrastructure.outbox import outbox_dispatcher
+from iam.infrastructure.repositories import (
+    DeviceRepository, MemberRepository, CheckInRepository, OccupancySeriesRepository, OutboxRepository,
+)
+from shared.infrastructure.database import on_commit, unit_of_work
+from shared.infrastructure.workers import PeriodicWorker
+from shared.infrastructure.writer import is_writer_client, submit_write, write_command
+
+# Range of an occupancy series request without "from", per resolution
+DEFAULT_SERIES_SPANS = {"minute": timedelta(days=1), "hour": timedelta(days=7), "day": timedelta(days=30)}
 
 
 class AuthApplicationService:
@@ -25,8 +40,16 @@ class AuthApplicationService:
         Returns:
             bool: True if authentication succeeds, False otherwise.
         """
-        device: Optional[Device] = self.device_repository.find_by_id_and_api_key(device_id, api_key)
-        return self.auth_service.authenticate(device)
+        stored_api_key = self.device_repository.find_api_key_by_device_id(device_id)
+        return self.auth_service.verify_api_key(stored_api_key, api_key)
+
+    def get_credential_cache_stats(self) -> Dict:
+        """Get hit/miss counters of the device credential cache.
+
+        Returns:
+            Dict: Cache statistics.
+        """
+        return self.device_repository.get_cache_stats()
 
     def get_or_create_test_device(self) -> Device:
         """Get or create a test device for development.
@@ -44,17 +67,60 @@ class AccessControlApplicationService:
         """Initialize the AccessControlApplicationService."""
         self.member_repository = MemberRepository()
         self.check_in_repository = CheckInRepository()
+        self.outbox_repository = OutboxRepository()
+        self.occupancy_series_repository = OccupancySeriesRepository()
         self.access_control_service = AccessControlService()
+        self.occupancy_series_service = OccupancySeriesService()
 
-    def process_nfc_access(self, nfc_uid: str) -> Dict:
+    def process_nfc_access(self, nfc_uid: str, device_id: Optional[str] = None) -> Dict:
         """Process NFC card access (check-in or check-out).
 
+        Repeated reports of the same card on the same device within the debounce window get the
+        previous result back (marked "debounced") without touching the database or the outbox.
+
+        Args:
+            nfc_uid (str): NFC card UID.
+            device_id (Optional[str]): Reporting device (scopes the debounce window).
+
+        Returns:
+            Dict: Response with action taken and details.
+        """
+        return tap_debouncer.process(device_id, nfc_uid, lambda: self._process_scan(nfc_uid))
+
+    def _process_scan(self, nfc_uid: str) -> Dict:
+        """Check a member in or out and return the result with the current occupancy.
+
+        The whole scan (member lookup/registration, active visit lookup, save, occupancy series
+        update and the backend notification written to the outbox) runs as one write transaction,
+        so two quick taps of the same card are serialized instead of racing into a double check-in.
+        The notification is delivered by the background outbox dispatcher after commit. With
+        WRITER_MODE=client the transaction runs in the writer process (see toggle_access), and the
+        occupancy it counted is applied to this process' counter.
+
         Args:
             nfc_uid (str): NFC card UID.
 
         Returns:
             Dict: Response with action taken and details.
         """
+        observed_version = self.check_in_repository.occupancy_version()
+        result = submit_write("iam.toggle_access", nfc_uid)
+
+        if result["success"] and is_writer_client():
+            # The visit was committed by the writer process, together with those of the other
+            # workers: its count includes them all (skipped if another scan's count arrived first)
+            self.check_in_repository.reconcile_occupancy(result["current_occupancy"], observed_version)
+        return result
+
+    def _toggle_access(self, nfc_uid: str) -> Dict:
+        """Check a member in or out; must run inside a unit of work.
+
+        Args:
+            nfc_uid (str): NFC card UID.
+
+        Returns:
+            Dict: Response with action taken and details, with the occupancy after the change.
+        """
         # Find member by NFC UID
         member = self.member_repository.find_by_nfc_uid(nfc_uid)
         auto_registered = False
@@ -83,6 +149,8 @@ class AccessControlApplicationService:
             # Member is checking out
             updated_check_in = self.access_control_service.create_check_out(active_check_in)
             saved_check_in = self.check_in_repository.save(updated_check_in)
+            occupancy = self._record_occupancy_change(saved_check_in.check_out_time, -1)
+            backend_event = self._enqueue_backend_event("check_out", member.nfc_uid)
             
             return {
                 "success": True,
@@ -93,12 +161,15 @@ class AccessControlApplicationService:
                 "check_in_id": saved_check_in.id,
                 "check_in_time": saved_check_in.check_in_time.isoformat(),
                 "check_out_time": saved_check_in.check_out_time.isoformat(),
-                "current_occupancy": self.check_in_repository.count_active_check_ins()
+                "backend_event": backend_event,
+                "current_occupancy": occupancy
             }
         else:
             # Member is checking in
             new_check_in = self.access_control_service.create_check_in(member)
             saved_check_in = self.check_in_repository.save(new_check_in)
+            occupancy = self._record_occupancy_change(saved_check_in.check_in_time, 1)
+            backend_event = self._enqueue_backend_event("check_in", member.nfc_uid)
             
             return {
                 "success": True,
@@ -109,16 +180,245 @@ class AccessControlApplicationService:
                 "auto_registered": auto_registered,
                 "check_in_id": saved_check_in.id,
                 "check_in_time": saved_check_in.check_in_time.isoformat(),
-                "current_occupancy": self.check_in_repository.count_active_check_ins()
+                "backend_event": backend_event,
+                "current_occupancy": occupancy
             }
 
+    def _record_occupancy_change(self, at: datetime, delta: int) -> int:
+        """Update the minute, hour and day buckets of `at` in the current unit of work.
+
+        The occupancy after the change is counted from the open visits of the same transaction,
+        so the series cannot drift from the check-ins table. The event is built as a bucket of its
+        own and merged into the stored buckets by a single upsert (no read of the stored rows).
+
+        Args:
+            at (datetime): Check-in or check-out timestamp.
+            delta (int): +1 for a check-in, -1 for a check-out.
+
+        Returns:
+            int: Occupancy after the change.
+        """
+        occupancy = self.check_in_repository.count_active_check_ins()
+        self.occupancy_series_repository.add_event([
+            self.occupancy_series_service.record_event(None, resolution, at, delta, occupancy)
+            for resolution in OccupancySeriesService.RESOLUTIONS
+        ])
+        return occupancy
+
+    def _enqueue_backend_event(self, action: str, code: str) -> Dict:
+        """Record a backend notification in the outbox of the current unit of work.
+
+        Args:
+            action (str): Event type (check_in, check_out).
+            code (str): Member code (NFC UID).
+
+        Returns:
+            Dict: Queued event summary for the scan response.
+        """
+        event = self.outbox_repository.enqueue(action, code)
+        on_commit(outbox_dispatcher.wake)
+        return {"queued": True, "event_id": event.id}
+
+    def start_backend_event_dispatcher(self) -> None:
+        """Start delivering queued backend notifications in the background."""
+        outbox_dispatcher.start()
+        outbox_dispatcher.wake()
+
+    def get_tap_debounce_stats(self) -> Dict:
+        """Get duplicate-tap suppression counters.
+
+        Returns:
+            Dict: Debounce windows, tracked cards and suppressed taps.
+        """
+        return tap_debouncer.stats()
+
+    def get_backend_event_stats(self) -> Dict:
+        """Get delivery statistics of the backend notification outbox.
+
+        Returns:
+            Dict: Dispatcher counters and outbox depth per status.
+        """
+        return outbox_dispatcher.stats()
+
+    def get_member_cache_stats(self) -> Dict:
+        """Get hit ratio and eviction statistics of the member cache.
+
+        Returns:
+            Dict: Cache statistics.
+        """
+        return self.member_repository.get_cache_stats()
+
     def get_current_occupancy(self) -> int:
         """Get the current gym occupancy.
 
         Returns:
             int: Number of members currently in the gym.
         """
-        return self.check_in_repository.count_active_check_ins()
+        return self.check_in_repository.current_occupancy()
+
+    def start_occupancy_reconciler(self, interval: float = OCCUPANCY_RECONCILE_INTERVAL) -> PeriodicWorker:
+        """Seed the occupancy counter and keep reconciling it against the database.
+
+        Args:
+            interval (float): Seconds between two reconciliations.
+
+        Returns:
+            PeriodicWorker: The started background worker.
+        """
+        self.check_in_repository.reconcile_occupancy()
+        worker = PeriodicWorker("occupancy-reconciler", interval, self.check_in_repository.reconcile_occupancy)
+        worker.start()
+        return worker
+
+    def get_occupancy_stats(self) -> Dict:
+        """Get the state of the in-memory occupancy counter.
+
+        Returns:
+            Dict: Counter value and reconciliation details.
+        """
+        return self.check_in_repository.get_occupancy_stats()
+
+    def subscribe_occupancy(self) -> Optional[OccupancySubscription]:
+        """Subscribe to live occupancy changes (pushed after each committed check-in/check-out).
+
+        Returns:
+            Optional[OccupancySubscription]: Subscription to close when done, or None if the
+            subscriber limit is reached.
+        """
+        # Make sure the feed starts from a seeded value
+        self.check_in_repository.current_occupancy()
+        return occupancy_feed.subscribe()
+
+    def get_occupancy_feed_stats(self) -> Dict:
+        """Get the state of the live occupancy feed.
+
+        Returns:
+            Dict: Subscribers and published changes.
+        """
+        return occupancy_feed.stats()
+
+    def get_occupancy_series(self, start: Union[str, datetime, None] = None, end: Union[str, datetime, None] = None,
+                             resolution: str = "hour", top: int = 5) -> Dict:
+        """Get the occupancy time series of a date range, its peak periods and a weekday/hour profile.
+
+        Reads the precomputed buckets of the range plus one lookup for the occupancy at its start,
+        so the cost grows with the number of buckets, not with the number of visits.
+
+        Args:
+            start (Union[str, datetime, None]): Range start (ISO 8601 or epoch seconds/milliseconds);
+                defaults to one day (minute), seven days (hour) or thirty days (day) before `end`.
+            end (Union[str, datetime, None]): Exclusive range end; defaults to now.
+            resolution (str): Bucket size ("minute", "hour" or "day").
+            top (int): Number of peak buckets to return.
+
+        Returns:
+            Dict: Range, series, peaks, profile and overall peak/average occupancy.
+
+        Raises:
+            ValueError: If a parameter is invalid or the range spans more than
+                OCCUPANCY_SERIES_MAX_BUCKETS buckets.
+        """
+        if resolution not in OccupancySeriesService.RESOLUTIONS:
+            raise ValueError(f"resolution must be one of {', '.join(OccupancySeriesService.RESOLUTIONS)}")
+        step = OccupancySeriesService.RESOLUTIONS[resolution]
+        end = self._parse_time_bound(end, "to") or datetime.now()
+        start = self._parse_time_bound(start, "from") or end - DEFAULT_SERIES_SPANS[resolution]
+        if start >= end:
+            raise ValueError("from must be before to")
+        first_bucket = self.occupancy_series_service.bucket_start(start, resolution)
+        if (end - first_bucket) / step > OCCUPANCY_SERIES_MAX_BUCKETS:
+            raise ValueError(f"Range too long for {resolution} resolution "
+                             f"(at most {OCCUPANCY_SERIES_MAX_BUCKETS} buckets)")
+
+        occupancy_before = self.occupancy_series_repository.find_occupancy_before(resolution, first_bucket)
+        buckets = self.occupancy_series_repository.find_range(resolution, first_bucket, end)
+        series = self.occupancy_series_service.build_series(resolution, start, end, buckets, occupancy_before)
+        peaks = self.occupancy_series_service.find_peaks(series, top)
+        profile = self.occupancy_series_service.profile(series, resolution)
+
+        def serialize(entry: Dict) -> Dict:
+            return dict(entry, bucket_start=entry["bucket_start"].isoformat())
+
+        return {
+            "resolution": resolution,
+            "from": first_bucket.isoformat(),
+            "to": end.isoformat(),
+            "bucket_count": len(series),
+            "peak_occupancy": max((entry["peak_occupancy"] for entry in series), default=occupancy_before),
+            "average_occupancy": round(sum(entry["average_occupancy"] for entry in series) / len(series), 2)
+            if series else float(occupancy_before),
+            "series": [serialize(entry) for entry in series],
+            "peaks": [serialize(entry) for entry in peaks],
+            "profile": profile,
+        }
+
+    @staticmethod
+    def _parse_time_bound(value: Union[str, datetime, None], name: str) -> Optional[datetime]:
+        """Parse a range bound given as ISO 8601 or epoch seconds/milliseconds, as local naive time."""
+        if value is None or value == "":
+            return None
+        if isinstance(value, datetime):
+            parsed = value
+        else:
+            try:
+                try:
+                    epoch = float(value)
+                except ValueError:
+                    parsed = datetime.fromisoformat(value)
+                else:
+                    parsed = datetime.fromtimestamp(epoch / 1000 if epoch > 1e11 else epoch)
+            except (ValueError, OverflowError, OSError):
+                raise ValueError(f"Invalid {name} timestamp")
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone().replace(tzinfo=None)
+        return parsed
+
+    def backfill_occupancy_series(self) -> int:
+        """Build the occupancy series from the stored visits if it is empty (first boot after upgrading).
+
+        Returns:
+            int: Number of buckets written (0 if the series already existed or there are no visits).
+        """
+        with unit_of_work():
+            if not self.occupancy_series_repository.is_empty():
+                return 0
+            return self._rebuild_occupancy_series()
+
+    def rebuild_occupancy_series(self) -> int:
+        """Recompute the whole occupancy series from the check-ins table (one pass over every visit).
+
+        Returns:
+            int: Number of buckets written.
+        """
+        with unit_of_work():
+            self.occupancy_series_repository.delete_all()
+            return self._rebuild_occupancy_series()
+
+    def _rebuild_occupancy_series(self) -> int:
+        """Replay every check-in and check-out in time order into buckets; must run inside a unit of work."""
+        events = []
+        for check_in_time, check_out_time in self.check_in_repository.find_visit_times():
+            events.append((check_in_time, 1))
+            if check_out_time is not None:
+                events.append((check_out_time, -1))
+        events.sort()  # at equal times check-outs (-1) come first
+        occupancy = 0
+        current: Dict[str, OccupancyBucket] = {}
+        ends: Dict[str, datetime] = {}
+        buckets = []
+        for at, delta in events:
+            occupancy = max(0, occupancy + delta)
+            for resolution, step in OccupancySeriesService.RESOLUTIONS.items():
+                bucket = current.get(resolution)
+                if bucket is None or at >= ends[resolution]:
+                    bucket = self.occupancy_series_service.record_event(None, resolution, at, delta, occupancy)
+                    buckets.append(bucket)
+                    current[resolution] = bucket
+                    ends[resolution] = bucket.bucket_start + step
+                else:
+                    self.occupancy_series_service.record_event(bucket, resolution, at, delta, occupancy)
+        self.occupancy_series_repository.save(buckets)
+        return len(buckets)
 
     def get_or_create_test_member(self) -> Member:
         """Get or create a test member for development.
@@ -127,3 +427,23 @@ class AccessControlApplicationService:
             Member: Test member entity.
         """
         return self.member_repository.get_or_create_test_member()
+
+
+@write_command("iam.toggle_access")
+def toggle_access(nfc_uid: str) -> Dict:
+    """Check a member in or out in one unit of work (write command, see process_nfc_access).
+
+    Args:
+        nfc_uid (str): NFC card UID.
+
+    Returns:
+        Dict: Response with action taken and details, with the occupancy after the change.
+    """
+    service = AccessControlApplicationService()
+    try:
+        with unit_of_work():
+            return service._toggle_access(nfc_uid)
+    except peewee.IntegrityError:
+        # Another writer opened a visit for this member concurrently: re-run on the committed state
+        with unit_of_work():
+            return service._toggle_access(nfc_uid)
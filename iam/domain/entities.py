@@ -109,4 +109,114 @@ class CheckIn:
         Returns:
             bool: True if member hasn't checked out yet.
         """
-        return self.check_out_time is None
\ No newline at end of file
+        return self.check_out_time is None
+
+
+class BackendEvent:
+    """Represents a check-in/check-out notification pending delivery to the backend.
+
+    Attributes:
+        id (int): Unique identifier for the event.
+        action (str): Event type (check_in, check_out).
+        code (str): Member code (NFC UID) sent to the backend.
+        attempts (int): Number of delivery attempts so far.
+        created_at (datetime): Timestamp when the event was recorded.
+    """
+
+    def __init__(self, action: str, code: str, attempts: int = 0,
+                 created_at: Optional[datetime] = None, id: Optional[int] = None):
+        """Initialize a BackendEvent instance.
+
+        Args:
+            action (str): Event type.
+            code (str): Member code.
+            attempts (int, optional): Delivery attempts so far.
+            created_at (datetime, optional): Record creation timestamp.
+            id (int, optional): Event ID.
+        """
+        self.id = id
+        self.action = action
+        self.code = code
+        self.attempts = attempts
+        self.created_at = created_at or datetime.now()
+
+
+class OccupancyBucket:
+    """Occupancy of the gym during one time bucket (a minute, an hour or a day).
+
+    Buckets are updated on every check-in and check-out; a bucket without events is not stored,
+    since its occupancy is the end occupancy of the previous stored bucket throughout.
+
+    Attributes:
+        id (int): Unique identifier for the bucket row.
+        resolution (str): Bucket size ("minute", "hour" or "day").
+        bucket_start (datetime): Start of the bucket.
+        arrivals (int): Check-ins during the bucket.
+        departures (int): Check-outs during the bucket.
+        peak_occupancy (int): Highest occupancy during the bucket.
+        end_occupancy (int): Occupancy after the last event of the bucket.
+        occupancy_seconds (float): Occupancy integrated over time from bucket_start to last_change_at.
+        last_change_at (datetime): Timestamp of the last event of the bucket.
+    """
+
+    def __init__(self, resolution: str, bucket_start: datetime, previous_occupancy: int = 0,
+                 arrivals: int = 0, departures: int = 0, peak_occupancy: Optional[int] = None,
+                 end_occupancy: Optional[int] = None, occupancy_seconds: float = 0.0,
+                 last_change_at: Optional[datetime] = None, id: Optional[int] = None):
+        """Initialize an OccupancyBucket instance.
+
+        Args:
+            resolution (str): Bucket size.
+            bucket_start (datetime): Start of the bucket.
+            previous_occupancy (int, optional): Occupancy at bucket_start (for a new bucket).
+            arrivals (int, optional): Check-ins so far.
+            departures (int, optional): Check-outs so far.
+            peak_occupancy (int, optional): Highest occupancy so far.
+            end_occupancy (int, optional): Occupancy after the last event.
+            occupancy_seconds (float, optional): Occupancy integrated up to last_change_at.
+            last_change_at (datetime, optional): Timestamp of the last event.
+            id (int, optional): Bucket row ID.
+        """
+        self.id = id
+        self.resolution = resolution
+        self.bucket_start = bucket_start
+        self.arrivals = arrivals
+        self.departures = departures
+        self.peak_occupancy = previous_occupancy if peak_occupancy is None else peak_occupancy
+        self.end_occupancy = previous_occupancy if end_occupancy is None else end_occupancy
+        self.occupancy_seconds = occupancy_seconds
+        self.last_change_at = last_change_at or bucket_start
+
+    def record(self, at: datetime, delta: int, occupancy: int) -> None:
+        """Account for a check-in (delta +1) or check-out (delta -1) at `at`.
+
+        Args:
+            at (datetime): Event timestamp (within the bucket).
+            delta (int): +1 for a check-in, -1 for a check-out.
+            occupancy (int): Occupancy right after the event.
+        """
+        elapsed = (at - self.last_change_at).total_seconds()
+        if elapsed > 0:
+            self.occupancy_seconds += self.end_occupancy * elapsed
+            self.last_change_at = at
+        if delta > 0:
+            self.arrivals += delta
+        else:
+            self.departures -= delta
+        self.end_occupancy = occupancy
+        self.peak_occupancy = max(self.peak_occupancy, occupancy)
+
+    def average_occupancy(self, until: datetime) -> float:
+        """Average occupancy from bucket_start to `until` (the bucket end, or now for the open bucket).
+
+        Args:
+            until (datetime): End of the averaging period.
+
+        Returns:
+            float: Time-weighted mean occupancy.
+        """
+        span = (until - self.bucket_start).total_seconds()
+        if span <= 0:
+            return float(self.end_occupancy)
+        tail = max(0.0, (until - self.last_change_at).total_seconds())
+        return (self.occupancy_seconds + self.end_occupancy * tail) / span
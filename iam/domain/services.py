@@ -1,7 +1,10 @@
 """Domain services for the IAM bounded context."""
-from datetime import datetime
-from typing import Optional
-from iam.domain.entities import Device, Member, CheckIn
+import hmac
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+from iam.domain.entities import Device, Member, CheckIn, OccupancyBucket
+
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
 
 
 class AuthService:
@@ -22,6 +25,21 @@ class AuthService:
         """
         return device is not None
 
+    @staticmethod
+    def verify_api_key(stored_api_key: Optional[str], presented_api_key: Optional[str]) -> bool:
+        """Compare a presented API key with the one on file in constant time.
+
+        Args:
+            stored_api_key (Optional[str]): API key on file for the device (None if unknown).
+            presented_api_key (Optional[str]): API key sent by the device.
+
+        Returns:
+            bool: True if both keys are present and equal, False otherwise.
+        """
+        if stored_api_key is None or presented_api_key is None:
+            return False
+        return hmac.compare_digest(stored_api_key.encode("utf-8"), presented_api_key.encode("utf-8"))
+
 
 class AccessControlService:
     """Service for managing gym member access control."""
@@ -80,4 +98,145 @@ class AccessControlService:
             CheckIn: Updated check-in entity.
         """
         check_in.check_out_time = datetime.now()
-        return check_in
\ No newline at end of file
+        return check_in
+
+
+class OccupancySeriesService:
+    """Service maintaining and reading the occupancy time series (minute, hour and day buckets)."""
+
+    RESOLUTIONS = {
+        "minute": timedelta(minutes=1),
+        "hour": timedelta(hours=1),
+        "day": timedelta(days=1),
+    }
+
+    def __init__(self):
+        """Initialize the OccupancySeriesService."""
+
+    @staticmethod
+    def bucket_start(at: datetime, resolution: str) -> datetime:
+        """Truncate a timestamp to the start of its bucket.
+
+        Args:
+            at (datetime): Timestamp.
+            resolution (str): Bucket size ("minute", "hour" or "day").
+
+        Returns:
+            datetime: Start of the bucket holding `at`.
+        """
+        start = at.replace(second=0, microsecond=0)
+        if resolution in ("hour", "day"):
+            start = start.replace(minute=0)
+        if resolution == "day":
+            start = start.replace(hour=0)
+        return start
+
+    def record_event(self, bucket: Optional[OccupancyBucket], resolution: str, at: datetime,
+                     delta: int, occupancy: int) -> OccupancyBucket:
+        """Account for a check-in or check-out in the bucket of `at`.
+
+        Args:
+            bucket (Optional[OccupancyBucket]): Stored bucket of `at`, or None if it has no events yet.
+            resolution (str): Bucket size.
+            at (datetime): Event timestamp.
+            delta (int): +1 for a check-in, -1 for a check-out.
+            occupancy (int): Occupancy right after the event.
+
+        Returns:
+            OccupancyBucket: The updated (or new) bucket.
+        """
+        if bucket is None:
+            bucket = OccupancyBucket(resolution, self.bucket_start(at, resolution),
+                                     previous_occupancy=max(0, occupancy - delta))
+        bucket.record(at, delta, occupancy)
+        return bucket
+
+    def build_series(self, resolution: str, start: datetime, end: datetime,
+                     buckets: Iterable[OccupancyBucket], occupancy_before: int,
+                     now: Optional[datetime] = None) -> List[Dict]:
+        """Lay the stored buckets of a range out as a continuous series.
+
+        Buckets without events carry the end occupancy of the previous one, so the cost is one
+        step per bucket in the range, whatever the number of visits.
+
+        Args:
+            resolution (str): Bucket size.
+            start (datetime): Range start (inclusive; truncated to its bucket).
+            end (datetime): Range end (exclusive; capped at now).
+            buckets (Iterable[OccupancyBucket]): Stored buckets of the range, in order.
+            occupancy_before (int): End occupancy of the last stored bucket before the range.
+            now (Optional[datetime]): Current time (defaults to datetime.now()).
+
+        Returns:
+            List[Dict]: One entry per bucket: start, arrivals, departures, peak, average and end occupancy.
+        """
+        now = now or datetime.now()
+        step = self.RESOLUTIONS[resolution]
+        stored = iter(buckets)
+        upcoming = next(stored, None)
+        level = occupancy_before
+        series = []
+        current = self.bucket_start(start, resolution)
+        end = min(end, now)
+        while current < end:
+            bucket_end = current + step
+            while upcoming is not None and upcoming.bucket_start < current:
+                upcoming = next(stored, None)
+            if upcoming is not None and upcoming.bucket_start == current:
+                bucket = upcoming
+                upcoming = next(stored, None)
+                average = bucket.average_occupancy(min(bucket_end, now))
+                entry = {"arrivals": bucket.arrivals, "departures": bucket.departures,
+                         "peak_occupancy": bucket.peak_occupancy, "end_occupancy": bucket.end_occupancy}
+                level = bucket.end_occupancy
+            else:
+                average = float(level)
+                entry = {"arrivals": 0, "departures": 0, "peak_occupancy": level, "end_occupancy": level}
+            series.append(dict(entry, bucket_start=current, average_occupancy=round(average, 2)))
+            current = bucket_end
+        return series
+
+    @staticmethod
+    def find_peaks(series: List[Dict], top: int) -> List[Dict]:
+        """Return the `top` busiest buckets (highest peak, then highest average, then earliest).
+
+        Args:
+            series (List[Dict]): Series from build_series.
+            top (int): Number of buckets to return.
+
+        Returns:
+            List[Dict]: Busiest buckets, busiest first.
+        """
+        ranked = sorted(series, key=lambda entry: (-entry["peak_occupancy"], -entry["average_occupancy"],
+                                                   entry["bucket_start"]))
+        return ranked[:top]
+
+    @staticmethod
+    def profile(series: List[Dict], resolution: str) -> Dict[str, List[Dict]]:
+        """Average the series per weekday and, below day resolution, per hour of the day.
+
+        Args:
+            series (List[Dict]): Series from build_series.
+            resolution (str): Bucket size of the series.
+
+        Returns:
+            Dict[str, List[Dict]]: "by_weekday" and "by_hour" entries with the mean of the bucket
+            averages and the highest peak of each group.
+        """
+        def summarize(groups: Dict[object, List[Dict]], label: str) -> List[Dict]:
+            return [
+                {label: key,
+                 "average_occupancy": round(sum(entry["average_occupancy"] for entry in entries) / len(entries), 2),
+                 "peak_occupancy": max(entry["peak_occupancy"] for entry in entries)}
+                for key, entries in groups.items()
+            ]
+
+        by_weekday: Dict[str, List[Dict]] = {day: [] for day in WEEKDAYS}
+        by_hour: Dict[int, List[Dict]] = {hour: [] for hour in range(24)}
+        for entry in series:
+            by_weekday[WEEKDAYS[entry["bucket_start"].weekday()]].append(entry)
+            by_hour[entry["bucket_start"].hour].append(entry)
+        result = {"by_weekday": summarize({day: entries for day, entries in by_weekday.items() if entries}, "weekday")}
+        if resolution != "day":
+            result["by_hour"] = summarize({hour: entries for hour, entries in by_hour.items() if entries}, "hour")
+        return result
@@ -0,0 +1,15 @@
+"""In-process caches for the IAM bounded context."""
+import os
+
+from shared.infrastructure.cache import LRUCache
+
+DEVICE_AUTH_CACHE_SIZE = int(os.getenv("DEVICE_AUTH_CACHE_SIZE", "256"))
+DEVICE_AUTH_CACHE_TTL = float(os.getenv("DEVICE_AUTH_CACHE_TTL", "300"))
+MEMBER_CACHE_SIZE = int(os.getenv("MEMBER_CACHE_SIZE", "4096"))
+MEMBER_CACHE_TTL = float(os.getenv("MEMBER_CACHE_TTL", "600"))
+
+# device_id -> API key on file; invalidated by DeviceRepository writes
+device_credential_cache = LRUCache(max_entries=DEVICE_AUTH_CACHE_SIZE, ttl_seconds=DEVICE_AUTH_CACHE_TTL)
+
+# nfc_uid -> Member entity (shared, treat as read-only); written through by MemberRepository
+member_cache = LRUCache(max_entries=MEMBER_CACHE_SIZE, ttl_seconds=MEMBER_CACHE_TTL)
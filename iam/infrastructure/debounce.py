@@ -0,0 +1,189 @@
+"""
+Duplicate-tap suppression for the NFC scan path of the IAM bounded context.
+
+PN532 readers often report the same card two or three times within a second. Without suppression
+every report toggles the visit (check-in immediately followed by a check-out), with the SQLite
+writes and backend notifications that go with it. The debouncer remembers the result of the last
+scan per (device, card) for a short window and answers repeats with that result instead.
+
+- Repeats arriving while the first scan is still being processed wait for its result.
+- Each repeat slides the window, so a card left on the reader never flips the visit.
+- Windows can be set per device (NFC_DEBOUNCE_DEVICE_MS="gym-esp32-001=2000,gym-esp32-002=800").
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from shared.infrastructure.metrics import metrics
+
+NFC_DEBOUNCE_MS = float(os.getenv("NFC_DEBOUNCE_MS", "1500"))
+NFC_DEBOUNCE_DEVICE_MS = os.getenv("NFC_DEBOUNCE_DEVICE_MS", "")
+NFC_DEBOUNCE_MAX_ENTRIES = int(os.getenv("NFC_DEBOUNCE_MAX_ENTRIES", "4096"))
+NFC_DEBOUNCE_WAIT_SECONDS = float(os.getenv("NFC_DEBOUNCE_WAIT_SECONDS", "5"))
+
+TAPS_DEBOUNCED = metrics.counter(
+    "edge_nfc_taps_debounced_total", "Repeated NFC taps answered from the debounce window.", ("device",))
+
+
+def parse_device_windows(spec: str) -> Dict[str, float]:
+    """Parse "device=ms,device=ms" into a mapping of device id to window in milliseconds.
+
+    Args:
+        spec (str): Comma-separated device=milliseconds pairs (empty for none).
+
+    Returns:
+        Dict[str, float]: Window per device.
+
+    Raises:
+        ValueError: If a pair is malformed.
+    """
+    windows = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        device_id, separator, value = item.partition("=")
+        if not separator or not device_id.strip():
+            raise ValueError(f"Invalid NFC_DEBOUNCE_DEVICE_MS entry {item!r} (expected device=ms)")
+        windows[device_id.strip()] = float(value)
+    return windows
+
+
+class _RecentTap:
+    """Result (or pending result) of the last scan of a card on a device."""
+
+    __slots__ = ("expires_at", "result", "done")
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+        self.result: Optional[Dict] = None
+        self.done = threading.Event()
+
+
+class TapDebouncer:
+    """Bounded map of (device_id, nfc_uid) -> last scan result, expiring after a time window.
+
+    Attributes:
+        window_ms (float): Default window in milliseconds (0 disables suppression).
+        device_windows_ms (Dict[str, float]): Per-device windows overriding the default.
+        max_entries (int): Cards tracked at most; the least recently tapped is dropped first.
+    """
+
+    def __init__(self, window_ms: float = NFC_DEBOUNCE_MS, device_windows_ms: Optional[Dict[str, float]] = None,
+                 max_entries: int = NFC_DEBOUNCE_MAX_ENTRIES, wait_seconds: float = NFC_DEBOUNCE_WAIT_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        """Initialize a TapDebouncer.
+
+        Args:
+            window_ms (float): Default window in milliseconds.
+            device_windows_ms (Optional[Dict[str, float]]): Per-device windows
+                (defaults to NFC_DEBOUNCE_DEVICE_MS).
+            max_entries (int): Maximum tracked (device, card) pairs.
+            wait_seconds (float): How long a repeat waits for the scan it duplicates to finish.
+            clock (Callable[[], float]): Monotonic clock (injectable for tests).
+        """
+        self.window_ms = window_ms
+        self.device_windows_ms = (parse_device_windows(NFC_DEBOUNCE_DEVICE_MS)
+                                  if device_windows_ms is None else dict(device_windows_ms))
+        self.max_entries = max_entries
+        self.wait_seconds = wait_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple[str, str], _RecentTap]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.passed = 0
+        self.suppressed = 0
+        self.suppressed_in_flight = 0
+        self.suppressed_by_device: Dict[str, int] = {}
+
+    def window_for(self, device_id: Optional[str]) -> float:
+        """Return the window of a device in seconds."""
+        return self.device_windows_ms.get(device_id or "", self.window_ms) / 1000.0
+
+    def process(self, device_id: Optional[str], nfc_uid: str, scan: Callable[[], Dict]) -> Dict:
+        """Run `scan` unless the same card was scanned on the same device within the window.
+
+        Args:
+            device_id (Optional[str]): Reporting device.
+            nfc_uid (str): NFC card UID.
+            scan (Callable[[], Dict]): Processes the tap and returns its result.
+
+        Returns:
+            Dict: The scan result; repeats get a copy of the previous result with "debounced": True.
+        """
+        window = self.window_for(device_id)
+        if window <= 0:
+            return scan()
+        key = (device_id or "", nfc_uid)
+        with self._lock:
+            now = self._clock()
+            self._purge(now)
+            recent = self._entries.get(key)
+            leader = recent is None or recent.expires_at <= now
+            if leader:
+                recent = self._entries[key] = _RecentTap(now + window)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                self.passed += 1
+            else:
+                recent.expires_at = now + window  # a card held on the reader keeps being suppressed
+                self._entries.move_to_end(key)
+                result = recent.result
+                if result is not None:
+                    return self._suppress(device_id, result, in_flight=False)
+
+        if leader:
+            try:
+                recent.result = scan()
+            except BaseException:
+                with self._lock:
+                    if self._entries.get(key) is recent:
+                        del self._entries[key]
+                raise
+            finally:
+                recent.done.set()
+            return recent.result
+
+        # The first report of this tap is still being processed: answer with its result
+        if recent.done.wait(self.wait_seconds) and recent.result is not None:
+            with self._lock:
+                return self._suppress(device_id, recent.result, in_flight=True)
+        return scan()  # the scan we duplicate failed or is stuck: process this tap normally
+
+    def _suppress(self, device_id: Optional[str], result: Dict, in_flight: bool) -> Dict:
+        """Count a suppressed repeat (lock held) and return the previous result."""
+        device = device_id or ""
+        self.suppressed += 1
+        if in_flight:
+            self.suppressed_in_flight += 1
+        self.suppressed_by_device[device] = self.suppressed_by_device.get(device, 0) + 1
+        TAPS_DEBOUNCED.inc(1, device)
+        return dict(result, debounced=True)
+
+    def _purge(self, now: float) -> None:
+        """Drop expired entries from the least recently tapped end (lock held)."""
+        while self._entries:
+            key, oldest = next(iter(self._entries.items()))
+            if oldest.expires_at > now:
+                break
+            del self._entries[key]
+
+    def stats(self) -> Dict:
+        """Return windows, tracked cards and suppression counters.
+
+        Returns:
+            Dict: Debouncer statistics.
+        """
+        with self._lock:
+            return {
+                "enabled": self.window_ms > 0 or any(value > 0 for value in self.device_windows_ms.values()),
+                "window_ms": self.window_ms,
+                "device_windows_ms": dict(self.device_windows_ms),
+                "tracked": len(self._entries),
+                "max_entries": self.max_entries,
+                "passed": self.passed,
+                "suppressed": self.suppressed,
+                "suppressed_in_flight": self.suppressed_in_flight,
+                "suppressed_by_device": dict(self.suppressed_by_device),
+            }
+
+
+tap_debouncer = TapDebouncer()
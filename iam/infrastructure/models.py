@@ -1,5 +1,5 @@
 """Peewee models for the IAM bounded context."""
-from peewee import Model, CharField, DateTimeField, AutoField, IntegerField, ForeignKeyField
+from peewee import Model, CharField, DateTimeField, AutoField, FloatField, IntegerField, ForeignKeyField, TextField
 from shared.infrastructure.database import db
 
 
@@ -69,3 +69,83 @@ class CheckIn(Model):
         """Metadata for the CheckIn model."""
         database = db
         table_name = 'check_ins'
+
+
+# At most one open visit per member; also serves the "active check-in" lookup of each tap
+CheckIn.add_index(
+    CheckIn.index(CheckIn.member, unique=True, name='checkin_active_member')
+    .where(CheckIn.check_out_time.is_null())
+)
+
+
+class OutboxEvent(Model):
+    """Peewee model for the 'outbox_events' table.
+
+    Check-in/check-out notifications waiting to be delivered to the backend. Rows are written in
+    the same transaction as the check-in they describe and delivered by a background dispatcher.
+
+    Attributes:
+        id (AutoField): Primary key.
+        action (CharField): Event type (check_in, check_out).
+        code (CharField): Member code (NFC UID) sent to the backend.
+        status (CharField): Delivery status (pending, sent, dead).
+        attempts (IntegerField): Number of delivery attempts so far.
+        next_attempt_at (DateTimeField): Earliest time of the next delivery attempt.
+        last_error (TextField): Error of the last failed attempt (nullable).
+        created_at (DateTimeField): Record creation timestamp.
+        sent_at (DateTimeField): Delivery timestamp (nullable).
+    """
+    id = AutoField()
+    action = CharField()
+    code = CharField()
+    status = CharField(default='pending')  # pending, sent, dead
+    attempts = IntegerField(default=0)
+    next_attempt_at = DateTimeField()
+    last_error = TextField(null=True)
+    created_at = DateTimeField()
+    sent_at = DateTimeField(null=True)
+
+    class Meta:
+        """Metadata for the OutboxEvent model."""
+        database = db
+        table_name = 'outbox_events'
+        indexes = (
+            (('status', 'next_attempt_at'), False),
+        )
+
+
+class OccupancyBucket(Model):
+    """Peewee model for the 'occupancy_buckets' table.
+
+    Occupancy time series at minute, hour and day resolution, updated in the transaction of each
+    check-in/check-out. Only buckets with events are stored.
+
+    Attributes:
+        id (AutoField): Primary key.
+        resolution (CharField): Bucket size (minute, hour, day).
+        bucket_start (DateTimeField): Start of the bucket.
+        arrivals (IntegerField): Check-ins during the bucket.
+        departures (IntegerField): Check-outs during the bucket.
+        peak_occupancy (IntegerField): Highest occupancy during the bucket.
+        end_occupancy (IntegerField): Occupancy after the last event of the bucket.
+        occupancy_seconds (FloatField): Occupancy integrated from bucket_start to last_change_at.
+        last_change_at (DateTimeField): Timestamp of the last event of the bucket.
+    """
+    id = AutoField()
+    resolution = CharField()
+    bucket_start = DateTimeField()
+    arrivals = IntegerField(default=0)
+    departures = IntegerField(default=0)
+    peak_occupancy = IntegerField()
+    end_occupancy = IntegerField()
+    occupancy_seconds = FloatField(default=0.0)
+    last_change_at = DateTimeField()
+
+    class Meta:
+        """Metadata for the OccupancyBucket model."""
+        database = db
+        table_name = 'occupancy_buckets'
+        # Upsert key of each event; also serves range reads and the "last bucket before" lookup
+        indexes = (
+            (('resolution', 'bucket_start'), True),
+        )
@@ -0,0 +1,325 @@
+"""In-memory occupancy counter and live occupancy feed for the IAM bounded context."""
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from shared.infrastructure.metrics import metrics
+
+OCCUPANCY_RECONCILE_INTERVAL = float(os.getenv("OCCUPANCY_RECONCILE_INTERVAL", "300"))
+OCCUPANCY_PUSH_COALESCE_MS = int(os.getenv("OCCUPANCY_PUSH_COALESCE_MS", "250"))
+OCCUPANCY_PUSH_HEARTBEAT = float(os.getenv("OCCUPANCY_PUSH_HEARTBEAT", "15"))
+OCCUPANCY_PUSH_MAX_SUBSCRIBERS = int(os.getenv("OCCUPANCY_PUSH_MAX_SUBSCRIBERS", "64"))
+OCCUPANCY_SERIES_MAX_BUCKETS = int(os.getenv("OCCUPANCY_SERIES_MAX_BUCKETS", "5000"))
+
+
+class OccupancyCounter:
+    """Number of members currently in the gym, maintained incrementally on check-in/check-out.
+
+    The counter is seeded from the database once and then adjusted by the repository on every
+    saved check-in (+1) and check-out (-1). A periodic reconciliation against the database corrects
+    any drift (e.g. rows edited outside the service).
+
+    Attributes:
+        reconciliations (int): Number of reconciliations applied.
+        last_drift (int): Difference corrected by the last reconciliation.
+        last_reconciled_at (Optional[datetime]): Timestamp of the last reconciliation.
+    """
+
+    def __init__(self):
+        """Initialize an unseeded OccupancyCounter."""
+        self._lock = threading.Lock()
+        self._value = 0
+        self._seeded = False
+        self._version = 0
+        self.reconciliations = 0
+        self.last_drift = 0
+        self.last_reconciled_at: Optional[datetime] = None
+        self._listeners: List[Callable[[int], None]] = []
+
+    @property
+    def value(self) -> int:
+        """Current occupancy."""
+        return self._value
+
+    @property
+    def version(self) -> int:
+        """Number of adjustments applied so far (used to detect concurrent changes)."""
+        return self._version
+
+    def is_seeded(self) -> bool:
+        """Check if the counter has been seeded from the database.
+
+        Returns:
+            bool: True once seeded.
+        """
+        return self._seeded
+
+    def add_listener(self, listener: Callable[[int], None]) -> None:
+        """Register a callable notified with the new value after every change of the counter.
+
+        Args:
+            listener (Callable[[int], None]): Called under the counter lock, so changes are seen
+                in order; must not block.
+        """
+        self._listeners.append(listener)
+
+    def seed(self, count: int) -> None:
+        """Set the counter from an authoritative database count.
+
+        Args:
+            count (int): Number of active check-ins in the database.
+        """
+        with self._lock:
+            self._value = count
+            self._seeded = True
+            self._version += 1
+            self._notify(count)
+
+    def adjust(self, delta: int) -> None:
+        """Apply a check-in (+1) or check-out (-1). Ignored until the counter is seeded.
+
+        Args:
+            delta (int): Change in occupancy.
+        """
+        with self._lock:
+            if not self._seeded:
+                return
+            self._value = max(0, self._value + delta)
+            self._version += 1
+            self._notify(self._value)
+
+    def reconcile(self, count: int, observed_version: int) -> Optional[int]:
+        """Replace the counter with a database count taken at `observed_version`.
+
+        The count is discarded if the counter changed while it was being computed, since it may
+        or may not include that change.
+
+        Args:
+            count (int): Number of active check-ins in the database.
+            observed_version (int): Counter version read before running the count.
+
+        Returns:
+            Optional[int]: Drift corrected (count - previous value), or None if skipped.
+        """
+        with self._lock:
+            if self._seeded and self._version != observed_version:
+                return None
+            drift = count - self._value
+            self._value = count
+            self._seeded = True
+            self._version += 1
+            self.reconciliations += 1
+            self.last_drift = drift
+            self.last_reconciled_at = datetime.now()
+            self._notify(count)
+            return drift
+
+    def _notify(self, value: int) -> None:
+        for listener in self._listeners:
+            listener(value)
+
+    def stats(self) -> Dict:
+        """Return counter state.
+
+        Returns:
+            Dict: Current value and reconciliation details.
+        """
+        return {
+            "value": self._value,
+            "seeded": self._seeded,
+            "reconciliations": self.reconciliations,
+            "last_drift": self.last_drift,
+            "last_reconciled_at": self.last_reconciled_at.isoformat() if self.last_reconciled_at else None,
+        }
+
+
+class OccupancySubscription:
+    """A live view of the occupancy feed, iterated synchronously (threads) or asynchronously (asyncio).
+
+    Yields (sequence, value) immediately and then after each change, at most once per coalescing
+    window so a burst of scans becomes one event; yields None every `heartbeat` seconds without
+    change. Changes that cancel out within a window (check-in then check-out) are not sent.
+    """
+
+    def __init__(self, feed: "OccupancyFeed", heartbeat: float, coalesce: float):
+        """Initialize an OccupancySubscription holding one of the feed's subscriber slots.
+
+        Args:
+            feed (OccupancyFeed): Feed being watched.
+            heartbeat (float): Seconds without change before a heartbeat (None) is yielded.
+            coalesce (float): Minimum seconds between two yielded changes.
+        """
+        self.feed = feed
+        self.heartbeat = heartbeat
+        self.coalesce = coalesce
+        self._closed = False
+
+    def close(self) -> None:
+        """Release the subscriber slot (idempotent)."""
+        if not self._closed:
+            self._closed = True
+            self.feed._release()
+
+    def __iter__(self) -> Iterator[Optional[Tuple[int, int]]]:
+        sequence, value = self.feed.snapshot()
+        yield sequence, value
+        last_sent = time.monotonic()
+        while not self._closed:
+            if not self.feed.wait(sequence, self.heartbeat):
+                yield None
+                continue
+            delay = last_sent + self.coalesce - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            sequence, latest = self.feed.snapshot()
+            if latest != value:
+                value, last_sent = latest, time.monotonic()
+                yield sequence, value
+
+    async def __aiter__(self) -> AsyncIterator[Optional[Tuple[int, int]]]:
+        sequence, value = self.feed.snapshot()
+        yield sequence, value
+        last_sent = time.monotonic()
+        while not self._closed:
+            if not await self.feed.wait_async(sequence, self.heartbeat):
+                yield None
+                continue
+            delay = last_sent + self.coalesce - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            sequence, latest = self.feed.snapshot()
+            if latest != value:
+                value, last_sent = latest, time.monotonic()
+                yield sequence, value
+
+
+class OccupancyFeed:
+    """Fans occupancy changes out to live subscribers (e.g. SSE streams) without touching the database.
+
+    Publishing only stores the new value, bumps a sequence number and wakes the waiting
+    subscribers, so the cost of a check-in no longer grows with the number of dashboards.
+
+    Attributes:
+        max_subscribers (int): Concurrent subscriptions allowed.
+        published (int): Number of value changes published.
+    """
+
+    def __init__(self, max_subscribers: int = OCCUPANCY_PUSH_MAX_SUBSCRIBERS):
+        """Initialize an empty OccupancyFeed.
+
+        Args:
+            max_subscribers (int): Concurrent subscriptions allowed.
+        """
+        self.max_subscribers = max_subscribers
+        self.published = 0
+        self.rejected_subscribers = 0
+        self._cond = threading.Condition()
+        self._sequence = 0
+        self._value: Optional[int] = None
+        self._subscribers = 0
+        self._async_waiters = set()
+
+    def publish(self, value: int) -> None:
+        """Publish a new occupancy value (no-op if unchanged).
+
+        Args:
+            value (int): Current occupancy.
+        """
+        with self._cond:
+            if value == self._value:
+                return
+            self._value = value
+            self._sequence += 1
+            self.published += 1
+            self._cond.notify_all()
+            waiters = list(self._async_waiters)
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # loop already closed
+
+    @property
+    def subscribers(self) -> int:
+        """Number of open subscriptions."""
+        return self._subscribers
+
+    def snapshot(self) -> Tuple[int, Optional[int]]:
+        """Return the current (sequence, value)."""
+        with self._cond:
+            return self._sequence, self._value
+
+    def wait(self, sequence: int, timeout: float) -> bool:
+        """Block until the sequence moves past `sequence` or `timeout` seconds elapse.
+
+        Returns:
+            bool: True if a change was published.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: self._sequence != sequence, timeout)
+
+    async def wait_async(self, sequence: int, timeout: float) -> bool:
+        """Asyncio counterpart of wait()."""
+        entry = (asyncio.get_running_loop(), asyncio.Event())
+        with self._cond:
+            if self._sequence != sequence:
+                return True
+            self._async_waiters.add(entry)
+        try:
+            await asyncio.wait_for(entry[1].wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._cond:
+                self._async_waiters.discard(entry)
+
+    def subscribe(self, heartbeat: float = OCCUPANCY_PUSH_HEARTBEAT,
+                  coalesce_ms: int = OCCUPANCY_PUSH_COALESCE_MS) -> Optional[OccupancySubscription]:
+        """Open a subscription; the caller must close() it.
+
+        Args:
+            heartbeat (float): Seconds without change between two heartbeats.
+            coalesce_ms (int): Minimum milliseconds between two change events.
+
+        Returns:
+            Optional[OccupancySubscription]: The subscription, or None if the feed is full.
+        """
+        with self._cond:
+            if self._subscribers >= self.max_subscribers:
+                self.rejected_subscribers += 1
+                return None
+            self._subscribers += 1
+        return OccupancySubscription(self, heartbeat, coalesce_ms / 1000.0)
+
+    def _release(self) -> None:
+        with self._cond:
+            self._subscribers -= 1
+
+    def stats(self) -> Dict:
+        """Return feed state.
+
+        Returns:
+            Dict: Subscribers, published changes and current value.
+        """
+        with self._cond:
+            return {
+                "subscribers": self._subscribers,
+                "max_subscribers": self.max_subscribers,
+                "rejected_subscribers": self.rejected_subscribers,
+                "published": self.published,
+                "value": self._value,
+            }
+
+
+occupancy_counter = OccupancyCounter()
+occupancy_feed = OccupancyFeed()
+
+metrics.gauge_callback("edge_occupancy_current", "Members currently checked in (in-memory counter).",
+                       lambda: occupancy_counter.value)
+metrics.gauge_callback("edge_occupancy_feed_subscribers", "Clients subscribed to live occupancy updates.",
+                       lambda: occupancy_feed.subscribers)
+occupancy_counter.add_listener(occupancy_feed.publish)
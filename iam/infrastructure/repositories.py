@@ -1,34 +1,41 @@
 """Repositories for the IAM bounded context."""
+import functools
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Dict, Optional, List, Tuple
 
 import peewee
 
-from iam.domain.entities import Device, Member, CheckIn
+from iam.domain.entities import Device, Member, CheckIn, BackendEvent, OccupancyBucket
+from iam.infrastructure.caches import device_credential_cache, member_cache
+from iam.infrastructure.occupancy import occupancy_counter
 from iam.infrastructure.models import Device as DeviceModel, Member as MemberModel, CheckIn as CheckInModel
+from iam.infrastructure.models import OccupancyBucket as OccupancyBucketModel, OutboxEvent as OutboxEventModel
+from shared.infrastructure.database import db, on_commit
+from shared.infrastructure.metrics import instrument_repository
 
 
+@instrument_repository
 class DeviceRepository:
     """Repository for managing Device entities."""
 
     @staticmethod
-    def find_by_id_and_api_key(device_id: str, api_key: str) -> Optional[Device]:
-        """Find a device by its ID and API key.
+    def find_api_key_by_device_id(device_id: str) -> Optional[str]:
+        """Find the API key on file for a device, served from the credential cache when possible.
 
         Args:
             device_id (str): Unique identifier of the device.
-            api_key (str): API key for authentication.
 
         Returns:
-            Optional[Device]: Device entity if found, None otherwise.
+            Optional[str]: Stored API key if the device exists, None otherwise.
         """
-        try:
-            device = DeviceModel.get(
-                (DeviceModel.device_id == device_id) & (DeviceModel.api_key == api_key)
-            )
-            return Device(device.device_id, device.api_key, device.created_at)
-        except peewee.DoesNotExist:
+        api_key = device_credential_cache.get(device_id)
+        if api_key is not None:
+            return api_key
+        row = DeviceModel.select(DeviceModel.api_key).where(DeviceModel.device_id == device_id).first()
+        if row is None:
             return None
+        device_credential_cache.put(device_id, row.api_key)
+        return row.api_key
 
     @staticmethod
     def get_or_create_test_device() -> Device:
@@ -37,19 +44,55 @@ class DeviceRepository:
         Returns:
             Device: The test device entity.
         """
-        device, _ = DeviceModel.get_or_create(
+        device, created = DeviceModel.get_or_create(
             device_id="gym-esp32-001",
             defaults={"api_key": "gym-api-key-2025", "created_at": datetime.now()}
         )
+        if created:
+            device_credential_cache.invalidate(device.device_id)
         return Device(device.device_id, device.api_key, device.created_at)
 
+    @staticmethod
+    def save(device: Device) -> Device:
+        """Insert or update a device and invalidate its cached credentials.
+
+        Args:
+            device (Device): Device entity to save.
 
+        Returns:
+            Device: Saved device entity.
+        """
+        DeviceModel.insert(
+            device_id=device.device_id,
+            api_key=device.api_key,
+            created_at=device.created_at or datetime.now()
+        ).on_conflict(
+            conflict_target=[DeviceModel.device_id],
+            update={DeviceModel.api_key: device.api_key}
+        ).execute()
+        device_credential_cache.invalidate(device.device_id)
+        return device
+
+    @staticmethod
+    def get_cache_stats() -> Dict:
+        """Return statistics of the device credential cache.
+
+        Returns:
+            Dict: Cache statistics (hits, misses, size, ...).
+        """
+        return device_credential_cache.stats()
+
+
+@instrument_repository
 class MemberRepository:
     """Repository for managing Member entities."""
 
     @staticmethod
     def find_by_nfc_uid(nfc_uid: str) -> Optional[Member]:
-        """Find a member by NFC UID.
+        """Find a member by NFC UID, served from the member cache when possible.
+
+        Cached members are shared between callers and must be treated as read-only;
+        changes go through save().
 
         Args:
             nfc_uid (str): NFC card UID.
@@ -57,9 +100,12 @@ class MemberRepository:
         Returns:
             Optional[Member]: Member entity if found, None otherwise.
         """
+        cached = member_cache.get(nfc_uid)
+        if cached is not None:
+            return cached
         try:
             member = MemberModel.get(MemberModel.nfc_uid == nfc_uid)
-            return Member(
+            entity = Member(
                 nfc_uid=member.nfc_uid,
                 name=member.name,
                 email=member.email,
@@ -68,6 +114,8 @@ class MemberRepository:
                 created_at=member.created_at,
                 id=member.id
             )
+            MemberRepository._cache_after_commit(entity)
+            return entity
         except peewee.DoesNotExist:
             return None
 
@@ -90,6 +138,9 @@ class MemberRepository:
                 membership_status=member.membership_status,
                 membership_expiry=member.membership_expiry
             ).where(MemberModel.id == member.id).execute()
+            # The NFC UID may have changed: drop every entry of this member, not just the new key
+            member_cache.invalidate_matching(lambda cached: cached.id == member.id)
+            MemberRepository._cache_after_commit(member)
             return member
         else:
             # Create new
@@ -102,6 +153,7 @@ class MemberRepository:
                 created_at=member.created_at
             )
             member.id = member_model.id
+            MemberRepository._cache_after_commit(member)
             return member
 
     @staticmethod
@@ -155,7 +207,7 @@ class MemberRepository:
                 "created_at": datetime.now(),
             },
         )
-        return Member(
+        member = Member(
             nfc_uid=member_model.nfc_uid,
             name=member_model.name,
             email=member_model.email,
@@ -164,8 +216,25 @@ class MemberRepository:
             created_at=member_model.created_at,
             id=member_model.id,
         )
+        MemberRepository._cache_after_commit(member)
+        return member
 
+    @staticmethod
+    def get_cache_stats() -> Dict:
+        """Return statistics of the member cache (hit ratio, evictions, ...).
 
+        Returns:
+            Dict: Cache statistics.
+        """
+        return member_cache.stats()
+
+    @staticmethod
+    def _cache_after_commit(member: Member) -> None:
+        """Write a member through to the cache once the current unit of work commits."""
+        on_commit(lambda: member_cache.put(member.nfc_uid, member))
+
+
+@instrument_repository
 class CheckInRepository:
     """Repository for managing CheckIn entities."""
 
@@ -180,10 +249,15 @@ class CheckInRepository:
             CheckIn: Saved check-in with ID.
         """
         if check_in.id:
-            # Update existing (for check-out)
-            CheckInModel.update(
+            # Update existing (for check-out); only an open visit can be closed
+            closed = CheckInModel.update(
                 check_out_time=check_in.check_out_time
-            ).where(CheckInModel.id == check_in.id).execute()
+            ).where(
+                (CheckInModel.id == check_in.id) &
+                (CheckInModel.check_out_time.is_null())
+            ).execute()
+            if closed and check_in.check_out_time is not None:
+                on_commit(lambda: occupancy_counter.adjust(-1))
             return check_in
         else:
             # Create new check-in
@@ -195,6 +269,8 @@ class CheckInRepository:
                 created_at=check_in.created_at
             )
             check_in.id = check_in_model.id
+            if check_in.check_out_time is None:
+                on_commit(lambda: occupancy_counter.adjust(1))
             return check_in
 
     @staticmethod
@@ -213,7 +289,7 @@ class CheckInRepository:
                 (CheckInModel.check_out_time.is_null())
             )
             return CheckIn(
-                member_id=check_in.member.id,
+                member_id=check_in.member_id,
                 nfc_uid=check_in.nfc_uid,
                 check_in_time=check_in.check_in_time,
                 check_out_time=check_in.check_out_time,
@@ -232,6 +308,68 @@ class CheckInRepository:
         """
         return CheckInModel.select().where(CheckInModel.check_out_time.is_null()).count()
 
+    @staticmethod
+    def current_occupancy() -> int:
+        """Get the number of active check-ins from the in-memory occupancy counter.
+
+        The counter is seeded from the database on first use.
+
+        Returns:
+            int: Number of active check-ins.
+        """
+        if not occupancy_counter.is_seeded():
+            CheckInRepository.reconcile_occupancy()
+        return occupancy_counter.value
+
+    @staticmethod
+    def occupancy_version() -> int:
+        """Get the version of the occupancy counter (see reconcile_occupancy).
+
+        Returns:
+            int: Number of changes applied to the counter so far.
+        """
+        return occupancy_counter.version
+
+    @staticmethod
+    def reconcile_occupancy(count: Optional[int] = None, observed_version: Optional[int] = None) -> Optional[int]:
+        """Re-seed the occupancy counter from the database, or from a count taken elsewhere.
+
+        Args:
+            count (Optional[int]): Active check-ins counted by another process (e.g. the writer);
+                counted here if None.
+            observed_version (Optional[int]): Counter version read before `count` was taken.
+
+        Returns:
+            Optional[int]: Drift corrected, or None if the counter changed during the count.
+        """
+        if count is None:
+            observed_version = occupancy_counter.version
+            count = CheckInRepository.count_active_check_ins()
+        return occupancy_counter.reconcile(count, observed_version)
+
+    @staticmethod
+    def get_occupancy_stats() -> Dict:
+        """Return the state of the occupancy counter.
+
+        Returns:
+            Dict: Counter value and reconciliation details.
+        """
+        return occupancy_counter.stats()
+
+    @staticmethod
+    def find_visit_times() -> List[Tuple[datetime, Optional[datetime]]]:
+        """Read the check-in and check-out times of every visit (used to rebuild the occupancy series).
+
+        Returns:
+            List[Tuple[datetime, Optional[datetime]]]: (check_in_time, check_out_time) pairs.
+        """
+        query = CheckInModel.select(CheckInModel.check_in_time, CheckInModel.check_out_time)
+        # Raw rows parsed with fromisoformat: much faster than peewee's strptime over a whole table
+        return [
+            (datetime.fromisoformat(check_in_time), datetime.fromisoformat(check_out_time) if check_out_time else None)
+            for check_in_time, check_out_time in db.execute(query).fetchall()
+        ]
+
     @staticmethod
     def get_all_active() -> List[CheckIn]:
         """Get all active check-ins.
@@ -242,7 +380,7 @@ class CheckInRepository:
         check_ins = CheckInModel.select().where(CheckInModel.check_out_time.is_null())
         return [
             CheckIn(
-                member_id=c.member.id,
+                member_id=c.member_id,
                 nfc_uid=c.nfc_uid,
                 check_in_time=c.check_in_time,
                 check_out_time=c.check_out_time,
@@ -251,3 +389,250 @@ class CheckInRepository:
             )
             for c in check_ins
         ]
+
+
+_BUCKET_COLUMNS = ("resolution", "bucket_start", "arrivals", "departures", "peak_occupancy", "end_occupancy",
+                   "occupancy_seconds", "last_change_at")
+
+
+@functools.lru_cache(maxsize=None)
+def _bucket_upsert_sql(rows: int, merge: bool) -> str:
+    """Build the INSERT of `rows` buckets once per shape instead of compiling it with peewee per call.
+
+    On conflict, merge=True folds the new single-event bucket into the stored one (column
+    references on the right read the stored row, "excluded" the new one); merge=False replaces it.
+    """
+    columns = ", ".join(f'"{column}"' for column in _BUCKET_COLUMNS)
+    values = ", ".join(["(" + ", ".join("?" * len(_BUCKET_COLUMNS)) + ")"] * rows)
+    if merge:
+        update = ('"arrivals" = "arrivals" + excluded."arrivals", '
+                  '"departures" = "departures" + excluded."departures", '
+                  '"peak_occupancy" = MAX("peak_occupancy", excluded."end_occupancy"), '
+                  '"end_occupancy" = excluded."end_occupancy", '
+                  '"occupancy_seconds" = "occupancy_seconds" + "end_occupancy" * MAX(0, '
+                  '(julianday(excluded."last_change_at") - julianday("last_change_at")) * 86400.0), '
+                  '"last_change_at" = MAX("last_change_at", excluded."last_change_at")')
+    else:
+        update = ", ".join(f'"{column}" = excluded."{column}"' for column in _BUCKET_COLUMNS[2:])
+    return (f'INSERT INTO "occupancy_buckets" ({columns}) VALUES {values} '
+            f'ON CONFLICT ("resolution", "bucket_start") DO UPDATE SET {update}')
+
+
+def _bucket_params(buckets: List[OccupancyBucket]) -> List:
+    """Flatten buckets into the parameters of _bucket_upsert_sql, in its column order."""
+    params = []
+    for bucket in buckets:
+        params += [bucket.resolution, str(bucket.bucket_start), bucket.arrivals, bucket.departures,
+                   bucket.peak_occupancy, bucket.end_occupancy, bucket.occupancy_seconds,
+                   str(bucket.last_change_at)]
+    return params
+
+
+@instrument_repository
+class OccupancySeriesRepository:
+    """Repository for the occupancy time series buckets."""
+
+    @staticmethod
+    def add_event(buckets: List[OccupancyBucket]) -> None:
+        """Merge one check-in/check-out into its stored buckets, in one statement.
+
+        Each bucket holds the event alone, as if its bucket had no earlier events (see
+        OccupancySeriesService.record_event). A new bucket is inserted as is; an existing one
+        accumulates the counts and extends its occupancy integral by the time since its last event.
+
+        Args:
+            buckets (List[OccupancyBucket]): Single-event buckets, one per resolution.
+        """
+        db.execute_sql(_bucket_upsert_sql(len(buckets), True), _bucket_params(buckets))
+
+    @staticmethod
+    def save(buckets: List[OccupancyBucket], chunk_size: int = 200) -> None:
+        """Insert or update buckets (keyed by resolution and bucket start).
+
+        Args:
+            buckets (List[OccupancyBucket]): Buckets to store.
+            chunk_size (int): Rows per INSERT statement.
+        """
+        for chunk in peewee.chunked(buckets, chunk_size):
+            db.execute_sql(_bucket_upsert_sql(len(chunk), False), _bucket_params(chunk))
+
+    @staticmethod
+    def find_range(resolution: str, start: datetime, end: datetime) -> List[OccupancyBucket]:
+        """Find the stored buckets of a resolution starting in [start, end), in order.
+
+        Args:
+            resolution (str): Bucket size.
+            start (datetime): Inclusive lower bound of bucket_start.
+            end (datetime): Exclusive upper bound of bucket_start.
+
+        Returns:
+            List[OccupancyBucket]: Stored buckets.
+        """
+        model = OccupancyBucketModel
+        query = (model.select()
+                 .where((model.resolution == resolution) & (model.bucket_start >= start)
+                        & (model.bucket_start < end))
+                 .order_by(model.bucket_start))
+        return [
+            OccupancyBucket(resolution=row_resolution, bucket_start=datetime.fromisoformat(bucket_start),
+                            arrivals=arrivals, departures=departures, peak_occupancy=peak_occupancy,
+                            end_occupancy=end_occupancy, occupancy_seconds=occupancy_seconds,
+                            last_change_at=datetime.fromisoformat(last_change_at), id=bucket_id)
+            for (bucket_id, row_resolution, bucket_start, arrivals, departures, peak_occupancy, end_occupancy,
+                 occupancy_seconds, last_change_at) in db.execute(query).fetchall()
+        ]
+
+    @staticmethod
+    def find_occupancy_before(resolution: str, start: datetime) -> int:
+        """Find the occupancy at `start`: the end occupancy of the last stored bucket before it.
+
+        Args:
+            resolution (str): Bucket size.
+            start (datetime): Bucket start of the range.
+
+        Returns:
+            int: Occupancy at `start` (0 if there are no earlier events).
+        """
+        model = OccupancyBucketModel
+        row = (model.select(model.end_occupancy)
+               .where((model.resolution == resolution) & (model.bucket_start < start))
+               .order_by(model.bucket_start.desc())
+               .first())
+        return row.end_occupancy if row else 0
+
+    @staticmethod
+    def is_empty() -> bool:
+        """Check whether no bucket has been stored yet.
+
+        Returns:
+            bool: True if the series is empty.
+        """
+        return not OccupancyBucketModel.select().exists()
+
+    @staticmethod
+    def delete_all() -> int:
+        """Delete every bucket (before a rebuild).
+
+        Returns:
+            int: Number of rows deleted.
+        """
+        return OccupancyBucketModel.delete().execute()
+
+
+@instrument_repository
+class OutboxRepository:
+    """Repository for backend notifications waiting in the outbox."""
+
+    @staticmethod
+    def enqueue(action: str, code: str) -> BackendEvent:
+        """Record a notification to be delivered to the backend.
+
+        Call inside the unit of work that saves the check-in, so both commit together.
+
+        Args:
+            action (str): Event type (check_in, check_out).
+            code (str): Member code (NFC UID).
+
+        Returns:
+            BackendEvent: The recorded event with ID.
+        """
+        now = datetime.now()
+        event_model = OutboxEventModel.create(
+            action=action,
+            code=code,
+            next_attempt_at=now,
+            created_at=now
+        )
+        return BackendEvent(action, code, created_at=now, id=event_model.id)
+
+    @staticmethod
+    def find_due(limit: int) -> List[BackendEvent]:
+        """Find pending events whose next attempt is due, oldest first.
+
+        Events of a member code are delivered in order: an event waiting behind an earlier pending
+        event of the same code (scheduled for a retry) is not due until that one is delivered or
+        dead-lettered.
+
+        Args:
+            limit (int): Maximum number of events.
+
+        Returns:
+            List[BackendEvent]: Due events.
+        """
+        now = datetime.now()
+        earlier = OutboxEventModel.alias()
+        blocking = (earlier
+                    .select(peewee.SQL('1'))
+                    .where((earlier.status == 'pending') &
+                           (earlier.next_attempt_at > now) &
+                           (earlier.code == OutboxEventModel.code) &
+                           (earlier.id < OutboxEventModel.id)))
+        events = (OutboxEventModel
+                  .select()
+                  .where((OutboxEventModel.status == 'pending') &
+                         (OutboxEventModel.next_attempt_at <= now) &
+                         ~peewee.fn.EXISTS(blocking))
+                  .order_by(OutboxEventModel.id)
+                  .limit(limit))
+        return [
+            BackendEvent(e.action, e.code, attempts=e.attempts, created_at=e.created_at, id=e.id)
+            for e in events
+        ]
+
+    @staticmethod
+    def mark_sent(event_ids: List[int]) -> None:
+        """Mark events as delivered.
+
+        Args:
+            event_ids (List[int]): IDs of delivered events.
+        """
+        if not event_ids:
+            return
+        OutboxEventModel.update(
+            status='sent',
+            sent_at=datetime.now(),
+            attempts=OutboxEventModel.attempts + 1,
+            last_error=None
+        ).where(OutboxEventModel.id.in_(event_ids)).execute()
+
+    @staticmethod
+    def mark_failed(event_id: int, error: str, next_attempt_at: Optional[datetime]) -> None:
+        """Record a failed delivery attempt.
+
+        Args:
+            event_id (int): Event ID.
+            error (str): Error description.
+            next_attempt_at (Optional[datetime]): When to retry, or None to give up (dead letter).
+        """
+        OutboxEventModel.update(
+            status='pending' if next_attempt_at else 'dead',
+            attempts=OutboxEventModel.attempts + 1,
+            next_attempt_at=next_attempt_at or datetime.now(),
+            last_error=error
+        ).where(OutboxEventModel.id == event_id).execute()
+
+    @staticmethod
+    def delete_sent_before(cutoff: datetime) -> int:
+        """Delete delivered events older than a cutoff.
+
+        Args:
+            cutoff (datetime): Events sent before this time are deleted.
+
+        Returns:
+            int: Number of deleted events.
+        """
+        return OutboxEventModel.delete().where(
+            (OutboxEventModel.status == 'sent') & (OutboxEventModel.sent_at < cutoff)
+        ).execute()
+
+    @staticmethod
+    def count_by_status() -> Dict[str, int]:
+        """Count events per delivery status.
+
+        Returns:
+            Dict[str, int]: Mapping of status to number of events.
+        """
+        query = (OutboxEventModel
+                 .select(OutboxEventModel.status, peewee.fn.COUNT(OutboxEventModel.id).alias('total'))
+                 .group_by(OutboxEventModel.status))
+        return {row.status: row.total for row in query}
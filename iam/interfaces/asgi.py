@@ -0,0 +1,73 @@
+"""Async (ASGI) interface of the IAM bounded context, mirroring iam.interfaces.services.
+
+Validation and response building are shared with the Flask handlers; blocking helpers run on the
+executor.
+"""
+from iam.interfaces.services import (
+    access_control_service, access_stats, check_device_credentials, check_reader_credentials,
+    format_occupancy_change, nfc_scan_response, occupancy_response, occupancy_series_response,
+)
+from shared.interfaces.asgi import Request, Router, StreamingResponse, run_blocking
+from shared.interfaces.sse import SSE_HEADERS
+
+iam_routes = Router()
+
+
+@iam_routes.route("/api/v1/access/nfc-scan", methods=["POST"])
+async def process_nfc_scan(request: Request):
+    """Handle NFC card scan for check-in/check-out (see iam.interfaces.services.process_nfc_scan)."""
+    data = request.json
+    device_id = data.get("device_id") if isinstance(data, dict) else None
+    auth_result = await run_blocking(check_device_credentials, device_id, request.headers.get("x-api-key"))
+    if auth_result:
+        return auth_result
+    return await run_blocking(nfc_scan_response, data)
+
+
+@iam_routes.route("/api/v1/access/occupancy", methods=["GET"])
+async def get_occupancy(request: Request):
+    """Get current gym occupancy (see iam.interfaces.services.get_occupancy)."""
+    auth_result = await run_blocking(check_reader_credentials, request.headers.get("x-api-key"),
+                                     request.args.get("device_id"))
+    if auth_result:
+        return auth_result
+    return await run_blocking(occupancy_response)
+
+
+@iam_routes.route("/api/v1/access/occupancy/series", methods=["GET"])
+async def get_occupancy_series(request: Request):
+    """Get the occupancy time series of a date range (see iam.interfaces.services.get_occupancy_series)."""
+    auth_result = await run_blocking(check_reader_credentials, request.headers.get("x-api-key"),
+                                     request.args.get("device_id"))
+    if auth_result:
+        return auth_result
+    return await run_blocking(occupancy_series_response, request.args)
+
+
+@iam_routes.route("/api/v1/access/occupancy/stream", methods=["GET"])
+async def stream_occupancy(request: Request):
+    """Push occupancy changes as Server-Sent Events (see iam.interfaces.services.stream_occupancy)."""
+    api_key = request.headers.get("x-api-key") or request.args.get("api_key")
+    auth_result = await run_blocking(check_reader_credentials, api_key, request.args.get("device_id"))
+    if auth_result:
+        return auth_result
+
+    subscription = await run_blocking(access_control_service.subscribe_occupancy)
+    if subscription is None:
+        return {"error": "Too many occupancy subscribers"}, 503
+
+    async def events():
+        async for change in subscription:
+            yield format_occupancy_change(change)
+
+    return StreamingResponse(events(), "text/event-stream", SSE_HEADERS, on_close=subscription.close), 200
+
+
+@iam_routes.route("/api/v1/access/stats", methods=["GET"])
+async def get_access_stats(request: Request):
+    """Get in-process cache and counter statistics of the access control path."""
+    auth_result = await run_blocking(check_reader_credentials, request.headers.get("x-api-key"),
+                                     request.args.get("device_id"))
+    if auth_result:
+        return auth_result
+    return await run_blocking(access_stats), 200
@@ -0,0 +1,68 @@
+"""Schema migration tool for the PumpUp Gym Edge Service.
+
+The service applies pending migrations at boot; this tool inspects or applies them beforehand
+(e.g. to build a new index on a large database before rolling out the release that uses it).
+
+    python migrate.py status          # current version, applied and pending migrations
+    python migrate.py up [--target N] # apply pending migrations (up to version N)
+    python migrate.py check           # EXPLAIN the hot queries; exit status 1 on a full table scan
+    python migrate.py vacuum          # rebuild the file once to enable incremental vacuum (service stopped)
+"""
+import argparse
+import logging
+import os
+import sys
+
+from shared.infrastructure.env import load_env_file
+
+load_env_file()
+
+from shared.infrastructure.database import db, enable_incremental_vacuum  # noqa: E402
+from shared.infrastructure.migrations import check_query_plans, migrate, migration_status  # noqa: E402
+
+
+def main() -> int:
+    """Run the requested subcommand and return the process exit status."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("status", help="show the schema version")
+    up = subcommands.add_parser("up", help="apply pending migrations")
+    up.add_argument("--target", type=int, help="stop at this version")
+    subcommands.add_parser("check", help="check the query plans of the hot queries")
+    subcommands.add_parser("vacuum", help="rebuild the database file to enable incremental vacuum")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "warning").upper())
+    db.connect(reuse_if_open=True)
+    try:
+        if args.command == "up":
+            applied = migrate(args.target)
+            for migration in applied:
+                print(f"applied {migration['version']:>3}  {migration['name']} ({migration['duration_ms']} ms)")
+            print(f"schema version {migration_status()['version']}" + ("" if applied else " (up to date)"))
+        elif args.command == "status":
+            status = migration_status()
+            print(f"schema version {status['version']} of {status['latest']}")
+            for migration in status["applied"]:
+                print(f"  applied {migration['version']:>3}  {migration['name']}  "
+                      f"{migration['applied_at']} ({migration['duration_ms']} ms)")
+            for migration in status["pending"]:
+                print(f"  pending {migration['version']:>3}  {migration['name']}")
+        elif args.command == "vacuum":
+            rebuilt = enable_incremental_vacuum()
+            print("incremental vacuum enabled" if rebuilt else "incremental vacuum already enabled")
+        else:
+            report = check_query_plans()
+            for name, entry in report.items():
+                print(f"{'SCAN' if entry['full_scans'] else 'ok':<5} {name}")
+                for line in entry["plan"]:
+                    print(f"        {line}")
+            if any(entry["full_scans"] for entry in report.values()):
+                return 1
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
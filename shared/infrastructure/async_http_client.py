@@ -0,0 +1,155 @@
+"""
+Non-blocking HTTP client for the asyncio serving mode.
+
+Async counterpart of shared.infrastructure.http_client.UpstreamClient built on httpx.AsyncClient:
+keep-alive pool with per-client connection limits, retries with jittered backoff when repeating is
+safe, and the same per-host circuit breakers and latency statistics.
+"""
+import asyncio
+import random
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from shared.infrastructure.http_client import (
+    HTTP_BACKOFF_BASE, HTTP_BACKOFF_MAX, HTTP_BREAKER_RESET_SECONDS, HTTP_BREAKER_THRESHOLD,
+    HTTP_POOL_MAXSIZE, HTTP_RETRIES, HTTP_TIMEOUT, IDEMPOTENT_METHODS, RETRYABLE_STATUS_CODES,
+    CircuitBreaker, CircuitOpenError, LatencyStats,
+)
+from shared.infrastructure.metrics import UPSTREAM_IN_FLIGHT, UPSTREAM_SECONDS
+from shared.infrastructure.tracing import trace_upstream
+
+
+class AsyncUpstreamClient:
+    """Pooled keep-alive async HTTP client with retries, per-host circuit breakers and latency stats."""
+
+    def __init__(self, timeout: float = HTTP_TIMEOUT, max_connections: int = HTTP_POOL_MAXSIZE,
+                 retries: int = HTTP_RETRIES, backoff_base: float = HTTP_BACKOFF_BASE,
+                 backoff_max: float = HTTP_BACKOFF_MAX, breaker_threshold: int = HTTP_BREAKER_THRESHOLD,
+                 breaker_reset_seconds: float = HTTP_BREAKER_RESET_SECONDS):
+        """Initialize an AsyncUpstreamClient (the httpx client is created lazily on the running loop).
+
+        Args:
+            timeout (float): Default request timeout in seconds.
+            max_connections (int): Maximum open connections (requests wait for a free one).
+            retries (int): Extra attempts after a retryable failure.
+            backoff_base (float): Delay before the first retry in seconds.
+            backoff_max (float): Maximum delay between retries in seconds.
+            breaker_threshold (int): Consecutive failures that open a host's circuit.
+            breaker_reset_seconds (float): Seconds an open circuit waits before a trial request.
+        """
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset_seconds = breaker_reset_seconds
+        self._client: Optional[httpx.AsyncClient] = None
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._stats: Dict[str, LatencyStats] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=limits)
+        return self._client
+
+    async def request(self, method: str, url: str, idempotent: Optional[bool] = None, **kwargs) -> httpx.Response:
+        """Send a request; same retry and circuit breaker rules as UpstreamClient.request().
+
+        Args:
+            method (str): HTTP method.
+            url (str): Absolute URL.
+            idempotent (Optional[bool]): Override whether repeating the request is safe.
+            **kwargs: Passed to httpx.AsyncClient.request.
+
+        Returns:
+            httpx.Response: The last response received.
+
+        Raises:
+            CircuitOpenError: If the host's circuit is open.
+            httpx.HTTPError: If the last attempt failed.
+        """
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        host = urlsplit(url).netloc
+        if host not in self._breakers:
+            self._breakers[host] = CircuitBreaker(self.breaker_threshold, self.breaker_reset_seconds)
+            self._stats[host] = LatencyStats()
+        breaker, stats = self._breakers[host], self._stats[host]
+
+        attempt = 0
+        while True:
+            if not breaker.allow_request():
+                raise CircuitOpenError(f"Circuit open for upstream {host}")
+            started = time.perf_counter()
+            UPSTREAM_IN_FLIGHT.inc(1, host)
+            completed = False
+            try:
+                response = await self._get_client().request(method, url, **kwargs)
+                completed = True
+            except httpx.HTTPError as exc:
+                completed = True
+                UPSTREAM_SECONDS.observe(time.perf_counter() - started, host, method, "error")
+                trace_upstream(method, url, time.perf_counter() - started, error=type(exc).__name__)
+                stats.record(time.perf_counter() - started, error=True)
+                breaker.record_failure()
+                never_sent = isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+                if attempt < self.retries and (idempotent or never_sent):
+                    attempt += 1
+                    await self._sleep_before_retry(attempt, stats)
+                    continue
+                raise
+            finally:
+                UPSTREAM_IN_FLIGHT.dec(1, host)
+                if not completed:
+                    # Cancellation or any other exception still settles a half-open trial
+                    breaker.record_failure()
+            UPSTREAM_SECONDS.observe(time.perf_counter() - started, host, method, f"{response.status_code // 100}xx")
+            trace_upstream(method, url, time.perf_counter() - started, status=response.status_code)
+            failed = response.status_code in RETRYABLE_STATUS_CODES
+            stats.record(time.perf_counter() - started, error=failed)
+            if not failed:
+                breaker.record_success()
+                return response
+            breaker.record_failure()
+            if idempotent and attempt < self.retries:
+                attempt += 1
+                await self._sleep_before_retry(attempt, stats)
+                continue
+            return response
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        """Send a POST request (see request())."""
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self) -> None:
+        """Close pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict:
+        """Return latency and circuit breaker state per upstream host.
+
+        Returns:
+            Dict: Mapping of host to statistics.
+        """
+        return {
+            host: dict(stats.snapshot(), circuit=self._breakers[host].state, rejected=self._breakers[host].rejected)
+            for host, stats in list(self._stats.items())
+        }
+
+    async def _sleep_before_retry(self, attempt: int, stats: LatencyStats) -> None:
+        """Wait with full-jitter exponential backoff before a retry."""
+        stats.record_retry()
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        await asyncio.sleep(random.uniform(0, delay))
+
+
+# Shared async client used by the ASGI handlers for every call to the backend
+async_backend_client = AsyncUpstreamClient()
@@ -0,0 +1,143 @@
+"""
+In-process caches shared by the bounded contexts.
+
+Provides a small, thread-safe LRU cache with optional time-to-live used to keep hot lookups
+(device credentials, members) out of SQLite.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class LRUCache:
+    """Bounded least-recently-used cache with optional per-entry time-to-live.
+
+    Attributes:
+        max_entries (int): Maximum number of entries kept before the least recently used is evicted.
+        ttl_seconds (Optional[float]): Lifetime of an entry in seconds, or None for no expiry.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """Initialize an LRUCache instance.
+
+        Args:
+            max_entries (int): Maximum number of entries (must be positive).
+            ttl_seconds (Optional[float]): Entry lifetime in seconds; None or 0 disables expiry.
+            clock (Callable[[], float]): Monotonic clock used for expiry (injectable for tests).
+        """
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds or None
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for a key, or None on a miss or expired entry.
+
+        Args:
+            key (Hashable): Cache key.
+
+        Returns:
+            Optional[Any]: Cached value if present and fresh, None otherwise.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Insert or replace a value, evicting the least recently used entry if full.
+
+        Args:
+            key (Hashable): Cache key.
+            value (Any): Value to cache (None is not cacheable).
+        """
+        if value is None:
+            return
+        expires_at = self._clock() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> bool:
+        """Drop a single entry.
+
+        Args:
+            key (Hashable): Cache key.
+
+        Returns:
+            bool: True if an entry was removed.
+        """
+        with self._lock:
+            if self._entries.pop(key, None) is None:
+                return False
+            self.invalidations += 1
+            return True
+
+    def invalidate_matching(self, predicate: Callable[[Any], bool]) -> int:
+        """Drop every entry whose value matches a predicate.
+
+        Args:
+            predicate (Callable[[Any], bool]): Called with each cached value.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        with self._lock:
+            stale = [key for key, (value, _) in self._entries.items() if predicate(value)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self) -> None:
+        """Drop all entries (counters are kept)."""
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        """Return the number of cached entries (including not yet purged expired ones)."""
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        """Return cache counters.
+
+        Returns:
+            Dict: Size, capacity, hits, misses, hit ratio, evictions, expirations and invalidations.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
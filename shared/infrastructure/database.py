@@ -1,22 +1,259 @@
 """
 Database initialization for the PumpUp Gym Edge Service.
 
-Sets up the SQLite database and creates required tables for devices, members, check-ins, and equipment usage.
+Sets up the SQLite database; tables and indexes are created by the versioned migrations in
+shared.infrastructure.migrations.
+
+Two engine profiles are available through DATABASE_PROFILE:
+- "production" (default): WAL journal, synchronous=NORMAL, tuned page cache / mmap, busy timeout and a
+  pool of per-thread connections returned to the pool at the end of each Flask request.
+- "legacy": a bare SqliteDatabase with SQLite defaults (rollback journal, implicit connections).
 """
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator
+
 from peewee import SqliteDatabase
+from playhouse.pool import PooledSqliteDatabase
+
+from shared.infrastructure.metrics import (
+    DB_QUERIES_PER_REQUEST, metrics, observe_query, start_query_count, stop_query_count,
+)
+from shared.infrastructure.tracing import trace_query
+
+logger = logging.getLogger(__name__)
+
+DATABASE_PATH = os.getenv("DATABASE_PATH", "gym_edge.db")
+DATABASE_PROFILE = os.getenv("DATABASE_PROFILE", "production").lower()
+DB_JOURNAL_MODE = os.getenv("DB_JOURNAL_MODE", "wal")
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "normal")
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "65536"))
+DB_MMAP_SIZE_MB = int(os.getenv("DB_MMAP_SIZE_MB", "256"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "32"))
+DB_POOL_STALE_TIMEOUT = int(os.getenv("DB_POOL_STALE_TIMEOUT", "300"))
+DB_POOL_WAIT_TIMEOUT = int(os.getenv("DB_POOL_WAIT_TIMEOUT", "10"))
+DB_AUTO_VACUUM = os.getenv("DB_AUTO_VACUUM", "incremental").lower()
+DB_VACUUM_STEP_PAGES = int(os.getenv("DB_VACUUM_STEP_PAGES", "1000"))
+
+
+def production_pragmas() -> Dict[str, object]:
+    """
+    Build the SQLite pragmas of the production profile from the environment.
+    """
+    return {
+        "journal_mode": DB_JOURNAL_MODE,
+        "synchronous": DB_SYNCHRONOUS,
+        "cache_size": -DB_CACHE_SIZE_KB,  # negative value = size in KiB
+        "mmap_size": DB_MMAP_SIZE_MB * 1024 * 1024,
+        "busy_timeout": DB_BUSY_TIMEOUT_MS,
+        "temp_store": "memory",
+    }
+
+
+class _QueryTimingMixin:
+    """Times every statement sent through execute_sql (the single path peewee queries take)."""
+
+    def execute_sql(self, sql, params=None, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().execute_sql(sql, params, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            observe_query(sql, elapsed)
+            trace_query(sql, params, elapsed)
+
+
+class InstrumentedSqliteDatabase(_QueryTimingMixin, SqliteDatabase):
+    """SqliteDatabase reporting statement timings to the metrics registry."""
+
+
+class InstrumentedPooledSqliteDatabase(_QueryTimingMixin, PooledSqliteDatabase):
+    """PooledSqliteDatabase reporting statement timings to the metrics registry."""
+
+    @property
+    def connections_in_use(self) -> int:
+        """Pooled connections checked out by threads."""
+        return len(self._in_use)
+
+    @property
+    def connections_idle(self) -> int:
+        """Open pooled connections waiting to be reused."""
+        return len(self._connections)
+
+
+def build_database(profile: str = DATABASE_PROFILE, path: str = DATABASE_PATH) -> SqliteDatabase:
+    """
+    Create the database object for the selected engine profile.
+    """
+    if profile == "legacy":
+        return InstrumentedSqliteDatabase(path)
+    if profile == "production":
+        return InstrumentedPooledSqliteDatabase(
+            path,
+            pragmas=production_pragmas(),
+            timeout=DB_POOL_WAIT_TIMEOUT,
+            max_connections=DB_POOL_SIZE,
+            stale_timeout=DB_POOL_STALE_TIMEOUT,
+            check_same_thread=False,  # pooled connections move between request threads
+        )
+    raise ValueError(f"Unknown DATABASE_PROFILE {profile!r} (expected 'production' or 'legacy')")
+
 
 # Initialize SQLite database
-db = SqliteDatabase('gym_edge.db')
+db = build_database()
+
+if isinstance(db, InstrumentedPooledSqliteDatabase):
+    metrics.gauge_callback("edge_db_pool_connections_in_use", "Pooled connections checked out by threads.",
+                           lambda: db.connections_in_use)
+    metrics.gauge_callback("edge_db_pool_connections_idle", "Open pooled connections waiting to be reused.",
+                           lambda: db.connections_idle)
+
+# Per-thread list of callbacks waiting for the outermost unit of work to commit
+_pending_commit_callbacks = threading.local()
+
 
 def init_db() -> None:
     """
-    Initialize the database and create tables for all models.
+    Initialize the database: apply pending schema migrations and check the hot query plans.
     """
     if not db.is_closed():
         db.close()
     db.connect()
-    from iam.infrastructure.models import Device, Member, CheckIn
-    from health.infrastructure.models import HeartRateRecord
-    db.create_tables([Device, Member, CheckIn, HeartRateRecord], safe=True)
+    from shared.infrastructure.migrations import enforce_query_plans, migrate
+    if DATABASE_PROFILE == "production" and DB_AUTO_VACUUM == "incremental":
+        _check_incremental_vacuum()
+    migrate()
+    enforce_query_plans()
     db.close()
 
+
+def _check_incremental_vacuum() -> None:
+    """
+    Enable auto_vacuum=INCREMENTAL on a new database file; only warn about an existing one.
+
+    Converting an existing file takes a full VACUUM, which rewrites it under an exclusive lock and
+    needs about twice its size in free disk, so it is left to ``python migrate.py vacuum``.
+    """
+    if db.execute_sql("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return
+    if db.execute_sql("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0:
+        enable_incremental_vacuum()  # nothing to rewrite yet
+        return
+    logger.warning("%s does not use incremental vacuum, so archiving will not shrink it; "
+                   "run 'python migrate.py vacuum' during a maintenance window", DATABASE_PATH)
+
+
+def enable_incremental_vacuum() -> bool:
+    """
+    Switch the database file to auto_vacuum=INCREMENTAL so pages freed by deletes can be returned.
+
+    The setting only takes effect through a VACUUM once the file is in WAL mode, so the whole file
+    is rebuilt: stop the service first and keep about twice its size free on disk.
+
+    Returns:
+        bool: False if the file already used incremental vacuum.
+    """
+    if db.execute_sql("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return False
+    logger.info("Rebuilding %s to enable incremental vacuum", DATABASE_PATH)
+    db.execute_sql("PRAGMA auto_vacuum = INCREMENTAL")
+    db.execute_sql("VACUUM")
+    return True
+
+
+def incremental_vacuum(max_pages: int = None, step: int = DB_VACUUM_STEP_PAGES) -> int:
+    """
+    Return free pages to the file system in small steps, so writers are only blocked briefly.
+
+    Only has an effect when the file uses auto_vacuum=INCREMENTAL.
+
+    Returns:
+        int: Number of pages released.
+    """
+    released = 0
+    with db.connection_context():
+        while max_pages is None or released < max_pages:
+            free = db.execute_sql("PRAGMA freelist_count").fetchone()[0]
+            if not free:
+                break
+            pages = min(step, free) if max_pages is None else min(step, free, max_pages - released)
+            db.execute_sql(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+            remaining = db.execute_sql("PRAGMA freelist_count").fetchone()[0]
+            if remaining >= free:
+                break  # auto_vacuum is not incremental on this file
+            released += free - remaining
+    return released
+
+
+def register_request_hooks(app) -> None:
+    """
+    Tie database connections to the Flask request lifecycle.
+
+    Each request checks a connection out when it starts and returns it when it ends, so request
+    threads never leak pooled connections. The SQL statements a request executes are counted into
+    the edge_db_queries_per_request histogram.
+    """
+    from flask import request
+
+    @app.before_request
+    def _open_db_connection():
+        start_query_count()
+        db.connect(reuse_if_open=True)
+
+    @app.teardown_request
+    def _close_db_connection(exc):
+        if not db.is_closed():
+            db.close()
+        count = stop_query_count()
+        if count is not None:
+            rule = request.url_rule
+            DB_QUERIES_PER_REQUEST.observe(count, rule.rule if rule is not None else "unmatched")
+
+
+@contextmanager
+def unit_of_work() -> Iterator[None]:
+    """
+    Run a block of repository calls as a single write transaction.
+
+    The outermost unit of work starts with BEGIN IMMEDIATE, so concurrent writers are serialized
+    before they read, and commits once at the end (one fsync). Nested units of work become savepoints.
+    Callbacks registered with on_commit() run only after the outermost transaction commits.
+    """
+    callbacks = getattr(_pending_commit_callbacks, "callbacks", None)
+    outermost = callbacks is None
+    if outermost:
+        callbacks = _pending_commit_callbacks.callbacks = []
+    registered_before = len(callbacks)
+    try:
+        with db.atomic("IMMEDIATE"):
+            yield
+    except BaseException:
+        # Work done in this block was rolled back: drop the callbacks it registered
+        del callbacks[registered_before:]
+        if outermost:
+            _pending_commit_callbacks.callbacks = None
+        raise
+    if outermost:
+        _pending_commit_callbacks.callbacks = None
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:  # noqa: BLE001
+                logger.exception("on_commit callback failed")
+
+
+def on_commit(callback: Callable[[], None]) -> None:
+    """
+    Run a callback once the current unit of work commits, or immediately outside of one.
+
+    Used to keep in-memory state (counters, caches) consistent with what was actually committed.
+    """
+    callbacks = getattr(_pending_commit_callbacks, "callbacks", None)
+    if callbacks is None:
+        callback()
+    else:
+        callbacks.append(callback)
@@ -0,0 +1,21 @@
+"""Loading of the .env file read by the entry points (app.py, writer.py, migrate.py) before any setting."""
+import os
+from pathlib import Path
+
+
+def load_env_file(path: str = ".env") -> None:
+    """Load key=value pairs from a .env file into os.environ if not already set."""
+    env_path = Path(path)
+    if not env_path.exists():
+        return
+
+    for raw_line in env_path.read_text().splitlines():
+        line = raw_line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if "=" not in line:
+            continue
+        key, value = line.split("=", 1)
+        key = key.strip()
+        value = value.strip()
+        os.environ.setdefault(key, value)
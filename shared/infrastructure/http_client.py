@@ -0,0 +1,304 @@
+"""
+Shared HTTP client for calls from the edge service to upstream backends.
+
+One pooled, keep-alive requests.Session is shared by every forwarder and notifier, with:
+- a bounded connection pool per host (HTTP_POOL_MAXSIZE),
+- retries with jittered exponential backoff, only when repeating the request is safe,
+- a circuit breaker per upstream host that fails fast while the backend is down,
+- latency statistics per upstream host (also exported as edge_upstream_* metrics).
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from shared.infrastructure.metrics import UPSTREAM_IN_FLIGHT, UPSTREAM_SECONDS
+from shared.infrastructure.tracing import trace_upstream
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "5"))
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "4"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.1"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "2"))
+HTTP_BREAKER_THRESHOLD = int(os.getenv("HTTP_BREAKER_THRESHOLD", "5"))
+HTTP_BREAKER_RESET_SECONDS = float(os.getenv("HTTP_BREAKER_RESET_SECONDS", "30"))
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRYABLE_STATUS_CODES = {502, 503, 504}
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker (closed -> open -> half-open -> closed).
+
+    Attributes:
+        threshold (int): Consecutive failures that open the circuit.
+        reset_seconds (float): Time the circuit stays open before a single trial request is let through.
+    """
+
+    def __init__(self, threshold: int = HTTP_BREAKER_THRESHOLD, reset_seconds: float = HTTP_BREAKER_RESET_SECONDS):
+        """Initialize a closed CircuitBreaker.
+
+        Args:
+            threshold (int): Consecutive failures that open the circuit.
+            reset_seconds (float): Seconds before a trial request is allowed.
+        """
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Check if a request may be sent now.
+
+        Returns:
+            bool: False while the circuit is open (or a half-open trial is in flight).
+        """
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        """Close the circuit after a successful call."""
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        """Count a failed call and open the circuit if the threshold is reached."""
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+class LatencyStats:
+    """Call counters and latency percentiles over the most recent calls to one upstream."""
+
+    def __init__(self, window: int = 1024):
+        """Initialize empty LatencyStats.
+
+        Args:
+            window (int): Number of recent latencies kept for percentiles.
+        """
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_seconds = 0.0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, error: bool) -> None:
+        """Record one attempt.
+
+        Args:
+            seconds (float): Attempt duration.
+            error (bool): True if the attempt failed.
+        """
+        with self._lock:
+            self.calls += 1
+            self.errors += int(error)
+            self.total_seconds += seconds
+            self._recent.append(seconds)
+
+    def record_retry(self) -> None:
+        """Count one retry."""
+        with self._lock:
+            self.retries += 1
+
+    def snapshot(self) -> Dict:
+        """Return counters and p50/p95/p99/max latency in milliseconds.
+
+        Returns:
+            Dict: Latency statistics.
+        """
+        with self._lock:
+            recent = sorted(self._recent)
+            calls, errors, retries, total = self.calls, self.errors, self.retries, self.total_seconds
+
+        def percentile(p: float) -> Optional[float]:
+            if not recent:
+                return None
+            return round(recent[min(len(recent) - 1, int(p * len(recent)))] * 1000, 2)
+
+        return {
+            "calls": calls,
+            "errors": errors,
+            "retries": retries,
+            "mean_ms": round(total / calls * 1000, 2) if calls else None,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(recent[-1] * 1000, 2) if recent else None,
+        }
+
+
+def _request_never_sent(exc: Exception) -> bool:
+    """Check if a failure happened before the request reached the server (safe to retry any method)."""
+    if isinstance(exc, (requests.exceptions.ConnectTimeout, CircuitOpenError)):
+        return True
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    return type(reason).__name__ in {"NewConnectionError", "NameResolutionError"}
+
+
+class UpstreamClient:
+    """Pooled keep-alive HTTP client with retries, per-host circuit breakers and latency stats."""
+
+    def __init__(self, timeout: float = HTTP_TIMEOUT, pool_connections: int = HTTP_POOL_CONNECTIONS,
+                 pool_maxsize: int = HTTP_POOL_MAXSIZE, retries: int = HTTP_RETRIES,
+                 backoff_base: float = HTTP_BACKOFF_BASE, backoff_max: float = HTTP_BACKOFF_MAX,
+                 breaker_threshold: int = HTTP_BREAKER_THRESHOLD,
+                 breaker_reset_seconds: float = HTTP_BREAKER_RESET_SECONDS):
+        """Initialize an UpstreamClient.
+
+        Args:
+            timeout (float): Default request timeout in seconds.
+            pool_connections (int): Number of per-host pools kept.
+            pool_maxsize (int): Maximum open connections per host (callers wait when all are busy).
+            retries (int): Extra attempts after a retryable failure.
+            backoff_base (float): Delay before the first retry in seconds (doubles each retry, with jitter).
+            backoff_max (float): Maximum delay between retries in seconds.
+            breaker_threshold (int): Consecutive failures that open a host's circuit.
+            breaker_reset_seconds (float): Seconds an open circuit waits before a trial request.
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset_seconds = breaker_reset_seconds
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._stats: Dict[str, LatencyStats] = {}
+        self._lock = threading.Lock()
+
+    def request(self, method: str, url: str, idempotent: Optional[bool] = None, **kwargs) -> requests.Response:
+        """Send a request through the pool.
+
+        Failures that happened before the request was sent are always retried. Timeouts, dropped
+        connections and 502/503/504 responses are retried only for idempotent requests.
+
+        Args:
+            method (str): HTTP method.
+            url (str): Absolute URL.
+            idempotent (Optional[bool]): Override whether repeating the request is safe
+                (defaults to True for GET/HEAD/OPTIONS/PUT/DELETE).
+            **kwargs: Passed to requests.Session.request (timeout defaults to the client timeout).
+
+        Returns:
+            requests.Response: The last response received.
+
+        Raises:
+            CircuitOpenError: If the host's circuit is open.
+            requests.exceptions.RequestException: If the last attempt failed.
+        """
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        kwargs.setdefault("timeout", self.timeout)
+        host = urlsplit(url).netloc
+        breaker, stats = self._upstream(host)
+
+        attempt = 0
+        while True:
+            if not breaker.allow_request():
+                raise CircuitOpenError(f"Circuit open for upstream {host}")
+            started = time.perf_counter()
+            UPSTREAM_IN_FLIGHT.inc(1, host)
+            completed = False
+            try:
+                response = self.session.request(method, url, **kwargs)
+                completed = True
+            except requests.exceptions.RequestException as exc:
+                completed = True
+                UPSTREAM_SECONDS.observe(time.perf_counter() - started, host, method, "error")
+                trace_upstream(method, url, time.perf_counter() - started, error=type(exc).__name__)
+                stats.record(time.perf_counter() - started, error=True)
+                breaker.record_failure()
+                if attempt < self.retries and (idempotent or _request_never_sent(exc)):
+                    attempt += 1
+                    self._sleep_before_retry(attempt, stats)
+                    continue
+                raise
+            finally:
+                UPSTREAM_IN_FLIGHT.dec(1, host)
+                if not completed:
+                    # Any other exception still settles the attempt, so a half-open trial cannot
+                    # leave the circuit stuck rejecting every call
+                    breaker.record_failure()
+            UPSTREAM_SECONDS.observe(time.perf_counter() - started, host, method, f"{response.status_code // 100}xx")
+            trace_upstream(method, url, time.perf_counter() - started, status=response.status_code)
+            failed = response.status_code in RETRYABLE_STATUS_CODES
+            stats.record(time.perf_counter() - started, error=failed)
+            if not failed:
+                breaker.record_success()
+                return response
+            breaker.record_failure()
+            if idempotent and attempt < self.retries:
+                attempt += 1
+                response.close()
+                self._sleep_before_retry(attempt, stats)
+                continue
+            return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Send a GET request (see request())."""
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """Send a POST request (see request())."""
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> Dict:
+        """Return latency and circuit breaker state per upstream host.
+
+        Returns:
+            Dict: Mapping of host to statistics.
+        """
+        with self._lock:
+            upstreams = list(self._stats.items())
+        result = {}
+        for host, stats in upstreams:
+            breaker = self._breakers[host]
+            result[host] = dict(stats.snapshot(), circuit=breaker.state, rejected=breaker.rejected)
+        return result
+
+    def _upstream(self, host: str):
+        """Return the breaker and stats of a host, creating them on first use."""
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(self.breaker_threshold, self.breaker_reset_seconds)
+                self._stats[host] = LatencyStats()
+            return self._breakers[host], self._stats[host]
+
+    def _sleep_before_retry(self, attempt: int, stats: LatencyStats) -> None:
+        """Wait with full-jitter exponential backoff before a retry."""
+        stats.record_retry()
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        time.sleep(random.uniform(0, delay))
+
+
+# Shared client used for every call to the backend
+backend_client = UpstreamClient()
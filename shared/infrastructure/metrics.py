@@ -0,0 +1,409 @@
+"""
+In-process metrics for the PumpUp Gym Edge Service, rendered in the Prometheus text format.
+
+Counters, gauges and histograms keep their values in per-thread shards: the hot path updates the
+calling thread's own cells without taking a lock, and a scrape sums the shards. Shards of threads
+that have exited (request threads of the threaded server come and go) are folded into a retired
+total when scraping, and also when new shards have doubled the list since the last sweep, so the
+shard list stays bounded by (twice) the number of live threads even if /metrics is never scraped.
+
+Instrumented metrics:
+- edge_http_request_duration_seconds / edge_http_requests_in_flight: per endpoint (route template)
+- edge_db_query_duration_seconds: per SQL statement type (peewee execute_sql hook)
+- edge_db_queries_per_request: statements executed by one Flask request
+- edge_repository_call_duration_seconds: per repository method
+- edge_upstream_request_duration_seconds / edge_upstream_requests_in_flight: calls to the backend
+Subsystems add gauges read at scrape time with `metrics.gauge_callback`.
+"""
+import functools
+import inspect
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+Labels = Tuple[str, ...]
+
+
+class _ShardedValues:
+    """Per-thread dictionaries of label values -> list of numeric cells.
+
+    Only the owning thread writes a shard; the lock is taken when a thread creates its shard and
+    while a scrape merges the shards. Registering a shard sweeps the shards of exited threads once
+    the list has doubled since the last sweep, which keeps registration amortized O(1).
+    """
+
+    MIN_SWEEP = 64
+
+    def __init__(self, size: int):
+        """Initialize empty storage for cells of `size` numbers per label set."""
+        self.size = size
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, Dict[Labels, list]]] = []
+        self._retired: Dict[Labels, list] = {}
+        self._sweep_at = self.MIN_SWEEP
+        self._lock = threading.Lock()
+
+    def cell(self, labels: Labels) -> list:
+        """Return the calling thread's cells of a label set (created on first use)."""
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+                if len(self._shards) >= self._sweep_at:
+                    self._retire_exited()
+        cells = shard.get(labels)
+        if cells is None:
+            cells = shard[labels] = [0] * self.size
+        return cells
+
+    def collect(self) -> Dict[Labels, list]:
+        """Sum the cells of all shards per label set (retiring shards of exited threads)."""
+        with self._lock:
+            self._retire_exited()
+            totals = {labels: list(cells) for labels, cells in self._retired.items()}
+            for _, shard in self._shards:
+                _add_cells(totals, shard)
+        return totals
+
+    def _retire_exited(self) -> None:
+        """Fold the shards of exited threads into the retired totals (lock held by the caller)."""
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                _add_cells(self._retired, shard)
+        self._shards = alive
+        self._sweep_at = max(self.MIN_SWEEP, 2 * len(alive))
+
+
+def _add_cells(target: Dict[Labels, list], shard: Dict[Labels, list]) -> None:
+    """Add a shard's cells into `target`."""
+    for labels, cells in list(shard.items()):
+        total = target.get(labels)
+        if total is None:
+            target[labels] = list(cells)
+        else:
+            for index, value in enumerate(cells):
+                total[index] += value
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        """Initialize a Counter.
+
+        Args:
+            name (str): Metric name.
+            documentation (str): HELP text.
+            labelnames (Iterable[str]): Label names, in the order values are passed.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = _ShardedValues(1)
+
+    def inc(self, amount: float = 1, *labels: str) -> None:
+        """Add `amount` to the counter of the given label values."""
+        if METRICS_ENABLED:
+            self._values.cell(labels)[0] += amount
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        """Return (suffix, label values, value) samples for rendering."""
+        return [("", labels, cells[0]) for labels, cells in sorted(self._values.collect().items())]
+
+
+class Gauge(Counter):
+    """Gauge changed with inc/dec (e.g. requests in flight); sharded like a counter."""
+
+    type_name = "gauge"
+
+    def dec(self, amount: float = 1, *labels: str) -> None:
+        """Subtract `amount` from the gauge of the given label values."""
+        if METRICS_ENABLED:
+            self._values.cell(labels)[0] -= amount
+
+    @contextmanager
+    def track(self, *labels: str) -> Iterator[None]:
+        """Context manager incrementing the gauge while the block runs."""
+        self.inc(1, *labels)
+        try:
+            yield
+        finally:
+            self.dec(1, *labels)
+
+
+class Histogram:
+    """Histogram with fixed buckets and labels."""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = LATENCY_BUCKETS):
+        """Initialize a Histogram.
+
+        Args:
+            name (str): Metric name.
+            documentation (str): HELP text.
+            labelnames (Iterable[str]): Label names, in the order values are passed.
+            buckets (Iterable[float]): Upper bounds of the buckets (+Inf is added).
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Cells: one count per bucket, the +Inf bucket, then the sum of observed values
+        self._values = _ShardedValues(len(self.buckets) + 2)
+
+    def observe(self, value: float, *labels: str) -> None:
+        """Record one observation for the given label values."""
+        if METRICS_ENABLED:
+            cells = self._values.cell(labels)
+            cells[bisect_left(self.buckets, value)] += 1
+            cells[-1] += value
+
+    def time(self, *labels: str) -> "_Timer":
+        """Context manager observing the duration of the block in seconds."""
+        return _Timer(self, labels)
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        """Return (suffix, label values, value) samples for rendering (cumulative buckets)."""
+        result = []
+        for labels, cells in sorted(self._values.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), cells):
+                cumulative += count
+                result.append(("_bucket", labels + (_format_bound(bound),), cumulative))
+            result.append(("_sum", labels, cells[-1]))
+            result.append(("_count", labels, cumulative))
+        return result
+
+
+class _Timer:
+    """Context manager observing elapsed seconds into a histogram."""
+
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: Labels):
+        self.histogram = histogram
+        self.labels = labels
+        self.started = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+
+
+class CallbackGauge:
+    """Gauge whose value is read from a callable at scrape time (queue depths, occupancy, ...)."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], object],
+                 labelnames: Iterable[str] = ()):
+        """Initialize a CallbackGauge.
+
+        Args:
+            name (str): Metric name.
+            documentation (str): HELP text.
+            callback (Callable[[], object]): Returns the value, or a dict of label values -> value
+                when the gauge has labels.
+            labelnames (Iterable[str]): Label names of the dict keys.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        """Return (suffix, label values, value) samples for rendering."""
+        value = self.callback()
+        if isinstance(value, dict):
+            return [("", labels if isinstance(labels, tuple) else (labels,), number)
+                    for labels, number in sorted(value.items())]
+        return [("", (), value)]
+
+
+def _format_bound(bound: float) -> str:
+    """Format a bucket bound the way Prometheus clients do (le="0.005", le="+Inf")."""
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value."""
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return str(value)
+    if value != value:
+        return "NaN"
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    """Escape a label value."""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsRegistry:
+    """Named metrics of the process, rendered together for /metrics."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None and type(existing) is type(metric) and not isinstance(metric, CallbackGauge):
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        """Create (or return the existing) counter `name`."""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        """Create (or return the existing) inc/dec gauge `name`."""
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        """Create (or return the existing) histogram `name`."""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_callback(self, name: str, documentation: str, callback: Callable[[], object],
+                       labelnames: Iterable[str] = ()) -> CallbackGauge:
+        """Register a gauge read from `callback` at scrape time (replacing one of the same name)."""
+        return self._register(CallbackGauge(name, documentation, callback, labelnames))
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            registered = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in registered:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                # A failing callback must not break the whole scrape
+                lines.append(f"# {metric.name} unavailable: {type(e).__name__}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for suffix, labels, value in samples:
+                names = metric.labelnames + (("le",) if suffix == "_bucket" else ())
+                label_text = ",".join(f'{name}="{_escape(label)}"' for name, label in zip(names, labels))
+                lines.append(f"{metric.name}{suffix}{{{label_text}}} {_format_value(value)}" if label_text
+                             else f"{metric.name}{suffix} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "edge_http_request_duration_seconds", "Time spent handling HTTP requests, by route template.",
+    ("method", "endpoint", "status"))
+HTTP_IN_FLIGHT = metrics.gauge(
+    "edge_http_requests_in_flight", "HTTP requests currently being handled.", ("endpoint",))
+DB_QUERY_SECONDS = metrics.histogram(
+    "edge_db_query_duration_seconds", "SQL statement execution time, by statement type.",
+    ("operation",), DB_LATENCY_BUCKETS)
+DB_QUERIES_PER_REQUEST = metrics.histogram(
+    "edge_db_queries_per_request", "SQL statements executed while handling one HTTP request.",
+    ("endpoint",), COUNT_BUCKETS)
+REPOSITORY_SECONDS = metrics.histogram(
+    "edge_repository_call_duration_seconds", "Time spent in repository methods.",
+    ("repository", "method"), DB_LATENCY_BUCKETS)
+UPSTREAM_SECONDS = metrics.histogram(
+    "edge_upstream_request_duration_seconds", "Duration of requests to the upstream backend, per attempt.",
+    ("host", "method", "outcome"))
+UPSTREAM_IN_FLIGHT = metrics.gauge(
+    "edge_upstream_requests_in_flight", "Requests to the upstream backend currently in progress.", ("host",))
+
+_SQL_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "BEGIN", "COMMIT", "ROLLBACK",
+                   "SAVEPOINT", "RELEASE", "PRAGMA", "CREATE", "DROP", "ALTER", "WITH", "VACUUM"}
+
+_query_counter = threading.local()
+
+
+def observe_query(sql: str, seconds: float) -> None:
+    """Record one executed SQL statement (called by the database execute_sql hook).
+
+    Args:
+        sql (str): The statement text; only its leading keyword is used as a label.
+        seconds (float): Execution time.
+    """
+    if not METRICS_ENABLED:
+        return
+    keyword = sql.lstrip()[:9].split(None, 1)
+    operation = keyword[0].upper() if keyword else ""
+    DB_QUERY_SECONDS.observe(seconds, operation if operation in _SQL_OPERATIONS else "OTHER")
+    count = getattr(_query_counter, "value", None)
+    if count is not None:
+        _query_counter.value = count + 1
+
+
+def start_query_count() -> None:
+    """Start counting the SQL statements executed by the calling thread."""
+    _query_counter.value = 0
+
+
+def stop_query_count() -> Optional[int]:
+    """Stop counting for the calling thread and return the count (None if not started)."""
+    count = getattr(_query_counter, "value", None)
+    _query_counter.value = None
+    return count
+
+
+def instrument_repository(cls):
+    """Class decorator timing every public static method of a repository class.
+
+    Generator methods (streamed reads) are left alone, since their work happens while the caller
+    iterates.
+    """
+    if not METRICS_ENABLED:
+        return cls
+    for name, member in list(vars(cls).items()):
+        if name.startswith("_") or not isinstance(member, staticmethod):
+            continue
+        func = member.__func__
+        if inspect.isgeneratorfunction(func):
+            continue
+        setattr(cls, name, staticmethod(_timed(func, cls.__name__, name)))
+    return cls
+
+
+def _timed(func: Callable, repository: str, method: str) -> Callable:
+    """Wrap `func` to observe its duration into REPOSITORY_SECONDS."""
+    observe = REPOSITORY_SECONDS.observe
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            observe(time.perf_counter() - started, repository, method)
+
+    return wrapper
@@ -0,0 +1,262 @@
+"""
+Versioned schema migrations and query plan checks for the edge database.
+
+Each migration has a version number and a list of SQL statements. Boot (init_db) applies the
+migrations newer than the version recorded in the schema_version table, in order. Each migration
+runs in its own BEGIN IMMEDIATE transaction together with its schema_version row, so:
+
+- a failed migration leaves the database at the previous version, and the next boot retries it;
+- several processes booting against the same file apply each migration once (the version is
+  checked again after the write lock is taken);
+- an index build holds the write lock for that one index only. Readers keep reading their WAL
+  snapshot meanwhile, and writers wait for it up to DB_BUSY_TIMEOUT_MS.
+
+Statements are frozen SQL, not generated from the current models, so a migration does the same
+thing on every database whatever model changes come later. Never edit an applied migration: add a
+new one. The statements use IF NOT EXISTS so that databases created before this module existed
+(by create_tables) are adopted by the baseline without errors.
+
+After migrating, the plans of the hot queries are checked with EXPLAIN QUERY PLAN and a query
+that would scan a whole table is reported (DB_PLAN_CHECK=warn), fails the boot (strict) or is
+ignored (off). `python migrate.py check` runs the same check and exits with status 1 on a scan.
+"""
+import logging
+import os
+import re
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from peewee import SQL, fn
+
+from shared.infrastructure.database import db
+
+logger = logging.getLogger(__name__)
+
+DB_PLAN_CHECK = os.getenv("DB_PLAN_CHECK", "warn").lower()
+
+if DB_PLAN_CHECK not in ("warn", "strict", "off"):
+    raise ValueError(f"Unknown DB_PLAN_CHECK {DB_PLAN_CHECK!r} (expected 'warn', 'strict' or 'off')")
+
+# "SCAN <table>" (SQLite >= 3.36) or "SCAN TABLE <table> [AS <alias>]" (older) without
+# "USING ... INDEX" reads every row of the table
+_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\S+)(?: AS \S+)?$")
+
+
+class Migration:
+    """One schema version: SQL statements applied together in a single transaction.
+
+    Attributes:
+        version (int): Schema version reached once applied (consecutive from 1).
+        name (str): Short description recorded in schema_version.
+        statements (Sequence[str]): SQL statements, in order.
+    """
+
+    __slots__ = ("version", "name", "statements")
+
+    def __init__(self, version: int, name: str, statements: Sequence[str]):
+        self.version = version
+        self.name = name
+        self.statements = tuple(statements)
+
+
+MIGRATIONS: Tuple[Migration, ...] = (
+    Migration(1, "baseline schema", [
+        'CREATE TABLE IF NOT EXISTS "devices" ("device_id" VARCHAR(255) NOT NULL PRIMARY KEY, '
+        '"api_key" VARCHAR(255) NOT NULL, "created_at" DATETIME NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS "members" ("id" INTEGER NOT NULL PRIMARY KEY, '
+        '"nfc_uid" VARCHAR(255) NOT NULL, "name" VARCHAR(255) NOT NULL, "email" VARCHAR(255) NOT NULL, '
+        '"membership_status" VARCHAR(255) NOT NULL, "membership_expiry" DATETIME NOT NULL, '
+        '"created_at" DATETIME NOT NULL)',
+        'CREATE UNIQUE INDEX IF NOT EXISTS "member_nfc_uid" ON "members" ("nfc_uid")',
+        'CREATE TABLE IF NOT EXISTS "check_ins" ("id" INTEGER NOT NULL PRIMARY KEY, '
+        '"member_id" INTEGER NOT NULL, "nfc_uid" VARCHAR(255) NOT NULL, "check_in_time" DATETIME NOT NULL, '
+        '"check_out_time" DATETIME, "created_at" DATETIME NOT NULL, '
+        'FOREIGN KEY ("member_id") REFERENCES "members" ("id"))',
+        'CREATE INDEX IF NOT EXISTS "checkin_member_id" ON "check_ins" ("member_id")',
+        'CREATE TABLE IF NOT EXISTS "outbox_events" ("id" INTEGER NOT NULL PRIMARY KEY, '
+        '"action" VARCHAR(255) NOT NULL, "code" VARCHAR(255) NOT NULL, "status" VARCHAR(255) NOT NULL, '
+        '"attempts" INTEGER NOT NULL, "next_attempt_at" DATETIME NOT NULL, "last_error" TEXT, '
+        '"created_at" DATETIME NOT NULL, "sent_at" DATETIME)',
+        'CREATE INDEX IF NOT EXISTS "outboxevent_status_next_attempt_at" ON "outbox_events" '
+        '("status", "next_attempt_at")',
+        'CREATE TABLE IF NOT EXISTS "heart_rate_records" ("id" INTEGER NOT NULL PRIMARY KEY, '
+        '"member_id" VARCHAR(255) NOT NULL, "bpm" REAL NOT NULL, "measured_at" DATETIME NOT NULL, '
+        '"created_at" DATETIME NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS "heart_rate_forwards" ("id" INTEGER NOT NULL PRIMARY KEY, '
+        '"member_id" VARCHAR(255) NOT NULL, "payload" TEXT NOT NULL, "status" VARCHAR(255) NOT NULL, '
+        '"attempts" INTEGER NOT NULL, "last_error" TEXT, "created_at" DATETIME NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS "heartrateforward_status_id" ON "heart_rate_forwards" ("status", "id")',
+    ]),
+    # Active check-ins (occupancy count, open visit of a member): a partial index holding only open
+    # visits, which also enforces at most one per member. Older duplicates left by concurrent taps
+    # are closed first, or the unique index could not be built.
+    Migration(2, "index open visits (one per member)", [
+        'UPDATE "check_ins" SET "check_out_time" = "check_in_time" '
+        'WHERE "check_out_time" IS NULL AND "id" NOT IN ('
+        'SELECT MAX("id") FROM "check_ins" WHERE "check_out_time" IS NULL GROUP BY "member_id")',
+        'CREATE UNIQUE INDEX IF NOT EXISTS "checkin_active_member" ON "check_ins" ("member_id") '
+        'WHERE ("check_out_time" IS NULL)',
+    ]),
+    # Per-member heart rate history, live analytics and keyset pagination
+    Migration(3, "index heart rate history by member", [
+        'CREATE INDEX IF NOT EXISTS "heartraterecord_member_id_measured_at" ON "heart_rate_records" '
+        '("member_id", "measured_at")',
+    ]),
+    # Time-range scans across members (retention picks the oldest-measured records)
+    Migration(4, "index heart rate records by time", [
+        'CREATE INDEX IF NOT EXISTS "heartraterecord_measured_at" ON "heart_rate_records" ("measured_at")',
+    ]),
+    # Occupancy time series maintained on each check-in/check-out (the service backfills it from
+    # check_ins on the first boot)
+    Migration(5, "occupancy time series", [
+        'CREATE TABLE IF NOT EXISTS "occupancy_buckets" ("id" INTEGER NOT NULL PRIMARY KEY, '
+        '"resolution" VARCHAR(255) NOT NULL, "bucket_start" DATETIME NOT NULL, "arrivals" INTEGER NOT NULL, '
+        '"departures" INTEGER NOT NULL, "peak_occupancy" INTEGER NOT NULL, "end_occupancy" INTEGER NOT NULL, '
+        '"occupancy_seconds" REAL NOT NULL, "last_change_at" DATETIME NOT NULL)',
+        'CREATE UNIQUE INDEX IF NOT EXISTS "occupancybucket_resolution_bucket_start" ON "occupancy_buckets" '
+        '("resolution", "bucket_start")',
+    ]),
+)
+
+
+def _ensure_version_table() -> None:
+    db.execute_sql(
+        'CREATE TABLE IF NOT EXISTS "schema_version" ("version" INTEGER NOT NULL PRIMARY KEY, '
+        '"name" VARCHAR(255) NOT NULL, "applied_at" DATETIME NOT NULL, "duration_ms" REAL NOT NULL)'
+    )
+
+
+def current_version() -> int:
+    """Return the schema version of the database (0 before the first migration)."""
+    _ensure_version_table()
+    return db.execute_sql('SELECT COALESCE(MAX("version"), 0) FROM "schema_version"').fetchone()[0]
+
+
+def migrate(target: Optional[int] = None) -> List[Dict]:
+    """Apply pending migrations in order, each in its own write transaction.
+
+    Args:
+        target (Optional[int]): Stop at this version (defaults to the latest).
+
+    Returns:
+        List[Dict]: Version, name and duration of each migration applied by this call.
+    """
+    applied = []
+    for migration in MIGRATIONS:
+        if target is not None and migration.version > target:
+            break
+        if migration.version <= current_version():
+            continue
+        started = time.perf_counter()
+        with db.atomic("IMMEDIATE"):
+            if migration.version <= current_version():
+                continue  # applied by another process while we waited for the write lock
+            for statement in migration.statements:
+                db.execute_sql(statement)
+            duration_ms = round((time.perf_counter() - started) * 1000, 3)
+            db.execute_sql('INSERT INTO "schema_version" ("version", "name", "applied_at", "duration_ms") '
+                           'VALUES (?, ?, ?, ?)', (migration.version, migration.name, datetime.now(), duration_ms))
+        logger.info("Applied migration %d (%s) in %.1f ms", migration.version, migration.name, duration_ms)
+        applied.append({"version": migration.version, "name": migration.name, "duration_ms": duration_ms})
+    return applied
+
+
+def migration_status() -> Dict:
+    """Return the current version and the applied and pending migrations.
+
+    Returns:
+        Dict: Schema version details.
+    """
+    _ensure_version_table()
+    rows = db.execute_sql('SELECT "version", "name", "applied_at", "duration_ms" FROM "schema_version" '
+                          'ORDER BY "version"').fetchall()
+    applied_versions = {row[0] for row in rows}
+    return {
+        "version": max(applied_versions, default=0),
+        "latest": MIGRATIONS[-1].version,
+        "applied": [{"version": version, "name": name, "applied_at": str(applied_at), "duration_ms": duration_ms}
+                    for version, name, applied_at, duration_ms in rows],
+        "pending": [{"version": migration.version, "name": migration.name}
+                    for migration in MIGRATIONS if migration.version not in applied_versions],
+    }
+
+
+def hot_queries() -> List[Tuple[str, object]]:
+    """Build the queries of the request and background hot paths, as the repositories issue them.
+
+    Returns:
+        List[Tuple[str, object]]: (name, peewee query) pairs.
+    """
+    from health.infrastructure.models import HeartRateForward, HeartRateRecord
+    from iam.infrastructure.models import CheckIn, Member, OccupancyBucket, OutboxEvent
+
+    now = datetime.now()
+    earlier_event = OutboxEvent.alias()
+    return [
+        ("member by NFC UID", Member.select().where(Member.nfc_uid == "UID")),
+        ("open visit of a member", CheckIn.select().where(
+            (CheckIn.member == 1) & (CheckIn.check_out_time.is_null()))),
+        ("active check-ins count", CheckIn.select(fn.COUNT(SQL("*"))).where(CheckIn.check_out_time.is_null())),
+        ("active check-ins", CheckIn.select().where(CheckIn.check_out_time.is_null())),
+        ("heart rate history page", HeartRateRecord.select().where(
+            (HeartRateRecord.member_id == "UID") & (HeartRateRecord.measured_at >= now)
+            & (HeartRateRecord.measured_at < now)).order_by(HeartRateRecord.measured_at, HeartRateRecord.id)
+         .limit(100)),
+        ("heart rate records older than cutoff", HeartRateRecord.select().where(
+            HeartRateRecord.measured_at < now).order_by(HeartRateRecord.measured_at, HeartRateRecord.id)
+         .limit(100)),
+        ("occupancy buckets of a range", OccupancyBucket.select().where(
+            (OccupancyBucket.resolution == "hour") & (OccupancyBucket.bucket_start >= now)
+            & (OccupancyBucket.bucket_start < now)).order_by(OccupancyBucket.bucket_start)),
+        ("occupancy before a range", OccupancyBucket.select(OccupancyBucket.end_occupancy).where(
+            (OccupancyBucket.resolution == "hour") & (OccupancyBucket.bucket_start < now))
+         .order_by(OccupancyBucket.bucket_start.desc()).limit(1)),
+        ("due outbox events", OutboxEvent.select().where(
+            (OutboxEvent.status == "pending") & (OutboxEvent.next_attempt_at <= now)
+            & ~fn.EXISTS(earlier_event.select(SQL("1")).where(
+                (earlier_event.status == "pending") & (earlier_event.next_attempt_at > now)
+                & (earlier_event.code == OutboxEvent.code) & (earlier_event.id < OutboxEvent.id))))
+         .order_by(OutboxEvent.id).limit(50)),
+        ("pending forwards", HeartRateForward.select().where(HeartRateForward.status == "pending")
+         .order_by(HeartRateForward.id).limit(50)),
+    ]
+
+
+def explain(query) -> List[str]:
+    """Return the EXPLAIN QUERY PLAN lines of a peewee query."""
+    sql, params = query.sql()
+    return [row[-1] for row in db.execute_sql("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+
+
+def check_query_plans() -> Dict[str, Dict]:
+    """Explain every hot query and flag the ones that would read a whole table.
+
+    Returns:
+        Dict[str, Dict]: Per query name, its plan lines and the tables it scans in full.
+    """
+    report = {}
+    for name, query in hot_queries():
+        plan = explain(query)
+        scans = [match.group(1) for match in map(_FULL_SCAN.match, plan) if match]
+        report[name] = {"plan": plan, "full_scans": scans}
+    return report
+
+
+def enforce_query_plans(mode: str = DB_PLAN_CHECK) -> List[str]:
+    """Check the hot query plans at boot according to DB_PLAN_CHECK.
+
+    Returns:
+        List[str]: Names of the queries scanning a whole table.
+
+    Raises:
+        RuntimeError: With mode "strict", if a hot query scans a whole table.
+    """
+    if mode == "off":
+        return []
+    offenders = [name for name, entry in check_query_plans().items() if entry["full_scans"]]
+    if offenders and mode == "strict":
+        raise RuntimeError(f"Hot queries scan whole tables: {', '.join(offenders)}")
+    for name in offenders:
+        logger.warning("Hot query %r scans a whole table (missing index?)", name)
+    return offenders
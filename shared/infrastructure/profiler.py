@@ -0,0 +1,200 @@
+"""
+Sampling profiler that can be attached to the running edge service for a fixed window.
+
+A background thread snapshots the Python stack of every thread (sys._current_frames) at a fixed
+interval and counts identical stacks. The result is written in the collapsed ("folded") format,
+one `frame;frame;frame count` line per stack, which flamegraph.pl, speedscope and inferno read
+directly. Nothing is recorded between profiles, so the service pays no cost unless a profile runs.
+
+Start a profile with POST /api/v1/debug/profile, or by sending SIGUSR2 to the process (useful
+when the HTTP server itself is stuck).
+"""
+import logging
+import os
+import re
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_DEFAULT_SECONDS = float(os.getenv("PROFILE_DEFAULT_SECONDS", "10"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "120"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_SIGNAL_ENABLED = os.getenv("PROFILE_SIGNAL_ENABLED", "true").lower() in ("1", "true", "yes")
+
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + os.sep
+
+# Leaf frames of threads that are parked (waiting for work, a connection or a timer)
+_IDLE_LEAVES = {
+    ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"), ("selectors.py", "select"),
+    ("socket.py", "accept"), ("socketserver.py", "serve_forever"), ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+
+class ProfileBusyError(RuntimeError):
+    """Raised when a profile is requested while another one is running."""
+
+
+def _frame_label(code) -> str:
+    """Label a frame as `path:function`, with paths relative to the service or to site-packages."""
+    filename = code.co_filename
+    if filename.startswith(_APP_ROOT):
+        filename = filename[len(_APP_ROOT):]
+    elif "site-packages" in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[1]
+    else:
+        filename = os.path.basename(filename)
+    return f"{filename}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads for a fixed duration and writes folded stacks."""
+
+    def __init__(self, output_dir: str = PROFILE_DIR, interval_ms: float = PROFILE_INTERVAL_MS,
+                 max_seconds: float = PROFILE_MAX_SECONDS):
+        """Initialize a SamplingProfiler.
+
+        Args:
+            output_dir (str): Directory receiving the .folded files.
+            interval_ms (float): Default sampling interval in milliseconds.
+            max_seconds (float): Longest profile accepted.
+        """
+        self.output_dir = output_dir
+        self.interval_ms = interval_ms
+        self.max_seconds = max_seconds
+        self.profiles = 0
+        self.last_profile: Optional[Dict] = None
+        self._running = threading.Lock()
+
+    def is_running(self) -> bool:
+        """Whether a profile is currently being taken."""
+        return self._running.locked()
+
+    def profile(self, seconds: float = PROFILE_DEFAULT_SECONDS, interval_ms: Optional[float] = None,
+                include_idle: bool = False) -> Dict:
+        """Sample all threads for `seconds` and write the folded stacks to a file (blocking).
+
+        Args:
+            seconds (float): Profile duration, capped at max_seconds.
+            interval_ms (Optional[float]): Sampling interval (defaults to the profiler's).
+            include_idle (bool): Keep stacks of threads parked in waits, accept() or queue gets.
+
+        Returns:
+            Dict: Output file, sample counts and the functions with the most samples.
+
+        Raises:
+            ProfileBusyError: If another profile is running.
+        """
+        if not self._running.acquire(blocking=False):
+            raise ProfileBusyError("A profile is already running")
+        try:
+            seconds = max(0.1, min(float(seconds), self.max_seconds))
+            interval = max(0.5, float(interval_ms or self.interval_ms)) / 1000.0
+            stacks, samples = self._sample(seconds, interval, include_idle)
+            path = self._write(stacks)
+        finally:
+            self._running.release()
+
+        self_time: Counter = Counter()
+        for stack, count in stacks.items():
+            self_time[stack.rsplit(";", 1)[-1]] += count
+        total = sum(stacks.values())
+        result = {
+            "file": path,
+            "seconds": seconds,
+            "interval_ms": interval * 1000,
+            "samples": samples,
+            "stacks": len(stacks),
+            "recorded_stack_samples": total,
+            "top_functions": [{"function": name, "samples": count, "share": round(count / total, 3)}
+                              for name, count in self_time.most_common(15)],
+        }
+        self.profiles += 1
+        self.last_profile = dict(result, finished_at=datetime.now().isoformat())
+        return result
+
+    def start_background(self, seconds: float = PROFILE_DEFAULT_SECONDS, **kwargs) -> bool:
+        """Run a profile on a background thread; False if one is already running."""
+        if self.is_running():
+            return False
+
+        def run():
+            try:
+                result = self.profile(seconds, **kwargs)
+                logger.warning("Profile written to %s (%d samples)", result["file"], result["samples"])
+            except ProfileBusyError:
+                pass
+
+        threading.Thread(target=run, name="sampling-profiler", daemon=True).start()
+        return True
+
+    def stats(self) -> Dict:
+        """Return whether a profile is running and the summary of the last one."""
+        return {"running": self.is_running(), "profiles": self.profiles, "last_profile": self.last_profile}
+
+    def _sample(self, seconds: float, interval: float, include_idle: bool) -> Tuple[Counter, int]:
+        """Collect folded stacks of all threads but the profiler's own."""
+        own = threading.get_ident()
+        stacks: Counter = Counter()
+        samples = 0
+        deadline = time.monotonic() + seconds
+        next_sample = time.monotonic()
+        while next_sample < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if not include_idle:
+                    code = frame.f_code
+                    if (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                        continue
+                frames = []
+                while frame is not None:
+                    frames.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                # Thread names like "Thread-12 (process_request_thread)" are grouped by their pattern
+                root = re.sub(r"\d+", "N", names.get(ident, "thread"))
+                frames.append(root)
+                stacks[";".join(reversed(frames))] += 1
+            samples += 1
+            next_sample += interval
+            delay = next_sample - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_sample = time.monotonic()  # sampling fell behind: do not try to catch up
+        return stacks, samples
+
+    def _write(self, stacks: Counter) -> str:
+        """Write folded stacks to a timestamped file and return its path."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.folded")
+        with open(path, "w") as handle:
+            for stack, count in stacks.most_common():
+                handle.write(f"{stack} {count}\n")
+        return path
+
+
+profiler = SamplingProfiler()
+
+
+def install_profile_signal(seconds: float = PROFILE_DEFAULT_SECONDS) -> bool:
+    """Start a background profile whenever the process receives SIGUSR2 (main thread only).
+
+    Returns:
+        bool: True if the handler was installed.
+    """
+    if not PROFILE_SIGNAL_ENABLED or not hasattr(signal, "SIGUSR2"):
+        return False
+    try:
+        signal.signal(signal.SIGUSR2, lambda signum, frame: profiler.start_background(seconds))
+    except ValueError:
+        return False  # not called from the main thread
+    return True
@@ -0,0 +1,246 @@
+"""
+Per-request tracing of SQL statements and upstream calls for the PumpUp Gym Edge Service.
+
+A traced request records every statement sent through the database execute_sql hook and every
+attempt of the upstream HTTP clients, with its duration, offset from the start of the request and
+the application call site (e.g. the repository method and the service line that triggered a lazy
+foreign key fetch). Tracing is enabled for one request with the X-Debug-Trace header (only honored
+when DEBUG_TRACE_TOKEN is set or DEBUG_ENDPOINTS is enabled), or for every request with DEBUG_TRACE=true.
+
+Finished traces are summarized in a Server-Timing response header, logged at INFO as one JSON line and kept
+in a small ring buffer served by /api/v1/debug/traces. Statement parameters are only recorded with
+DEBUG_TRACE_PARAMS=true, since they contain member and device identifiers.
+"""
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEBUG_ENDPOINTS = os.getenv("DEBUG_ENDPOINTS", "false").lower() in ("1", "true", "yes")
+DEBUG_TRACE = os.getenv("DEBUG_TRACE", "false").lower() in ("1", "true", "yes")
+DEBUG_TRACE_HEADER = os.getenv("DEBUG_TRACE_HEADER", "X-Debug-Trace")
+DEBUG_TRACE_TOKEN = os.getenv("DEBUG_TRACE_TOKEN", "")
+DEBUG_TRACE_PARAMS = os.getenv("DEBUG_TRACE_PARAMS", "false").lower() in ("1", "true", "yes")
+DEBUG_TRACE_KEEP = int(os.getenv("DEBUG_TRACE_KEEP", "50"))
+DEBUG_TRACE_MAX_EVENTS = int(os.getenv("DEBUG_TRACE_MAX_EVENTS", "500"))
+DEBUG_TRACE_LOG_MS = float(os.getenv("DEBUG_TRACE_LOG_MS", "0"))
+DEBUG_TRACE_STACK_DEPTH = int(os.getenv("DEBUG_TRACE_STACK_DEPTH", "3"))
+
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + os.sep
+# Instrumentation layers skipped when looking for the application call site
+_SKIPPED_FILES = {
+    os.path.join(_APP_ROOT, "shared", "infrastructure", name)
+    for name in ("database.py", "metrics.py", "tracing.py", "http_client.py", "async_http_client.py")
+}
+
+_current_trace: ContextVar[Optional["RequestTrace"]] = ContextVar("edge_request_trace", default=None)
+_trace_ids = itertools.count(1)
+
+
+class RequestTrace:
+    """SQL statements and upstream calls recorded while handling one request.
+
+    Attributes:
+        id (int): Trace number, returned in the X-Debug-Trace-Id header.
+        method (str): HTTP method.
+        endpoint (str): Route template of the request.
+        path (str): Request path.
+        events (List[Dict]): Recorded statements and upstream calls, in execution order.
+        dropped (int): Events not recorded because DEBUG_TRACE_MAX_EVENTS was reached.
+    """
+
+    def __init__(self, method: str, endpoint: str, path: str):
+        """Initialize a RequestTrace starting now."""
+        self.id = next(_trace_ids)
+        self.method = method
+        self.endpoint = endpoint
+        self.path = path
+        self.started_at = datetime.now()
+        self.started = time.perf_counter()
+        self.events: List[Dict] = []
+        self.dropped = 0
+        self.status: Optional[int] = None
+        self.total_ms: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def add(self, kind: str, detail: str, seconds: float, **extra) -> None:
+        """Record one event that just finished after `seconds`.
+
+        Args:
+            kind (str): "sql" or "upstream".
+            detail (str): Statement text or "METHOD url".
+            seconds (float): Duration of the event.
+            **extra: Additional fields (params, status, error).
+        """
+        now = time.perf_counter()
+        event = {
+            "kind": kind,
+            "at_ms": round((now - seconds - self.started) * 1000, 3),
+            "duration_ms": round(seconds * 1000, 3),
+            "detail": detail,
+            "site": _call_site(),
+        }
+        event.update(extra)
+        with self._lock:
+            if len(self.events) >= DEBUG_TRACE_MAX_EVENTS:
+                self.dropped += 1
+            else:
+                self.events.append(event)
+
+    def finish(self, status: int) -> None:
+        """Mark the trace complete with the response status."""
+        self.status = status
+        self.total_ms = round((time.perf_counter() - self.started) * 1000, 3)
+
+    def totals(self) -> Dict[str, Dict]:
+        """Return count and summed duration per event kind."""
+        totals: Dict[str, Dict] = {}
+        with self._lock:
+            events = list(self.events)
+        for event in events:
+            total = totals.setdefault(event["kind"], {"count": 0, "duration_ms": 0.0})
+            total["count"] += 1
+            total["duration_ms"] = round(total["duration_ms"] + event["duration_ms"], 3)
+        return totals
+
+    def server_timing(self) -> str:
+        """Render the trace totals as a Server-Timing header value."""
+        parts = [f'{kind};dur={total["duration_ms"]};desc="{total["count"]} calls"'
+                 for kind, total in sorted(self.totals().items())]
+        if self.total_ms is not None:
+            parts.append(f"total;dur={self.total_ms}")
+        return ", ".join(parts)
+
+    def to_dict(self) -> Dict:
+        """Return the full trace, including per call site totals (slowest first)."""
+        with self._lock:
+            events = list(self.events)
+        sites: Dict[str, Dict] = {}
+        for event in events:
+            site = sites.setdefault(event["site"], {"site": event["site"], "count": 0, "duration_ms": 0.0})
+            site["count"] += 1
+            site["duration_ms"] = round(site["duration_ms"] + event["duration_ms"], 3)
+        return {
+            "id": self.id,
+            "method": self.method,
+            "endpoint": self.endpoint,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "total_ms": self.total_ms,
+            "totals": self.totals(),
+            "call_sites": sorted(sites.values(), key=lambda site: site["duration_ms"], reverse=True),
+            "events": events,
+            "dropped_events": self.dropped,
+        }
+
+
+def _call_site() -> str:
+    """Describe the innermost application frames of the calling thread ("file:line function < ...")."""
+    frame = sys._getframe(2)
+    sites = []
+    while frame is not None and len(sites) < DEBUG_TRACE_STACK_DEPTH:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_APP_ROOT) and filename not in _SKIPPED_FILES and "site-packages" not in filename:
+            sites.append(f"{filename[len(_APP_ROOT):]}:{frame.f_lineno} {frame.f_code.co_name}")
+        frame = frame.f_back
+    return " < ".join(sites) or "<unknown>"
+
+
+class TraceLog:
+    """Ring buffer of the most recent finished traces."""
+
+    def __init__(self, keep: int = DEBUG_TRACE_KEEP):
+        """Initialize a TraceLog keeping the last `keep` traces."""
+        self._traces: deque = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def add(self, trace: RequestTrace) -> None:
+        """Store a finished trace."""
+        with self._lock:
+            self._traces.append(trace)
+
+    def recent(self) -> List[Dict]:
+        """Return short summaries of the kept traces, newest first."""
+        with self._lock:
+            traces = list(self._traces)
+        return [{"id": trace.id, "method": trace.method, "path": trace.path, "status": trace.status,
+                 "total_ms": trace.total_ms, "totals": trace.totals()} for trace in reversed(traces)]
+
+    def get(self, trace_id: int) -> Optional[Dict]:
+        """Return a kept trace in full, or None if it is unknown or was evicted."""
+        with self._lock:
+            traces = list(self._traces)
+        for trace in traces:
+            if trace.id == trace_id:
+                return trace.to_dict()
+        return None
+
+
+trace_log = TraceLog()
+
+
+def trace_requested(header_value: Optional[str]) -> bool:
+    """Decide whether a request is traced, from the value of its DEBUG_TRACE_HEADER header.
+
+    With DEBUG_TRACE_TOKEN set, the header must carry the token; otherwise any true-ish value counts,
+    but only with DEBUG_ENDPOINTS enabled, so anonymous clients cannot turn tracing on in production.
+    """
+    if DEBUG_TRACE:
+        return True
+    if not header_value:
+        return False
+    if DEBUG_TRACE_TOKEN:
+        return header_value == DEBUG_TRACE_TOKEN
+    return DEBUG_ENDPOINTS and header_value.lower() in ("1", "true", "yes", "on")
+
+
+def start_trace(method: str, endpoint: str, path: str):
+    """Start tracing the current request (thread or asyncio task).
+
+    Returns:
+        Tuple[RequestTrace, Token]: The trace and the token to pass to end_trace().
+    """
+    trace = RequestTrace(method, endpoint, path)
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(trace: RequestTrace, token, status: int) -> Dict[str, str]:
+    """Finish a trace, keep and log it, and return the response headers summarizing it.
+
+    Returns:
+        Dict[str, str]: Server-Timing and X-Debug-Trace-Id headers.
+    """
+    _current_trace.reset(token)
+    trace.finish(status)
+    trace_log.add(trace)
+    if trace.total_ms >= DEBUG_TRACE_LOG_MS:
+        logger.info("request trace %s", json.dumps(trace.to_dict(), default=str))
+    return {"Server-Timing": trace.server_timing(), "X-Debug-Trace-Id": str(trace.id)}
+
+
+def trace_query(sql: str, params, seconds: float) -> None:
+    """Record a SQL statement on the current trace, if any (called by the execute_sql hook)."""
+    trace = _current_trace.get()
+    if trace is not None:
+        if DEBUG_TRACE_PARAMS and params:
+            trace.add("sql", sql, seconds, params=[str(param) for param in params])
+        else:
+            trace.add("sql", sql, seconds)
+
+
+def trace_upstream(method: str, url: str, seconds: float, status: Optional[int] = None,
+                   error: Optional[str] = None) -> None:
+    """Record one upstream request attempt on the current trace, if any."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add("upstream", f"{method} {url}", seconds, status=status, error=error)
@@ -0,0 +1,81 @@
+"""
+Background workers for the PumpUp Gym Edge Service.
+
+Provides a daemon thread that runs a task periodically and can be woken up early, used by
+reconcilers and dispatchers that must not run inside the request path.
+"""
+import logging
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicWorker:
+    """Runs a task on a daemon thread every `interval` seconds, or sooner when woken.
+
+    Attributes:
+        name (str): Thread name, used in logs.
+        interval (float): Seconds between two runs of the task.
+    """
+
+    def __init__(self, name: str, interval: float, task: Callable[[], None]):
+        """Initialize a PeriodicWorker instance.
+
+        Args:
+            name (str): Thread name.
+            interval (float): Seconds between runs (must be positive).
+            task (Callable[[], None]): Callable executed on each run; exceptions are logged.
+        """
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        self.name = name
+        self.interval = interval
+        self._task = task
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the worker thread (no-op if already running)."""
+        if self.is_running():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the worker thread and wait for the current run to finish.
+
+        Args:
+            timeout (Optional[float]): Seconds to wait for the thread to exit.
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def wake(self) -> None:
+        """Run the task as soon as possible instead of waiting for the next interval."""
+        self._wake.set()
+
+    def is_running(self) -> bool:
+        """Check if the worker thread is alive.
+
+        Returns:
+            bool: True if the worker is running.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self) -> None:
+        """Thread body: run the task until stopped."""
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self._task()
+            except Exception:  # noqa: BLE001
+                logger.exception("Background worker %s failed", self.name)
@@ -0,0 +1,418 @@
+"""
+Single-writer architecture for several worker processes sharing one SQLite file.
+
+SQLite allows one writer at a time. When several worker processes write concurrently they queue on
+the database lock and, past DB_BUSY_TIMEOUT_MS, fail with "database is locked". With
+WRITER_MODE=client the workers instead submit their write commands to one writer process
+(writer.py) over a local IPC connection:
+
+- Commands are registered by name with @write_command and run unchanged in the writer, so the
+  worker and the writer share one implementation; with WRITER_MODE=local (the default) they run
+  in-process exactly as before.
+- The writer applies queued commands in groups: one transaction (one commit, one WAL sync) per
+  group, each command in its own savepoint so a failing command rolls back alone. Each command is
+  acknowledged with its result, or with its exception, once the group has committed.
+- A command still queued in the writer after WRITER_TIMEOUT is answered with an error instead of
+  being applied, and workers wait for that answer: a 503 from a worker means the write did not
+  happen, so a device retrying it does not apply it twice.
+- Reads do not go through the writer: workers keep reading their own WAL snapshots.
+
+Commands and results travel pickled over multiprocessing.connection, so unpickling a message runs
+code chosen by its sender: connections are authenticated with WRITER_AUTHKEY, which has no default
+and must be set to a secret shared by the writer and its workers. WRITER_ADDRESS is a Unix socket
+path, or host:port for TCP; a TCP address must be a loopback one unless WRITER_ALLOW_REMOTE is set.
+"""
+import ipaddress
+import logging
+import os
+import queue
+import threading
+import time
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from shared.infrastructure.database import db, unit_of_work
+from shared.infrastructure.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+WRITER_MODE = os.getenv("WRITER_MODE", "local").lower()
+WRITER_ADDRESS = os.getenv("WRITER_ADDRESS", "gym_edge.writer.sock")
+WRITER_AUTHKEY = os.getenv("WRITER_AUTHKEY", "").encode()
+WRITER_ALLOW_REMOTE = os.getenv("WRITER_ALLOW_REMOTE", "false").lower() in ("1", "true", "yes")
+WRITER_TIMEOUT = float(os.getenv("WRITER_TIMEOUT", "10"))
+WRITER_CLIENT_POOL = int(os.getenv("WRITER_CLIENT_POOL", "16"))
+WRITER_GROUP_MAX = int(os.getenv("WRITER_GROUP_MAX", "256"))
+WRITER_GROUP_WAIT_MS = float(os.getenv("WRITER_GROUP_WAIT_MS", "0"))
+
+if WRITER_MODE not in ("local", "client"):
+    raise ValueError(f"Unknown WRITER_MODE {WRITER_MODE!r} (expected 'local' or 'client')")
+
+SUBMIT_SECONDS = metrics.histogram(
+    "edge_writer_submit_duration_seconds", "Round trip of write commands submitted to the single writer.",
+    ("command",))
+
+_commands: Dict[str, Callable] = {}
+
+
+class WriterUnavailableError(RuntimeError):
+    """Raised when the writer process cannot be reached or did not acknowledge a command in time."""
+
+
+def write_command(name: str) -> Callable[[Callable], Callable]:
+    """Register a function as a write command.
+
+    The function must perform its own unit of work; in the writer it runs inside the group
+    transaction, where its unit of work becomes a savepoint.
+
+    Args:
+        name (str): Command name, unique across bounded contexts (e.g. "iam.toggle_access").
+    """
+    def decorator(func: Callable) -> Callable:
+        _commands[name] = func
+        return func
+    return decorator
+
+
+def submit_write(name: str, *args):
+    """Run a write command, through the writer process when WRITER_MODE=client.
+
+    Args:
+        name (str): Registered command name.
+        *args: Command arguments (picklable).
+
+    Returns:
+        The command's result.
+
+    Raises:
+        WriterUnavailableError: In client mode, if the writer could not be reached or timed out.
+        Exception: Whatever the command raised.
+    """
+    if WRITER_MODE != "client":
+        return _commands[name](*args)
+    started = time.perf_counter()
+    try:
+        return writer_client.submit(name, *args)
+    finally:
+        SUBMIT_SECONDS.observe(time.perf_counter() - started, name)
+
+
+def is_writer_client() -> bool:
+    """Whether writes of this process are applied by a separate writer process."""
+    return WRITER_MODE == "client"
+
+
+def _parse_address(address: str) -> Union[str, Tuple[str, int]]:
+    """Turn "host:port" into a TCP address tuple; anything else is a Unix socket path."""
+    host, separator, port = address.rpartition(":")
+    if separator and port.isdigit() and "/" not in address:
+        return host or "127.0.0.1", int(port)
+    return address
+
+
+def _is_loopback(host: str) -> bool:
+    """Whether a TCP host only accepts connections from this machine."""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host.strip("[]")).is_loopback
+    except ValueError:
+        return False  # a host name may resolve to any interface
+
+
+def check_connection_settings(address: Union[str, Tuple[str, int]], authkey: bytes,
+                              allow_remote: bool = WRITER_ALLOW_REMOTE) -> None:
+    """Refuse writer connection settings that would accept commands from anyone.
+
+    Args:
+        address (Union[str, Tuple[str, int]]): Parsed writer address.
+        authkey (bytes): Shared secret of the connection handshake.
+        allow_remote (bool): Accept a TCP address that is not a loopback one.
+
+    Raises:
+        ValueError: If no authkey is set, or the TCP address is not a loopback one and
+            allow_remote is False.
+    """
+    if not authkey:
+        raise ValueError("WRITER_AUTHKEY must be set to a shared secret to run the single writer "
+                         "(commands are pickled: anyone holding the key can run code in the writer)")
+    if isinstance(address, tuple) and not allow_remote and not _is_loopback(address[0]):
+        raise ValueError(f"WRITER_ADDRESS {address[0]}:{address[1]} is not a loopback address "
+                         "(set WRITER_ALLOW_REMOTE=true to accept workers on other hosts)")
+
+
+class WriterClient:
+    """Pool of connections from a worker process to the writer (one command in flight per connection).
+
+    A command is sent with the client's timeout: the writer answers it with an error instead of
+    applying it once it has been queued that long, and the client waits for that answer (up to
+    twice the timeout, to cover the group being committed), so a timed-out command is known not
+    to have been applied.
+    """
+
+    def __init__(self, address: str = WRITER_ADDRESS, authkey: bytes = WRITER_AUTHKEY,
+                 timeout: float = WRITER_TIMEOUT, pool_size: int = WRITER_CLIENT_POOL):
+        """Initialize a WriterClient (connections are opened on demand).
+
+        Args:
+            address (str): Writer socket path or host:port.
+            authkey (bytes): Shared secret of the connection handshake.
+            timeout (float): Seconds a command may wait in the writer's queue before it is refused.
+            pool_size (int): Idle connections kept for reuse.
+        """
+        self.address = _parse_address(address)
+        self.authkey = authkey
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[Connection]" = queue.LifoQueue(maxsize=pool_size)
+
+    def submit(self, name: str, *args):
+        """Send a command and wait for its acknowledgement (see submit_write)."""
+        conn, pooled = self._checkout()
+        message = (name, args, self.timeout)
+        try:
+            try:
+                conn.send(message)
+            except OSError:
+                if not pooled:
+                    raise
+                # Idle connection to a writer that has since restarted: the command was not sent
+                conn.close()
+                conn = self._connect()
+                conn.send(message)
+            if not conn.poll(2 * self.timeout):
+                # The writer is stuck in a group: whether this command was applied is unknown
+                raise WriterUnavailableError(f"Writer did not acknowledge {name} within {2 * self.timeout:g}s")
+            status, payload = conn.recv()
+        except (OSError, EOFError) as e:
+            conn.close()
+            raise WriterUnavailableError(f"Connection to the writer lost during {name}: {e}") from e
+        except WriterUnavailableError:
+            conn.close()  # a late acknowledgement must not be read as the answer to the next command
+            raise
+        self._checkin(conn)
+        if status == "error":
+            raise payload
+        return payload
+
+    def wait_until_ready(self, timeout: float = 30.0) -> None:
+        """Block until the writer answers a ping.
+
+        Raises:
+            WriterUnavailableError: If the writer is not up within `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self.submit("writer.ping")
+                return
+            except WriterUnavailableError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.2)
+
+    def _checkout(self) -> Tuple[Connection, bool]:
+        """Return an idle connection (True) or a new one (False)."""
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            return self._connect(), False
+
+    def _connect(self) -> Connection:
+        try:
+            return Client(self.address, authkey=self.authkey)
+        except OSError as e:
+            raise WriterUnavailableError(f"Writer unreachable at {self.address}: {e}") from e
+
+    def _checkin(self, conn: Connection) -> None:
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+writer_client = WriterClient()
+if WRITER_MODE == "client":
+    check_connection_settings(writer_client.address, writer_client.authkey)
+
+
+class _Command:
+    """A command received from a worker, waiting to be applied and acknowledged."""
+
+    __slots__ = ("conn", "name", "args", "expires_at")
+
+    def __init__(self, conn: Connection, name: str, args: tuple, expires_at: float):
+        self.conn = conn
+        self.name = name
+        self.args = args
+        self.expires_at = expires_at
+
+
+class WriterServer:
+    """The writer process: accepts worker connections and applies their commands in group commits."""
+
+    def __init__(self, address: str = WRITER_ADDRESS, authkey: bytes = WRITER_AUTHKEY,
+                 group_max: int = WRITER_GROUP_MAX, group_wait_ms: float = WRITER_GROUP_WAIT_MS):
+        """Initialize a WriterServer.
+
+        Args:
+            address (str): Socket path or host:port to listen on.
+            authkey (bytes): Shared secret of the connection handshake.
+            group_max (int): Most commands applied in one transaction.
+            group_wait_ms (float): Extra time to wait for more commands before committing a
+                group (0 commits as soon as the queue is drained).
+        """
+        self.address = _parse_address(address)
+        self.authkey = authkey
+        check_connection_settings(self.address, self.authkey)
+        self.group_max = group_max
+        self.group_wait = group_wait_ms / 1000.0
+        self._pending: "queue.Queue[_Command]" = queue.Queue()
+        self._stopping = threading.Event()
+        self._listener: Optional[Listener] = None
+        self.connections = 0
+        self.commands = 0
+        self.failed_commands = 0
+        self.expired_commands = 0
+        self.groups = 0
+        self.failed_groups = 0
+        self.largest_group = 0
+        _commands["writer.ping"] = self.stats
+
+    def serve_forever(self) -> None:
+        """Listen for workers and apply their commands until stop() is called."""
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)  # left over by a writer that did not shut down cleanly
+        self._listener = Listener(self.address, authkey=self.authkey)
+        apply_thread = threading.Thread(target=self._apply_loop, name="writer-apply", daemon=True)
+        apply_thread.start()
+        logger.warning("Single writer listening on %s", self.address)
+        try:
+            while not self._stopping.is_set():
+                try:
+                    conn = self._listener.accept()
+                except OSError:
+                    if self._stopping.is_set():
+                        break
+                    logger.exception("Rejected a writer connection")
+                    continue
+                self.connections += 1
+                threading.Thread(target=self._receive_loop, args=(conn,), name="writer-conn", daemon=True).start()
+        finally:
+            self._stopping.set()
+            apply_thread.join(5)
+            if isinstance(self.address, str) and os.path.exists(self.address):
+                os.unlink(self.address)
+
+    def stop(self) -> None:
+        """Stop accepting connections and applying commands."""
+        self._stopping.set()
+        if self._listener is not None:
+            self._listener.close()
+
+    def stats(self) -> Dict:
+        """Return connection, command and group commit counters.
+
+        Returns:
+            Dict: Writer statistics (also the answer to "writer.ping").
+        """
+        return {
+            "address": self.address if isinstance(self.address, str) else "%s:%d" % self.address,
+            "connections": self.connections,
+            "queued": self._pending.qsize(),
+            "commands": self.commands,
+            "failed_commands": self.failed_commands,
+            "expired_commands": self.expired_commands,
+            "groups": self.groups,
+            "failed_groups": self.failed_groups,
+            "avg_group_size": round(self.commands / self.groups, 2) if self.groups else 0.0,
+            "largest_group": self.largest_group,
+        }
+
+    def _receive_loop(self, conn: Connection) -> None:
+        """Queue the commands of one worker connection until it closes."""
+        with conn:
+            while not self._stopping.is_set():
+                try:
+                    name, args, timeout = conn.recv()
+                except (EOFError, OSError):
+                    return
+                self._pending.put(_Command(conn, name, args, time.monotonic() + timeout))
+
+    def _next_group(self) -> List[_Command]:
+        """Wait for a command, then take whatever else is queued (up to group_max)."""
+        while not self._stopping.is_set():
+            try:
+                group = [self._pending.get(timeout=0.5)]
+                break
+            except queue.Empty:
+                continue
+        else:
+            return []
+        deadline = time.monotonic() + self.group_wait
+        while len(group) < self.group_max:
+            try:
+                group.append(self._pending.get_nowait())
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    group.append(self._pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+        return group
+
+    def _apply_loop(self) -> None:
+        """Apply command groups, one transaction per group, and acknowledge each command."""
+        db.connect(reuse_if_open=True)
+        while not self._stopping.is_set():
+            group = self._next_group()
+            if not group:
+                continue
+            replies = []
+            try:
+                with unit_of_work():
+                    for command in group:
+                        replies.append(self._apply(command))
+            except Exception as e:  # noqa: BLE001 - the commit itself failed: nothing was applied
+                logger.exception("Write group of %d commands failed", len(group))
+                self.failed_groups += 1
+                replies = [("error", WriterUnavailableError(f"Write group failed: {e}"))] * len(group)
+            self.groups += 1
+            self.commands += len(group)
+            self.largest_group = max(self.largest_group, len(group))
+            for command, reply in zip(group, replies):
+                self._reply(command, reply)
+
+    def _reply(self, command: _Command, reply: Tuple[str, object]) -> None:
+        """Send a command's acknowledgement, or an error if the result cannot be sent."""
+        try:
+            command.conn.send(reply)
+        except (OSError, EOFError):
+            pass  # the worker went away; its command is committed regardless
+        except Exception as e:  # noqa: BLE001 - e.g. a result or exception that cannot be pickled
+            logger.exception("Could not send the reply to %s", command.name)
+            # Not WriterUnavailableError (503): the command may have been applied
+            try:
+                command.conn.send(("error", RuntimeError(
+                    f"Reply to {command.name} could not be sent ({type(e).__name__}: {e}); "
+                    f"the command {'failed' if reply[0] == 'error' else 'was applied'}")))
+            except Exception:  # noqa: BLE001
+                command.conn.close()  # the worker sees the connection drop instead of waiting
+
+    def _apply(self, command: _Command) -> Tuple[str, object]:
+        """Run one command in a savepoint of the group transaction."""
+        func = _commands.get(command.name)
+        if func is None:
+            self.failed_commands += 1
+            return "error", KeyError(f"Unknown write command {command.name!r}")
+        if time.monotonic() > command.expires_at:
+            # Refused rather than applied late: the worker answers 503 and the device retries
+            self.expired_commands += 1
+            return "error", WriterUnavailableError(f"Writer busy: {command.name} was not applied in time")
+        try:
+            with unit_of_work():
+                return "ok", func(*command.args)
+        except Exception as e:  # noqa: BLE001 - returned to the worker that submitted it
+            self.failed_commands += 1
+            return "error", e
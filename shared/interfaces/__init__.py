@@ -0,0 +1 @@
+# Empty file to make shared/interfaces a Python package
\ No newline at end of file
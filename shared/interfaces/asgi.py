@@ -0,0 +1,300 @@
+"""
+Minimal ASGI toolkit for the asyncio serving mode.
+
+Provides request parsing, JSON, plain text and streaming responses, a path router with Flask-style `<param>` segments and
+a bounded thread pool executor for blocking work (SQLite, application services), so the event loop
+never blocks on the database.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterable, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from shared.infrastructure.metrics import HTTP_IN_FLIGHT, HTTP_REQUEST_SECONDS
+from shared.infrastructure.tracing import DEBUG_TRACE_HEADER, end_trace, start_trace, trace_requested
+
+logger = logging.getLogger(__name__)
+
+ASGI_DB_WORKERS = int(os.getenv("ASGI_DB_WORKERS", "8"))
+ASGI_MAX_BODY_BYTES = int(os.getenv("ASGI_MAX_BODY_BYTES", str(1024 * 1024)))
+
+# Bounded pool for blocking work; keep it below DB_POOL_SIZE so every worker thread gets a connection
+_blocking_executor = ThreadPoolExecutor(max_workers=ASGI_DB_WORKERS, thread_name_prefix="asgi-db")
+
+
+async def run_blocking(func: Callable, *args, **kwargs):
+    """
+    Run a blocking callable (database access, synchronous services) on the bounded executor.
+    """
+    loop = asyncio.get_running_loop()
+    # Run in a copy of the caller's context so request-scoped state (the debug trace) follows the call
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_blocking_executor, partial(context.run, func, *args, **kwargs))
+
+
+async def _run_hook(hook: Callable) -> None:
+    """Await a coroutine function hook, or run a blocking one on the executor."""
+    if asyncio.iscoroutinefunction(hook):
+        await hook()
+    else:
+        await run_blocking(hook)
+
+
+class Request:
+    """Incoming HTTP request of the ASGI mode.
+
+    Attributes:
+        method (str): HTTP method.
+        path (str): Request path.
+        headers (Dict[str, str]): Headers with lower-case names.
+        args (Dict[str, str]): Query string parameters (first value of each).
+        path_params (Dict[str, str]): Parameters captured from the route.
+        body (bytes): Raw request body.
+    """
+
+    def __init__(self, scope: Dict, body: bytes, path_params: Dict[str, str]):
+        """Initialize a Request from an ASGI scope and its body."""
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        self.args = {key: values[0] for key, values in query.items()}
+        self.path_params = path_params
+        self.body = body
+
+    @property
+    def json(self) -> Optional[object]:
+        """Parsed JSON body, or None if the body is empty or not valid JSON."""
+        if not self.body:
+            return None
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            return None
+
+
+class StreamingResponse:
+    """Response whose body is produced incrementally (e.g. Server-Sent Events).
+
+    Attributes:
+        chunks (AsyncIterable[str]): Body chunks, sent as they are produced.
+        content_type (str): Content-Type header.
+        headers (Dict[str, str]): Extra headers.
+        on_close (Optional[Callable[[], None]]): Called once the response ends or the client leaves.
+    """
+
+    def __init__(self, chunks: AsyncIterable[str], content_type: str, headers: Optional[Dict[str, str]] = None,
+                 on_close: Optional[Callable[[], None]] = None):
+        """Initialize a StreamingResponse."""
+        self.chunks = chunks
+        self.content_type = content_type
+        self.headers = headers or {}
+        self.on_close = on_close
+
+
+class TextResponse:
+    """Complete non-JSON response (e.g. the Prometheus exposition of /metrics).
+
+    Attributes:
+        body (str): Response body.
+        content_type (str): Content-Type header.
+    """
+
+    def __init__(self, body: str, content_type: str = "text/plain; charset=utf-8"):
+        """Initialize a TextResponse."""
+        self.body = body
+        self.content_type = content_type
+
+
+Handler = Callable[[Request], Awaitable[Tuple[object, int]]]
+
+
+class Router:
+    """Maps paths (with Flask-style `<name>` segments) and methods to async handlers."""
+
+    def __init__(self):
+        """Initialize an empty Router."""
+        self.routes: List[Tuple[re.Pattern, Iterable[str], Handler, str]] = []
+
+    def route(self, path: str, methods: Iterable[str] = ("GET",)):
+        """Register an async handler returning (payload, status code).
+
+        Args:
+            path (str): Route path, e.g. "/api/heart-rate/<member_id>".
+            methods (Iterable[str]): Allowed HTTP methods.
+        """
+        pattern = re.compile("^" + re.sub(r"<(\w+)>", r"(?P<\1>[^/]+)", path) + "$")
+
+        def decorator(handler: Handler) -> Handler:
+            self.routes.append((pattern, tuple(methods), handler, path))
+            return handler
+        return decorator
+
+    def match(self, method: str, path: str) -> Tuple[Optional[Handler], Dict[str, str], bool, Optional[str]]:
+        """Find the handler of a request.
+
+        Returns:
+            Tuple: (handler or None, path params, whether the path exists for another method,
+                route template of the matched handler or None).
+        """
+        path_exists = False
+        for pattern, methods, handler, template in self.routes:
+            found = pattern.match(path)
+            if not found:
+                continue
+            if method in methods:
+                return handler, found.groupdict(), True, template
+            path_exists = True
+        return None, {}, path_exists, None
+
+
+class ASGIApplication:
+    """ASGI application dispatching HTTP requests to routers, with lifespan startup/shutdown hooks."""
+
+    def __init__(self, routers: Iterable[Router], on_startup: Iterable[Callable] = (),
+                 on_shutdown: Iterable[Callable] = ()):
+        """Initialize the application.
+
+        Args:
+            routers (Iterable[Router]): Routers searched in order.
+            on_startup (Iterable[Callable]): Hooks run at startup (coroutine functions are awaited,
+                blocking callables run in the executor).
+            on_shutdown (Iterable[Callable]): Hooks run at shutdown (same rules).
+        """
+        self.router = Router()
+        for router in routers:
+            self.router.routes.extend(router.routes)
+        self.on_startup = list(on_startup)
+        self.on_shutdown = list(on_shutdown)
+
+    async def __call__(self, scope, receive, send):
+        """ASGI entry point."""
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    for hook in self.on_startup:
+                        await _run_hook(hook)
+                except Exception as e:  # noqa: BLE001
+                    logger.exception("Startup failed")
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for hook in self.on_shutdown:
+                    await _run_hook(hook)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope, receive, send):
+        received = time.perf_counter()
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if len(body) > ASGI_MAX_BODY_BYTES:
+                await send_json(send, {"error": "Request body too large"}, 413)
+                return
+
+        method = scope["method"]
+        handler, path_params, path_exists, template = self.router.match(method, scope["path"])
+        if handler is None:
+            status = 405 if path_exists else 404
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - received, method, "unmatched", str(status))
+            await send_json(send, {"error": "Method not allowed" if path_exists else "Not found"}, status)
+            return
+
+        request = Request(scope, body, path_params)
+        trace = token = None
+        if trace_requested(request.headers.get(DEBUG_TRACE_HEADER.lower())):
+            trace, token = start_trace(method, template, scope["path"])
+
+        # Handler time is measured up to the response being produced (not while a stream is open)
+        started = time.perf_counter()
+        HTTP_IN_FLIGHT.inc(1, template)
+        try:
+            payload, status = await handler(request)
+        except Exception as e:  # noqa: BLE001
+            logger.exception("Unhandled error in %s %s", method, scope["path"])
+            payload, status = {"error": f"Internal error: {str(e)}"}, 500
+        finally:
+            HTTP_IN_FLIGHT.dec(1, template)
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method, template, str(status))
+        headers = end_trace(trace, token, status) if trace is not None else None
+        if isinstance(payload, StreamingResponse):
+            payload.headers.update(headers or {})
+            await send_stream(send, receive, payload, status)
+        elif isinstance(payload, TextResponse):
+            await send_text(send, payload, status, headers)
+        else:
+            await send_json(send, payload, status, headers)
+
+
+async def send_json(send, payload: object, status: int, headers: Optional[Dict[str, str]] = None) -> None:
+    """
+    Send a complete JSON response.
+    """
+    await _send_body(send, json.dumps(payload).encode("utf-8"), "application/json", status, headers)
+
+
+async def send_text(send, response: TextResponse, status: int, headers: Optional[Dict[str, str]] = None) -> None:
+    """
+    Send a complete plain (non-JSON) response.
+    """
+    await _send_body(send, response.body.encode("utf-8"), response.content_type, status, headers)
+
+
+async def _send_body(send, body: bytes, content_type: str, status: int, headers: Optional[Dict[str, str]]) -> None:
+    raw_headers = [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())]
+    raw_headers += [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_stream(send, receive, response: StreamingResponse, status: int) -> None:
+    """
+    Send a streaming response until its chunks are exhausted or the client disconnects.
+    """
+    headers = [(b"content-type", response.content_type.encode())]
+    headers += [(name.lower().encode(), value.encode()) for name, value in response.headers.items()]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+
+    async def wait_for_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    disconnected = asyncio.ensure_future(wait_for_disconnect())
+    chunks = response.chunks.__aiter__()
+    try:
+        while True:
+            next_chunk = asyncio.ensure_future(chunks.__anext__())
+            await asyncio.wait({next_chunk, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if not next_chunk.done():
+                next_chunk.cancel()
+                break
+            try:
+                chunk = next_chunk.result()
+            except StopAsyncIteration:
+                break
+            await send({"type": "http.response.body", "body": chunk.encode("utf-8"), "more_body": True})
+        if not disconnected.done():
+            await send({"type": "http.response.body", "body": b""})
+    finally:
+        disconnected.cancel()
+        if response.on_close:
+            response.on_close()
@@ -0,0 +1,236 @@
+"""Request tracing hooks and debug endpoints (recent traces, sampling profiler) for both serving modes.
+
+The debug endpoints expose SQL, call sites and stacks of the whole process, so they answer 404
+unless DEBUG_ENDPOINTS is enabled, and then only to a registered device (device_id query parameter
+and X-API-Key header, checked like the device endpoints).
+"""
+import asyncio
+from functools import partial
+from typing import Callable, Dict, Optional, Tuple
+
+from flask import Blueprint, g, jsonify, request
+
+from shared.infrastructure.profiler import PROFILE_DEFAULT_SECONDS, ProfileBusyError, profiler
+from shared.infrastructure.tracing import (
+    DEBUG_ENDPOINTS, DEBUG_TRACE_HEADER, end_trace, start_trace, trace_log, trace_requested,
+)
+from shared.interfaces.asgi import Request as ASGIRequest, Router, run_blocking
+
+# Checks a device's (device_id, api_key); set by the entry point with set_debug_authenticator()
+Authenticator = Callable[[str, str], bool]
+_authenticate: Optional[Authenticator] = None
+
+debug_api = Blueprint("debug_api", __name__)
+debug_routes = Router()
+
+
+def register_trace_hooks(app) -> None:
+    """
+    Trace Flask requests that ask for it (DEBUG_TRACE_HEADER) or every request with DEBUG_TRACE=true.
+
+    The trace summary is returned in the Server-Timing and X-Debug-Trace-Id response headers.
+    """
+    @app.before_request
+    def _start_trace():
+        if trace_requested(request.headers.get(DEBUG_TRACE_HEADER)):
+            rule = request.url_rule
+            g.debug_trace = start_trace(request.method, rule.rule if rule is not None else "unmatched", request.path)
+
+    @app.after_request
+    def _attach_trace(response):
+        started = g.pop("debug_trace", None)
+        if started is not None:
+            response.headers.update(end_trace(*started, response.status_code))
+        return response
+
+    @app.teardown_request
+    def _drop_trace(exc):
+        started = g.pop("debug_trace", None)
+        if started is not None:
+            end_trace(*started, 500)  # the view raised before after_request
+
+
+def set_debug_authenticator(authenticate: Authenticator) -> None:
+    """Set the credential check of the debug endpoints (they refuse every key until set).
+
+    Args:
+        authenticate (Authenticator): Checks a device's (device_id, api_key).
+    """
+    global _authenticate
+    _authenticate = authenticate
+
+
+def check_debug_access(api_key: Optional[str], device_id: Optional[str]) -> Optional[Tuple[Dict, int]]:
+    """Check that the debug endpoints are enabled and the caller is a registered device.
+
+    May read the devices table on a cache miss.
+
+    Args:
+        api_key (Optional[str]): X-API-Key header.
+        device_id (Optional[str]): device_id query parameter.
+
+    Returns:
+        Optional[Tuple[Dict, int]]: (error payload, status code) if access is refused, None if allowed.
+    """
+    if not DEBUG_ENDPOINTS:
+        return {"error": "Not found"}, 404
+    if not device_id or not api_key:
+        return {"error": "Missing device_id or X-API-Key"}, 401
+    if _authenticate is None or not _authenticate(device_id, api_key):
+        return {"error": "Invalid device_id or API key"}, 401
+    return None
+
+
+def _check_flask_access():
+    """Flask wrapper of check_debug_access: (JSON response, status code) if refused, None if allowed."""
+    error = check_debug_access(request.headers.get("X-API-Key"), request.args.get("device_id"))
+    if error:
+        return jsonify(error[0]), error[1]
+    return None
+
+
+async def _check_asgi_access(request: ASGIRequest) -> Optional[Tuple[Dict, int]]:
+    """ASGI counterpart of _check_flask_access (the credential check runs on the executor)."""
+    return await run_blocking(check_debug_access, request.headers.get("x-api-key"), request.args.get("device_id"))
+
+
+def _profile_options(args) -> Tuple[Optional[Dict], Optional[str]]:
+    """Parse seconds, interval_ms and idle query parameters into profiler keyword arguments."""
+    try:
+        seconds = float(args.get("seconds", PROFILE_DEFAULT_SECONDS))
+        interval_ms = float(args["interval_ms"]) if args.get("interval_ms") else None
+    except ValueError:
+        return None, "seconds and interval_ms must be numbers"
+    if seconds <= 0 or (interval_ms is not None and interval_ms <= 0):
+        return None, "seconds and interval_ms must be positive"
+    include_idle = str(args.get("idle", "false")).lower() in ("1", "true", "yes")
+    return {"seconds": seconds, "interval_ms": interval_ms, "include_idle": include_idle}, None
+
+
+def _is_background(args) -> bool:
+    return str(args.get("background", "false")).lower() in ("1", "true", "yes")
+
+
+@debug_api.route("/api/v1/debug/traces", methods=["GET"])
+def get_traces():
+    """List the most recent request traces (newest first).
+
+    Returns:
+        tuple: (JSON response with trace summaries, status code).
+    """
+    refused = _check_flask_access()
+    if refused:
+        return refused
+    return jsonify({"traces": trace_log.recent()}), 200
+
+
+@debug_api.route("/api/v1/debug/traces/<int:trace_id>", methods=["GET"])
+def get_trace(trace_id: int):
+    """Get one request trace with every statement, upstream call and call site.
+
+    Args:
+        trace_id (int): Value of the X-Debug-Trace-Id response header.
+
+    Returns:
+        tuple: (JSON response with the trace, status code).
+    """
+    refused = _check_flask_access()
+    if refused:
+        return refused
+    trace = trace_log.get(trace_id)
+    if trace is None:
+        return jsonify({"error": "Unknown or evicted trace"}), 404
+    return jsonify(trace), 200
+
+
+@debug_api.route("/api/v1/debug/profile", methods=["POST"])
+def run_profile():
+    """Sample the stacks of all threads for a fixed window and write a folded stack file.
+
+    Query parameters: seconds, interval_ms, idle (include parked threads) and background
+    (return 202 immediately instead of waiting for the profile).
+
+    Returns:
+        tuple: (JSON response with the profile summary, status code).
+    """
+    refused = _check_flask_access()
+    if refused:
+        return refused
+    options, error = _profile_options(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+    if _is_background(request.args):
+        seconds = options.pop("seconds")
+        if not profiler.start_background(seconds, **options):
+            return jsonify({"error": "A profile is already running"}), 409
+        return jsonify({"started": True, "seconds": seconds}), 202
+    try:
+        return jsonify(profiler.profile(**options)), 200
+    except ProfileBusyError as e:
+        return jsonify({"error": str(e)}), 409
+
+
+@debug_api.route("/api/v1/debug/profile", methods=["GET"])
+def get_profile_status():
+    """Get whether a profile is running and the summary of the last one.
+
+    Returns:
+        tuple: (JSON response with profiler state, status code).
+    """
+    refused = _check_flask_access()
+    if refused:
+        return refused
+    return jsonify(profiler.stats()), 200
+
+
+@debug_routes.route("/api/v1/debug/traces", methods=["GET"])
+async def get_traces_async(request: ASGIRequest):
+    """List the most recent request traces (newest first)."""
+    refused = await _check_asgi_access(request)
+    if refused:
+        return refused
+    return {"traces": trace_log.recent()}, 200
+
+
+@debug_routes.route("/api/v1/debug/traces/<trace_id>", methods=["GET"])
+async def get_trace_async(request: ASGIRequest):
+    """Get one request trace with every statement, upstream call and call site."""
+    refused = await _check_asgi_access(request)
+    if refused:
+        return refused
+    trace_id = request.path_params["trace_id"]
+    trace = trace_log.get(int(trace_id)) if trace_id.isdigit() else None
+    if trace is None:
+        return {"error": "Unknown or evicted trace"}, 404
+    return trace, 200
+
+
+@debug_routes.route("/api/v1/debug/profile", methods=["POST"])
+async def run_profile_async(request: ASGIRequest):
+    """Sample the stacks of all threads for a fixed window and write a folded stack file."""
+    refused = await _check_asgi_access(request)
+    if refused:
+        return refused
+    options, error = _profile_options(request.args)
+    if error:
+        return {"error": error}, 400
+    if _is_background(request.args):
+        seconds = options.pop("seconds")
+        if not profiler.start_background(seconds, **options):
+            return {"error": "A profile is already running"}, 409
+        return {"started": True, "seconds": seconds}, 202
+    try:
+        # Sampling sleeps for the whole window: keep it off the bounded database executor
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(profiler.profile, **options)), 200
+    except ProfileBusyError as e:
+        return {"error": str(e)}, 409
+
+
+@debug_routes.route("/api/v1/debug/profile", methods=["GET"])
+async def get_profile_status_async(request: ASGIRequest):
+    """Get whether a profile is running and the summary of the last one."""
+    refused = await _check_asgi_access(request)
+    if refused:
+        return refused
+    return profiler.stats(), 200
@@ -0,0 +1,69 @@
+"""Prometheus /metrics endpoint and HTTP request instrumentation for both serving modes."""
+import time
+
+from flask import Blueprint, Response, g, request
+
+from shared.infrastructure.metrics import (
+    CONTENT_TYPE, HTTP_IN_FLIGHT, HTTP_REQUEST_SECONDS, METRICS_ENABLED, metrics,
+)
+from shared.interfaces.asgi import Request as ASGIRequest, Router, TextResponse
+
+metrics_api = Blueprint("metrics_api", __name__)
+metrics_routes = Router()
+
+
+@metrics_api.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Expose the process metrics in the Prometheus text format.
+
+    Returns:
+        Response: Text exposition, or 404 when METRICS_ENABLED is off.
+    """
+    if not METRICS_ENABLED:
+        return Response("metrics disabled\n", status=404, mimetype="text/plain")
+    return Response(metrics.render(), status=200, content_type=CONTENT_TYPE)
+
+
+@metrics_routes.route("/metrics", methods=["GET"])
+async def get_metrics_async(request: ASGIRequest):
+    """Expose the process metrics in the Prometheus text format."""
+    if not METRICS_ENABLED:
+        return TextResponse("metrics disabled\n"), 404
+    return TextResponse(metrics.render(), CONTENT_TYPE), 200
+
+
+def register_metrics_hooks(app) -> None:
+    """
+    Time every Flask request per route template and track requests in flight.
+
+    Route templates (e.g. /api/heart-rate/<member_id>) keep the label set bounded; requests that
+    match no route are reported as "unmatched". Streaming responses are timed until the view returns.
+    """
+    if not METRICS_ENABLED:
+        return
+
+    @app.before_request
+    def _start_request_timer():
+        rule = request.url_rule
+        g.metrics_endpoint = rule.rule if rule is not None else "unmatched"
+        g.metrics_started = time.perf_counter()
+        HTTP_IN_FLIGHT.inc(1, g.metrics_endpoint)
+
+    @app.after_request
+    def _observe_request(response):
+        started = g.pop("metrics_started", None)
+        if started is not None:
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, request.method, g.metrics_endpoint,
+                                         str(response.status_code))
+        return response
+
+    @app.teardown_request
+    def _end_request(exc):
+        endpoint = g.pop("metrics_endpoint", None)
+        if endpoint is None:
+            return
+        started = g.pop("metrics_started", None)
+        if started is not None:
+            # after_request did not run: the view raised
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, request.method, endpoint, "500")
+        HTTP_IN_FLIGHT.dec(1, endpoint)
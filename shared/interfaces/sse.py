@@ -0,0 +1,37 @@
+"""
+Server-Sent Events framing shared by the Flask and ASGI interfaces.
+"""
+import json
+from typing import Optional
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # disable response buffering in nginx-style proxies
+}
+
+
+def format_event(event: str, data: object, event_id: Optional[int] = None, retry_ms: Optional[int] = None) -> str:
+    """Format one SSE event with a JSON payload.
+
+    Args:
+        event (str): Event name.
+        data (object): JSON-serializable payload.
+        event_id (Optional[int]): Event id (clients send it back as Last-Event-ID on reconnect).
+        retry_ms (Optional[int]): Reconnection delay advertised to the client.
+
+    Returns:
+        str: The event, terminated by a blank line.
+    """
+    lines = []
+    if retry_ms is not None:
+        lines.append(f"retry: {retry_ms}")
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def format_comment(text: str) -> str:
+    """Format an SSE comment line (ignored by clients, keeps idle connections and proxies alive)."""
+    return f": {text}\n\n"
@@ -0,0 +1,11 @@
+"""Test setup: point the service at a throwaway database before any module reads its settings."""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+os.environ["DATABASE_PATH"] = str(Path(tempfile.mkdtemp(prefix="edge-tests-")) / "test.db")
+os.environ.setdefault("DB_PLAN_CHECK", "off")  # the tests run the check themselves
@@ -0,0 +1,37 @@
+"""The hot queries must be served by indexes on a freshly migrated database."""
+import pytest
+
+from shared.infrastructure.database import db
+from shared.infrastructure.migrations import MIGRATIONS, _FULL_SCAN, check_query_plans, current_version, migrate
+
+
+@pytest.fixture(scope="module")
+def migrated_db():
+    db.connect(reuse_if_open=True)
+    migrate()
+    yield db
+    db.close()
+
+
+def test_migrations_reach_latest_version(migrated_db):
+    assert current_version() == MIGRATIONS[-1].version
+
+
+def test_hot_queries_do_not_scan_whole_tables(migrated_db):
+    report = check_query_plans()
+    scans = {name: entry["plan"] for name, entry in report.items() if entry["full_scans"]}
+    assert not scans
+
+
+@pytest.mark.parametrize("line, table", [
+    ("SCAN check_ins", "check_ins"),
+    ("SCAN TABLE check_ins", "check_ins"),
+    ("SCAN TABLE outbox_events AS earlier_event", "outbox_events"),
+    ("SCAN check_ins USING INDEX checkin_active_member", None),
+    ("SCAN TABLE check_ins USING COVERING INDEX checkin_active_member", None),
+    ("SEARCH t1 USING INDEX member_nfc_uid (nfc_uid=?)", None),
+    ("SCAN CONSTANT ROW", None),
+])
+def test_full_scan_pattern_matches_old_and_new_plan_formats(line, table):
+    match = _FULL_SCAN.match(line)
+    assert (match.group(1) if match else None) == table
@@ -0,0 +1,43 @@
+"""Single-writer process for multi-worker deployments of the PumpUp Gym Edge Service.
+
+Run `python writer.py` next to the worker processes (started with WRITER_MODE=client and the same
+DATABASE_PATH, WRITER_ADDRESS and WRITER_AUTHKEY). The writer creates the schema, applies the write commands of
+all workers in group commits and runs the background jobs that write (outbox dispatcher, heart
+rate retention and forward replay).
+"""
+import logging
+import os
+import signal
+
+from shared.infrastructure.env import load_env_file
+
+load_env_file()
+
+from bootstrap import start_background_writers  # noqa: E402
+from health.application.services import HeartRateApplicationService  # noqa: E402
+from iam.application.services import AccessControlApplicationService, AuthApplicationService  # noqa: E402
+from shared.infrastructure.database import init_db  # noqa: E402
+from shared.infrastructure.writer import WriterServer  # noqa: E402
+
+
+def main() -> None:
+    """Initialize the database and serve write commands until SIGTERM/SIGINT."""
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "warning").upper())
+    server = WriterServer()  # refuses to start without WRITER_AUTHKEY or on a non-loopback address
+    init_db()
+    AuthApplicationService().get_or_create_test_device()
+    access_service = AccessControlApplicationService()
+    access_service.get_or_create_test_member()
+    heart_rate_service = HeartRateApplicationService()
+    start_background_writers(access_service, heart_rate_service)
+    heart_rate_service.forward_queue.start()
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.stop())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()